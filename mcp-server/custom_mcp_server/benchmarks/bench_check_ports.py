@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark for check_ports.
+Opens a set of local listeners, scans a 1,000-port range that contains them
+and reports wall time for the scan and for the port -> pid owner lookup.
+
+Usage: python benchmarks/bench_check_ports.py [--ports 1000] [--listeners 20]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.system_utilities import get_port_owners, scan_ports
+
+
+def open_listeners(count):
+    """Bind `count` listeners on consecutive free ports starting near a random base."""
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    base = min(probe.getsockname()[1], 64000)
+    probe.close()
+
+    listeners = []
+    port = base
+    while len(listeners) < count and port < 65535:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(('127.0.0.1', port))
+            sock.listen(16)
+            listeners.append(sock)
+        except OSError:
+            sock.close()
+        port += 7
+    return listeners
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ports", type=int, default=1000)
+    parser.add_argument("--listeners", type=int, default=20)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--concurrency", type=int, default=256)
+    args = parser.parse_args()
+
+    listeners = open_listeners(args.listeners)
+    listening = [sock.getsockname()[1] for sock in listeners]
+    first = max(min(listening) - 10, 1)
+    ports = list(range(first, min(first + args.ports, 65536)))
+
+    try:
+        start = time.perf_counter()
+        _, statuses = asyncio.run(scan_ports(args.host, ports, timeout=0.5, concurrency=args.concurrency))
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        owners = get_port_owners(ttl=0)
+        owner_time = time.perf_counter() - start
+
+        open_ports = sorted(port for port, status in statuses.items() if status == "open")
+        missed = set(listening) - set(open_ports)
+
+        print(f"check_ports benchmark: {len(ports)} ports, {len(listening)} listeners on {args.host}")
+        print("=" * 60)
+        print(f"Scan time:        {scan_time * 1000:.1f} ms")
+        print(f"Owner map build:  {owner_time * 1000:.1f} ms ({len(owners)} ports)")
+        print(f"Open ports found: {len(open_ports)} (missed listeners: {len(missed)})")
+        print("✅ under 1 second" if scan_time + owner_time < 1 else "❌ slower than 1 second")
+    finally:
+        for sock in listeners:
+            sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+End-to-end tool benchmark.
+Starts benchmarks/fake_upstream.py and the real server (stateless streamable
+HTTP, upstreams pointed at the fake), then drives each tool at every
+concurrency level and reports throughput and p50/p95/p99 latency per tool.
+Network tools see only the fake's configured latency, so results are
+repeatable offline and in CI.
+
+Usage: python benchmarks/bench_e2e.py [--tools get_weather,read_file] [--concurrency 1,16]
+           [--duration 3] [--latency 20] [--jitter 5] [--error-rate 0] [--cache off]
+           [--save | --check]
+
+The result cache is off by default so every call reaches the fake upstream;
+pass --cache memory (or sqlite) to measure cached serving instead.
+
+--save writes the results to benchmarks/e2e_baseline.json; --check exits
+non-zero if any tool's p95 grew, or its throughput fell, by more than
+--tolerance times against that file, or if calls failed with no injected
+errors.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from fake_upstream import upstream_urls
+from load_test import free_port, run_load, wait_ready
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(SERVER_DIR, "benchmarks", "e2e_baseline.json")
+
+SMALL_TEXT = "The quick brown fox jumps over the lazy dog. " * 50
+SMALL_CSV = "id,name,score\n" + "\n".join(f"{i},user{i},{i * 7 % 100}" for i in range(200))
+
+
+def scenarios(fake_url: str):
+    """Tool name → arguments for each benchmarked tool."""
+    return {
+        "get_weather": {"location": "London"},
+        "get_news": {"page_size": 5},
+        "get_crypto_prices": {},
+        "get_ip_info": {"ip_address": "203.0.113.7"},
+        "search_web": {"query": "python", "num_results": 10},
+        "extract_text": {"url": f"{fake_url}/pages/article.html"},
+        "extract_links": {"url": f"{fake_url}/pages/article.html", "output_format": "json"},
+        "list_directory": {"directory": SERVER_DIR, "detailed": True},
+        "search_files": {"directory": SERVER_DIR, "pattern": "*.py"},
+        "read_file": {"file_path": os.path.join(SERVER_DIR, "README.md")},
+        "analyze_text": {"text": SMALL_TEXT, "analysis_type": "word_count"},
+        "convert_data": {"data": SMALL_CSV, "source_format": "csv", "target_format": "json"},
+    }
+
+
+def start_fake(port: int, args):
+    command = [sys.executable, os.path.join(SERVER_DIR, "benchmarks", "fake_upstream.py"),
+               "--port", str(port), "--latency", str(args.latency), "--jitter", str(args.jitter),
+               "--error-rate", str(args.error_rate), "--seed", "1"]
+    return subprocess.Popen(command, cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_server(port: int, fake_url: str, workers: int, cache: str):
+    env = dict(
+        os.environ,
+        MCP_STATELESS_HTTP="1",
+        MCP_CACHE_BACKEND=cache,
+        MCP_UPSTREAM_URLS=upstream_urls(fake_url),
+        # Every fake service shares one host; don't let the per-host gate
+        # for unlisted hosts become the bottleneck being measured
+        MCP_HOST_LIMITS=json.dumps({"127.0.0.1": {"max_concurrent": 0}}),
+    )
+    return subprocess.Popen(
+        [sys.executable, "main.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def wait_fake(fake_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return httpx.get(f"{fake_url}/_stats", timeout=2).json()
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("Fake upstream did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tools", default=None, help="Comma-separated tools to run (default: all scenarios)")
+    parser.add_argument("--concurrency", default="1,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per tool and concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--latency", type=float, default=20, help="Fake upstream latency in ms")
+    parser.add_argument("--jitter", type=float, default=5, help="Fake upstream latency jitter in ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of fake upstream requests that fail")
+    parser.add_argument("--cache", default="off", help="Server MCP_CACHE_BACKEND (off, memory, sqlite, redis)")
+    parser.add_argument("--save", action="store_true", help=f"Write results to {os.path.relpath(BASELINE_FILE, SERVER_DIR)}")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed p95 growth / throughput drop for --check")
+    args = parser.parse_args()
+
+    levels = [int(value) for value in args.concurrency.split(',')]
+    fake_port, server_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    url = f"http://127.0.0.1:{server_port}/mcp"
+    selected = scenarios(fake_url)
+    if args.tools:
+        names = args.tools.split(',')
+        unknown = [name for name in names if name not in selected]
+        if unknown:
+            parser.error(f"unknown tools: {', '.join(unknown)}")
+        selected = {name: selected[name] for name in names}
+
+    print(f"End-to-end benchmark: {len(selected)} tools, concurrency {args.concurrency}, "
+          f"{args.duration:g}s each, {args.workers} worker(s)")
+    print(f"Fake upstream latency {args.latency:g}±{args.jitter:g} ms, error rate {args.error_rate:g}, "
+          f"cache {args.cache}")
+    print("=" * 78)
+    print(f"{'tool':<18} {'conc':>4}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errors':>6}")
+
+    results = {}
+    fake = start_fake(fake_port, args)
+    server = start_server(server_port, fake_url, args.workers, args.cache)
+    try:
+        wait_fake(fake_url)
+        asyncio.run(wait_ready(url))
+        for tool, arguments in selected.items():
+            for concurrency in levels:
+                stats = asyncio.run(run_load(url, tool, arguments, concurrency, args.duration))
+                results[f"{tool}@{concurrency}"] = stats
+                print(f"{tool:<18} {concurrency:>4}  {stats['throughput']:>8.1f}  {stats['p50']:>8.1f}  "
+                      f"{stats['p95']:>8.1f}  {stats['p99']:>8.1f}  {stats['errors']:>6}")
+        upstream_stats = wait_fake(fake_url)
+    finally:
+        stop(server)
+        stop(fake)
+
+    print("-" * 78)
+    print("Fake upstream requests: " + ", ".join(f"{name} {count}" for name, count
+                                                   in sorted(upstream_stats["requests"].items())))
+
+    if args.save:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({key: {"p95_ms": round(stats["p95"], 1), "throughput": round(stats["throughput"], 1)}
+                       for key, stats in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved baseline to {BASELINE_FILE}")
+
+    if args.check:
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = []
+        for key, stats in results.items():
+            if stats["errors"] and not args.error_rate:
+                regressions.append(f"{key}: {stats['errors']} failed calls")
+            expected = baseline.get(key)
+            if expected is None:
+                continue
+            if stats["p95"] > expected["p95_ms"] * args.tolerance:
+                regressions.append(f"{key}: p95 {stats['p95']:.1f} ms vs baseline {expected['p95_ms']:.1f} ms")
+            if stats["throughput"] < expected["throughput"] / args.tolerance:
+                regressions.append(f"{key}: {stats['throughput']:.1f} req/s vs baseline "
+                                   f"{expected['throughput']:.1f} req/s")
+        if regressions:
+            print("\nEnd-to-end regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"\nAll tools within {args.tolerance:g}x of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Mixed-load latency benchmark for the CPU-bound process pool.
+Small analyze_text requests arrive on a fixed schedule while large ones run
+alongside. Latency is measured from each small request's scheduled arrival,
+so time spent blocked behind a large request on the event loop counts.
+Compares everything-inline against the default offload threshold.
+
+Usage: python benchmarks/bench_process_pool.py [--duration 10]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.data_processing import _analyze_text
+from tools.executor import OFFLOAD_THRESHOLD, PROCESS_POOL_WORKERS, get_process_pool, run_cpu_bound
+
+SMALL_TEXT = "The quick brown fox jumps over the lazy dog. " * 20
+LARGE_TEXT = " ".join(f"token{i % 20000} alpha beta gamma delta" for i in range(200000))
+
+
+async def scenario(threshold: int, duration: float, small_interval: float, large_concurrency: int):
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + duration
+    small_latencies = []
+    large_latencies = []
+
+    async def small_request(scheduled):
+        await run_cpu_bound(_analyze_text, SMALL_TEXT, "word_count", size=len(SMALL_TEXT), threshold=threshold)
+        small_latencies.append(loop.time() - scheduled)
+
+    async def small_arrivals():
+        tasks = []
+        scheduled = loop.time()
+        while scheduled < stop_at:
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(small_request(scheduled)))
+            scheduled += small_interval
+        await asyncio.gather(*tasks)
+
+    async def large_client():
+        while loop.time() < stop_at:
+            start = loop.time()
+            await run_cpu_bound(_analyze_text, LARGE_TEXT, "word_count", size=len(LARGE_TEXT), threshold=threshold)
+            large_latencies.append(loop.time() - start)
+            # Yield so a fully inline run still lets arrivals be scheduled
+            await asyncio.sleep(0)
+
+    await asyncio.gather(small_arrivals(), *(large_client() for _ in range(large_concurrency)))
+    return small_latencies, large_latencies
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda pct: values[min(int(len(values) * pct), len(values) - 1)] * 1000 if values else 0.0
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--small-interval", type=float, default=0.01, help="Seconds between small requests")
+    parser.add_argument("--large-concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    # Start pool workers up front so spawn cost isn't billed to the first request
+    pool = get_process_pool()
+    list(pool.map(abs, range(PROCESS_POOL_WORKERS)))
+
+    print(f"Mixed load: small text ({len(SMALL_TEXT)} chars) every {args.small_interval * 1000:.0f} ms, "
+          f"{args.large_concurrency} clients sending large text ({len(LARGE_TEXT) // 1024} KB)")
+    print(f"Process pool: {PROCESS_POOL_WORKERS} workers, offload threshold {OFFLOAD_THRESHOLD} chars")
+    print("=" * 78)
+    print(f"{'mode':<10} {'small p50':>10} {'small p95':>10} {'small p99':>10} {'large p50':>10} {'large n':>8}")
+
+    for label, threshold in (("inline", sys.maxsize), ("offload", OFFLOAD_THRESHOLD)):
+        small, large = asyncio.run(scenario(threshold, args.duration, args.small_interval, args.large_concurrency))
+        s50, s95, s99 = percentiles(small)
+        l50, _, _ = percentiles(large)
+        print(f"{label:<10} {s50:>8.1f}ms {s95:>8.1f}ms {s99:>8.1f}ms {l50:>8.1f}ms {len(large):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the slow-call profiler.
+Runs a CPU-bound function with a deep stack between profiler begin/end with the
+profiler off, sampling every call from its start, and sampling armed after
+part of the threshold (the default), and reports per-call time and how many
+stack samples each call paid for.
+
+Usage: python benchmarks/bench_profiling.py [--call-ms 20] [--calls 50] [--rounds 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.profiling import SlowCallProfiler
+
+
+def deep(depth: int, n: int) -> int:
+    if depth:
+        return deep(depth - 1, n)
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def calibrate(call_ms: float, depth: int) -> int:
+    """Loop count that makes one call take about call_ms."""
+    n = 10000
+    start = time.perf_counter()
+    deep(depth, n)
+    elapsed = time.perf_counter() - start
+    return max(int(n * call_ms / 1000 / elapsed), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--call-ms", type=float, default=20, help="duration of one call")
+    parser.add_argument("--calls", type=int, default=50, help="calls per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=60, help="extra stack frames per call")
+    parser.add_argument("--threshold-ms", type=float, default=2000)
+    args = parser.parse_args()
+
+    n = calibrate(args.call_ms, args.depth)
+    directory = tempfile.mkdtemp(prefix="bench-profiles-")
+    modes = {
+        "off": SlowCallProfiler(directory, threshold_ms=0),
+        "sample from start": SlowCallProfiler(directory, threshold_ms=args.threshold_ms, arm_fraction=0),
+        "armed (default)": SlowCallProfiler(directory, threshold_ms=args.threshold_ms),
+    }
+    times = {mode: [] for mode in modes}
+    samples = {mode: 0 for mode in modes}
+
+    # Interleave the modes so drift in machine load hits them all alike
+    for _ in range(args.rounds):
+        for mode, profiler in modes.items():
+            # Keep settings written by a running server out of the measurement
+            profiler._settings_checked = float("inf")
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                call = profiler.begin("bench", {}, is_async=False)
+                deep(args.depth, n)
+                if call is not None:
+                    samples[mode] += sum(call.samples.values())
+                profiler.end(call)
+                times[mode].append((time.perf_counter() - start) * 1000)
+
+    print(f"Profiler benchmark: {args.rounds}x{args.calls} calls of ~{args.call_ms:g} ms, "
+          f"threshold {args.threshold_ms:g} ms")
+    print("=" * 60)
+    baseline = statistics.median(times["off"])
+    for mode in modes:
+        median = statistics.median(times[mode])
+        per_call = samples[mode] / len(times[mode])
+        print(f"{mode:<18} {median:8.3f} ms/call  ({(median / baseline - 1) * 100:+5.1f}%)  "
+              f"{per_call:5.1f} samples/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark.
+Measures, in fresh interpreters, how long `import main` and create_app()
+take with all tool categories and with each category alone, which heavy
+dependencies are loaded before the first tool call, and the slowest imports
+reported by `python -X importtime`.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 15] [--save | --check]
+
+--save writes the medians to benchmarks/startup_baseline.json; --check exits
+non-zero if startup got more than --tolerance times slower than that file.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(SERVER_DIR, "benchmarks", "startup_baseline.json")
+
+HEAVY_MODULES = ("requests", "bs4", "aiohttp", "psutil", "pandas", "httpcore")
+
+CATEGORIES = ("files", "web", "api", "system", "data", "admin")
+
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (created - start) * 1000,
+    "heavy": [name for name in %r if name in sys.modules],
+}), flush=True)
+os._exit(0)
+""" % (HEAVY_MODULES,)
+
+
+def run_probe(categories: str, importtime: bool = False):
+    env = dict(os.environ, MCP_TOOL_CATEGORIES=categories)
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+    result = subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr: str):
+    """(cumulative_us, self_us, module) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is shown by indentation after the single separator space
+        rows.append((int(cumulative), int(own), name.rstrip()[1:]))
+    return rows
+
+
+def measure(categories: str, runs: int):
+    samples = [run_probe(categories)[0] for _ in range(runs)]
+    return {
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "startup_ms": statistics.median(sample["startup_ms"] for sample in samples),
+        "heavy": samples[-1]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per scenario (median reported)")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--save", action="store_true", help=f"Write results to {os.path.relpath(BASELINE_FILE, SERVER_DIR)}")
+    parser.add_argument("--check", action="store_true", help="Fail if slower than the saved baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor for --check")
+    args = parser.parse_args()
+
+    scenarios = ["all"] + list(CATEGORIES)
+    results = {}
+
+    print(f"Startup time, median of {args.runs} fresh interpreters")
+    print("=" * 78)
+    print(f"{'categories':<10}  {'import main ms':>14}  {'create_app ms':>13}  heavy modules loaded")
+    for scenario in scenarios:
+        stats = results[scenario] = measure(scenario, args.runs)
+        print(f"{scenario:<10}  {stats['import_ms']:>14.1f}  {stats['startup_ms']:>13.1f}  "
+              f"{', '.join(stats['heavy']) or '-'}")
+
+    _, stderr = run_probe("all", importtime=True)
+    rows = parse_importtime(stderr)
+    # Top-level imports and their direct children (two spaces per level)
+    shallow = [row for row in rows if len(row[2]) - len(row[2].lstrip()) <= 2]
+    print("\nSlowest imports, top level and one level down (all categories, -X importtime)")
+    print("-" * 78)
+    for cumulative, _, name in sorted(shallow, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+    if args.save:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({scenario: {"import_ms": round(stats["import_ms"], 1),
+                                  "startup_ms": round(stats["startup_ms"], 1)}
+                       for scenario, stats in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved baseline to {BASELINE_FILE}")
+
+    if args.check:
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{scenario}: {results[scenario]['startup_ms']:.1f} ms vs baseline {expected['startup_ms']:.1f} ms"
+            for scenario, expected in baseline.items()
+            if scenario in results and results[scenario]["startup_ms"] > expected["startup_ms"] * args.tolerance
+        ]
+        if regressions:
+            print("\nStartup regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"\nStartup within {args.tolerance:g}x of baseline")
+
+
+if __name__ == "__main__":
+    main()
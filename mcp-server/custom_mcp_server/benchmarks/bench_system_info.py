@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for get_system_info.
+Compares the per-call latency of recomputing static host facts on every call
+(the previous behaviour) against the cached facts + single dynamic snapshot.
+
+Usage: python benchmarks/bench_system_info.py [--calls 200]
+"""
+
+import argparse
+import os
+import platform
+import socket
+import statistics
+import sys
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.system_utilities import collect_system_info, format_system_info, get_host_facts, get_process_sampler
+
+
+def legacy_system_info():
+    """The work the tool used to do on every call."""
+    values = [
+        platform.system(), platform.release(), platform.architecture()[0],
+        platform.machine(), platform.processor(), socket.gethostname(),
+        psutil.cpu_count(logical=False), psutil.cpu_count(logical=True),
+        psutil.virtual_memory(), psutil.disk_usage('/'), psutil.boot_time(),
+        len(psutil.pids()),
+    ]
+    return values
+
+
+def measure(func, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'mean': statistics.mean(timings),
+        'p50': timings[len(timings) // 2],
+        'p95': timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    # Let the process sampler finish a sweep so detailed=True uses its count
+    get_process_sampler().wait_ready(timeout=10)
+    get_host_facts()
+
+    cases = [
+        ("legacy (recompute everything)", legacy_system_info),
+        ("cached facts + snapshot", lambda: format_system_info(collect_system_info(detailed=True))),
+    ]
+
+    print(f"get_system_info latency over {args.calls} calls (ms)")
+    print("=" * 60)
+    results = {}
+    for label, func in cases:
+        func()  # warm up
+        results[label] = stats = measure(func, args.calls)
+        print(f"{label:32s} mean {stats['mean']:.3f}  p50 {stats['p50']:.3f}  p95 {stats['p95']:.3f}")
+
+    legacy, cached = (results[label]['mean'] for label, _ in cases)
+    if cached > 0:
+        print(f"\nSpeedup: {legacy / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the external services used by the web and API tools.
+Replays recorded responses from benchmarks/upstream_fixtures.json with
+configurable latency, jitter and error rate, so the network tools can be
+benchmarked and tested offline. Each service is served under its
+http_client.UPSTREAMS name (/wttr/..., /hackernews/..., ...) plus /pages/
+for extract_text / extract_links; point the server at it with the printed
+MCP_UPSTREAM_URLS.
+
+Usage: python benchmarks/fake_upstream.py [--port 8700] [--latency 50] [--jitter 20] [--error-rate 0.01]
+       python benchmarks/fake_upstream.py --record   # refresh fixtures from the real services
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import random
+import sys
+from collections import Counter
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_FILE = os.path.join(SERVER_DIR, "benchmarks", "upstream_fixtures.json")
+
+sys.path.insert(0, SERVER_DIR)
+
+from tools.http_client import UPSTREAMS
+
+# (service, path fetched when recording, path pattern it is replayed for)
+RECORD_TARGETS = [
+    ("wttr", "/London?format=j1", "/*"),
+    ("hackernews", "/v0/topstories.json", "/v0/topstories.json"),
+    ("hackernews", "/v0/item/8863.json", "/v0/item/*.json"),
+    ("coingecko", "/api/v3/simple/price?ids=bitcoin,ethereum,litecoin,ripple,cardano"
+                  "&vs_currencies=usd&include_24hr_change=true", "/api/v3/simple/price"),
+    ("ipapi", "/json/", "/json/*"),
+    ("duckduckgo", "/html/?q=python", "/html/*"),
+]
+
+
+def load_fixtures(path: str = FIXTURES_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def upstream_urls(base_url: str) -> str:
+    """MCP_UPSTREAM_URLS value pointing every service at a fake upstream."""
+    return json.dumps({name: f"{base_url}/{name}" for name in UPSTREAMS})
+
+
+class FakeUpstream:
+    """Replays fixtures after a random delay, failing a fraction of requests."""
+
+    def __init__(self, fixtures, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, error_status: int = 503, seed=None):
+        self.fixtures = fixtures
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.errors = Counter()
+
+    def match(self, service: str, path: str):
+        for fixture in self.fixtures.get(service, []):
+            if fnmatch.fnmatchcase(path, fixture["path"]):
+                return fixture
+        return None
+
+    async def handle(self, request):
+        service = request.path_params["service"]
+        path = "/" + request.path_params["path"]
+        self.requests[service] += 1
+
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.random.random() < self.error_rate:
+            self.errors[service] += 1
+            return Response("fake upstream error", status_code=self.error_status)
+
+        fixture = self.match(service, path)
+        if fixture is None:
+            return Response(f"no fixture for {service}{path}", status_code=404)
+        body = fixture["body"]
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        return Response(body, status_code=fixture.get("status", 200), media_type=fixture["content_type"])
+
+    async def stats(self, request):
+        return JSONResponse({"requests": dict(self.requests), "errors": dict(self.errors)})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/_stats", self.stats),
+            Route("/{service}/{path:path}", self.handle),
+        ])
+
+
+def record(path: str = FIXTURES_FILE):
+    """Fetch RECORD_TARGETS from the real services and update the fixtures file."""
+    import httpx
+
+    fixtures = load_fixtures(path)
+    with httpx.Client(headers={'User-Agent': 'Mozilla/5.0'}, timeout=30, follow_redirects=True) as client:
+        for service, fetch_path, pattern in RECORD_TARGETS:
+            response = client.get(UPSTREAMS[service].rstrip('/') + fetch_path)
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', 'application/octet-stream')
+            body = response.json() if 'json' in content_type else response.text
+            entries = [entry for entry in fixtures.get(service, []) if entry["path"] != pattern]
+            entries.append({"path": pattern, "content_type": content_type, "body": body})
+            fixtures[service] = entries
+            print(f"✅ {service}{fetch_path} ({len(response.content)} bytes)")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixtures, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    print(f"Saved fixtures to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0, help="Mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="Latency varies uniformly by ± this many ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of failed requests")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for repeatable runs")
+    parser.add_argument("--fixtures", default=FIXTURES_FILE)
+    parser.add_argument("--record", action="store_true", help="Re-record fixtures from the real services and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.fixtures)
+        return
+
+    upstream = FakeUpstream(load_fixtures(args.fixtures), args.latency, args.jitter,
+                            args.error_rate, args.error_status, args.seed)
+    print(f"🎭 Fake upstream on http://{args.host}:{args.port} "
+          f"(latency {args.latency:g}±{args.jitter:g} ms, error rate {args.error_rate:g})")
+    print(f"   export MCP_UPSTREAM_URLS='{upstream_urls(f'http://{args.host}:{args.port}')}'")
+    uvicorn.run(upstream.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
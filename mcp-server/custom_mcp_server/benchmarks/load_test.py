@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Load test for multi-worker serving.
+Starts the server with 1..N workers in stateless mode, drives a CPU-bound
+tool over streamable HTTP at fixed concurrency and reports throughput,
+latency and scaling efficiency relative to one worker.
+
+Usage: python benchmarks/load_test.py [--workers 1,2,4] [--concurrency 32] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADERS = {
+    'Accept': 'application/json, text/event-stream',
+    'Content-Type': 'application/json',
+}
+
+DEFAULT_TEXT = " ".join(f"word{i % 5000} lorem ipsum dolor sit amet" for i in range(20000))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rpc(method, params, request_id=1):
+    return {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+
+
+def parse_response(response: httpx.Response):
+    """Return the JSON-RPC message from a JSON or SSE response body."""
+    if response.headers.get('content-type', '').startswith('text/event-stream'):
+        for line in response.text.splitlines():
+            if line.startswith('data:'):
+                return json.loads(line[5:])
+        raise ValueError("No data in event stream")
+    return response.json()
+
+
+def start_server(workers: int, port: int):
+    env = dict(os.environ, MCP_STATELESS_HTTP="1")
+    return subprocess.Popen(
+        [sys.executable, "main.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.post(url, headers=HEADERS, json=rpc("tools/list", {}))
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError("Server did not become ready")
+
+
+async def run_load(url: str, tool: str, arguments, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        async def worker(worker_id):
+            nonlocal errors
+            request_id = 0
+            while time.monotonic() < stop_at:
+                request_id += 1
+                payload = rpc("tools/call", {"name": tool, "arguments": arguments}, request_id)
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, headers=HEADERS, json=payload)
+                    message = parse_response(response)
+                    if "error" in message or message.get("result", {}).get("isError"):
+                        errors += 1
+                        continue
+                except (httpx.HTTPError, ValueError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    pick = lambda pct: latencies[min(int(len(latencies) * pct), len(latencies) - 1)] * 1000 if latencies else 0.0
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to test")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--tool", default="analyze_text")
+    parser.add_argument("--arguments", default=None, help="JSON tool arguments (default: large analyze_text input)")
+    args = parser.parse_args()
+
+    arguments = json.loads(args.arguments) if args.arguments else {"text": DEFAULT_TEXT, "analysis_type": "word_count"}
+    worker_counts = [int(value) for value in args.workers.split(',')]
+
+    print(f"Load test: {args.tool}, concurrency {args.concurrency}, {args.duration:.0f}s per run, "
+          f"{os.cpu_count()} CPUs")
+    print("=" * 78)
+    print(f"{'workers':>7}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errors':>6}  {'scaling':>8}")
+
+    baseline = None
+    for workers in worker_counts:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}/mcp"
+        server = start_server(workers, port)
+        try:
+            asyncio.run(wait_ready(url))
+            stats = asyncio.run(run_load(url, args.tool, arguments, args.concurrency, args.duration))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+        if baseline is None:
+            baseline = stats['throughput'] / workers
+        efficiency = stats['throughput'] / (baseline * workers) * 100 if baseline else 0.0
+        print(f"{workers:>7}  {stats['throughput']:>8.1f}  {stats['p50']:>8.1f}  {stats['p95']:>8.1f}  "
+              f"{stats['p99']:>8.1f}  {stats['errors']:>6}  {efficiency:>7.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,50 +4,225 @@ Custom MCP Server with Comprehensive Tools
 Provides file operations, web scraping, API integrations, system utilities, and data processing.
 """
 
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import sys
+import tempfile
+from typing import NamedTuple, Optional
+
 import uvicorn
 from mcp.server import FastMCP
 
-# Import all our tool modules
-from tools.file_operations import register_file_tools
-from tools.web_scraping import register_web_tools
-from tools.api_integrations import register_api_tools
-from tools.system_utilities import register_system_tools
-from tools.data_processing import register_data_tools
+from tools.executor import shutdown_process_pool
+from tools.admission import limit_tool
+from tools.cache import close_cache
+from tools.coalescing import coalesce_tool
+from tools.deadlines import deadline_tool
+from tools.instrumentation import InstrumentedMCP, metrics_endpoint, start_metrics_flusher
+from tools.profiling import profile_tool, profiling_endpoint
+
+SERVER_NAME = "Custom MCP Server with Comprehensive Tools"
+VALUES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "values.json")
+DEFAULT_PORT = 8002
+
+
+def default_port() -> int:
+    """Port from MCP_SERVER_PORT, then values.json ports.mcp_server, then 8002."""
+    if os.environ.get("MCP_SERVER_PORT"):
+        return int(os.environ["MCP_SERVER_PORT"])
+    try:
+        with open(VALUES_FILE, 'r', encoding='utf-8') as f:
+            return int(json.load(f)["ports"]["mcp_server"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return DEFAULT_PORT
+
+
+def env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes", "on")
+
+
+class ToolCategory(NamedTuple):
+    label: str
+    module: str
+    register: str
+    shutdown: Optional[str] = None
+
+
+# Tool modules are named rather than imported so a disabled category's
+# module (and its dependencies) is never loaded
+TOOL_CATEGORIES = {
+    "files": ToolCategory("File Operations (read, write, search, manage files)",
+                          "tools.file_operations", "register_file_tools"),
+    "web": ToolCategory("Web Scraping (extract content from websites)",
+                        "tools.web_scraping", "register_web_tools"),
+    "api": ToolCategory("API Integrations (weather, news, utilities)",
+                        "tools.api_integrations", "register_api_tools"),
+    "system": ToolCategory("System Utilities (commands, status, monitoring)",
+                           "tools.system_utilities", "register_system_tools", "shutdown_system_tools"),
+    "data": ToolCategory("Data Processing (CSV, JSON, text analysis)",
+                         "tools.data_processing", "register_data_tools"),
+    "admin": ToolCategory("Admin (slow-call profiling)",
+                          "tools.profiling", "register_profiling_tools"),
+}
+
+
+def enabled_categories(spec: Optional[str] = None):
+    """Category keys from a comma-separated spec (env MCP_TOOL_CATEGORIES), default all."""
+    spec = spec if spec is not None else os.environ.get("MCP_TOOL_CATEGORIES", "")
+    keys = [key.strip().lower() for key in spec.split(',') if key.strip()]
+    if not keys or keys == ["all"]:
+        return list(TOOL_CATEGORIES)
+    unknown = [key for key in keys if key not in TOOL_CATEGORIES]
+    if unknown:
+        raise ValueError(f"Unknown tool categories: {', '.join(unknown)} "
+                         f"(choose from {', '.join(TOOL_CATEGORIES)})")
+    return keys
+
+
+def create_mcp(stateless: bool = False, categories=None):
+    """Create the FastMCP server and register the enabled tool categories.
+
+    Returns the server and the shutdown hooks of the registered categories.
+    """
+    # Stateless HTTP keeps no per-session state in the process, so any
+    # worker can serve any request without session affinity
+    mcp = FastMCP(SERVER_NAME, stateless_http=stateless)
+
+    # Tools register through a proxy that wraps each one with call metrics,
+    # then a per-call deadline, then coalescing of identical in-flight calls
+    # to idempotent tools, then admission control (limits, queueing, sync
+    # tools moved to threads), then slow-call profiling around the tool
+    instrumented = InstrumentedMCP(mcp, wrappers=(deadline_tool, coalesce_tool, limit_tool, profile_tool))
+    shutdown_hooks = []
+    for key in categories or enabled_categories():
+        category = TOOL_CATEGORIES[key]
+        module = importlib.import_module(category.module)
+        getattr(module, category.register)(instrumented)
+        if category.shutdown:
+            shutdown_hooks.append(getattr(module, category.shutdown))
+    return mcp, shutdown_hooks
+
+
+def create_app():
+    """Build the Starlette app; used directly and as the uvicorn factory in worker processes."""
+    mcp, shutdown_hooks = create_mcp(stateless=env_flag("MCP_STATELESS_HTTP"))
+    app = mcp.streamable_http_app()
+    app.add_route("/metrics", metrics_endpoint, methods=["GET"])
+    app.add_route("/admin/profiling", profiling_endpoint, methods=["GET", "POST"])
+    start_metrics_flusher()
+
+    # Stop background samplers, flush metrics history, close pooled HTTP
+    # connections and cache backends and stop pool workers on shutdown
+    session_lifespan = app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        try:
+            async with session_lifespan(app):
+                yield
+        finally:
+            for shutdown in shutdown_hooks:
+                shutdown()
+            # Only loaded if a tool made an upstream request
+            http_client = sys.modules.get("tools.http_client")
+            if http_client is not None:
+                await http_client.close_http_clients()
+            close_cache()
+            shutdown_process_pool()
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=SERVER_NAME)
+    parser.add_argument("--host", default=os.environ.get("MCP_SERVER_HOST", "0.0.0.0"),
+                        help="Interface to bind (env MCP_SERVER_HOST, default 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=default_port(),
+                        help="Port to listen on (env MCP_SERVER_PORT, else values.json ports.mcp_server)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("MCP_SERVER_WORKERS", "1")),
+                        help="Number of worker processes (env MCP_SERVER_WORKERS, default 1)")
+    parser.add_argument("--stateless", action="store_true", default=env_flag("MCP_STATELESS_HTTP"),
+                        help="Serve streamable HTTP without sessions (always on with more than one worker)")
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=float(os.environ.get("MCP_GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds to let in-flight requests finish on shutdown (env MCP_GRACEFUL_TIMEOUT)")
+    parser.add_argument("--tools", default=os.environ.get("MCP_TOOL_CATEGORIES", "all"),
+                        help=f"Comma-separated tool categories to enable: {', '.join(TOOL_CATEGORIES)} "
+                             "(env MCP_TOOL_CATEGORIES, default all)")
+    return parser.parse_args(argv)
 
-# Initialize the MCP server
-mcp = FastMCP("Custom MCP Server with Comprehensive Tools")
 
 def main():
     """Main entry point for the MCP server."""
-    
+    args = parse_args()
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1")
+    try:
+        categories = enabled_categories(args.tools)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    # Worker processes build their app from the environment
+    os.environ["MCP_TOOL_CATEGORIES"] = ",".join(categories)
+    # Read by tools/executor.py so the workers' process pools split the cores
+    # between them instead of each sizing itself to the whole machine
+    os.environ["MCP_SERVER_WORKERS"] = str(args.workers)
+
+    # Sessions live in worker memory and uvicorn does not route by session
+    # id, so multiple workers require stateless mode
+    stateless = args.stateless or args.workers > 1
+    if stateless:
+        os.environ["MCP_STATELESS_HTTP"] = "1"
+    if args.workers > 1 and not os.environ.get("MCP_METRICS_MULTIPROC_DIR"):
+        # Workers share their metrics through this directory so /metrics shows totals
+        os.environ["MCP_METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="mcp-metrics-")
+    if args.workers > 1 and not os.environ.get("MCP_CACHE_BACKEND"):
+        # Per-process memory caches would miss most of the time; share one on disk
+        os.environ["MCP_CACHE_BACKEND"] = "sqlite"
+    if args.workers > 1 and not os.environ.get("MCP_CACHE_PATH"):
+        # Workers must agree on the file, so it can't be made per process; keep
+        # it in the private directory made above
+        os.environ["MCP_CACHE_PATH"] = os.path.join(os.environ["MCP_METRICS_MULTIPROC_DIR"], "cache.sqlite3")
+
     print("🚀 Initializing Custom MCP Server...")
     print("📚 Registering tool categories:")
-    
-    # Register all tool categories
-    print("  • File Operations (read, write, search, manage files)")
-    register_file_tools(mcp)
-    
-    print("  • Web Scraping (extract content from websites)")
-    register_web_tools(mcp)
-    
-    print("  • API Integrations (weather, news, utilities)")
-    register_api_tools(mcp)
-    
-    print("  • System Utilities (commands, status, monitoring)")
-    register_system_tools(mcp)
-    
-    print("  • Data Processing (CSV, JSON, text analysis)")
-    register_data_tools(mcp)
-    
-    print("\n✅ All tools registered successfully!")
-    print("\n🌐 Starting MCP Server with streamable HTTP transport")
-    print("🏠 Server URL: http://localhost:8002")
+    for key in categories:
+        print(f"  • {TOOL_CATEGORIES[key].label}")
+
+    uvicorn_options = {
+        'host': args.host,
+        'port': args.port,
+        'timeout_graceful_shutdown': args.graceful_timeout,
+    }
+
+    if args.workers > 1:
+        # Each worker process registers the tools itself via create_app()
+        print(f"\n🌐 Starting MCP Server with streamable HTTP transport ({args.workers} workers, stateless)")
+    else:
+        app = create_app()
+        print("\n✅ All tools registered successfully!")
+        mode = "stateless" if stateless else "sessions"
+        print(f"\n🌐 Starting MCP Server with streamable HTTP transport (1 worker, {mode})")
+
+    print(f"🏠 Server URL: http://localhost:{args.port}")
+    print(f"📈 Metrics: http://localhost:{args.port}/metrics")
     print("🔗 Compatible with Open Agent Platform")
     print("Press Ctrl+C to stop the server...")
-    
-    # Get the Starlette app and run it with uvicorn on port 8002
-    app = mcp.streamable_http_app()
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+
+    if args.workers > 1:
+        uvicorn.run(
+            "main:create_app",
+            factory=True,
+            workers=args.workers,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            **uvicorn_options,
+        )
+    else:
+        uvicorn.run(app, **uvicorn_options)
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
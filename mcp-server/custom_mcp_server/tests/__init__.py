@@ -0,0 +1,6 @@
+"""
+Tests for Custom MCP Server
+Checks of the self-contained building blocks (paging, admission, deadlines,
+caching, circuit breaking, port specs) that run without a server or network.
+Run with `python -m pytest -q` from the custom_mcp_server directory.
+"""
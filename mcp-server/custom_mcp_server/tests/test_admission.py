@@ -0,0 +1,112 @@
+"""Token buckets and concurrency gates in tools/admission.py."""
+
+import asyncio
+import time
+
+import pytest
+
+from tools import admission
+from tools.admission import Gate, OverloadedError, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    # Reservations queue up behind each other rather than all waiting 0.5s
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    clock.now += 100
+    assert bucket.tokens == 0
+    assert bucket.reserve() == 0.0
+    assert bucket.tokens == pytest.approx(1.0)
+
+
+def test_bucket_refund_returns_the_token(clock):
+    bucket = TokenBucket(rate=1.0, burst=1)
+    bucket.reserve()
+    assert bucket.reserve() == pytest.approx(1.0)
+    bucket.refund()
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_burst_is_at_least_one():
+    assert TokenBucket(rate=5.0, burst=0).burst == 1
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_gate_queues_then_rejects_when_the_queue_is_full():
+    async def scenario():
+        gate = Gate(max_concurrent=1, max_queued=1)
+        deadline = time.monotonic() + 5
+        await gate.acquire(deadline, "tool", "tool")
+        waiter = asyncio.create_task(gate.acquire(deadline, "tool", "tool"))
+        await asyncio.sleep(0)
+        assert (gate.active, gate.waiting) == (1, 1)
+
+        with pytest.raises(OverloadedError, match="1 calls running and 1 queued"):
+            await gate.acquire(deadline, "tool", "tool")
+
+        gate.release()
+        await waiter
+        assert (gate.active, gate.waiting) == (1, 0)
+        gate.release()
+        assert gate.idle
+
+    run(scenario())
+
+
+def test_gate_rejects_after_waiting_until_the_deadline():
+    async def scenario():
+        gate = Gate(max_concurrent=1, max_queued=10)
+        await gate.acquire(time.monotonic() + 5, "tool", "tool")
+        with pytest.raises(OverloadedError, match="timed out waiting"):
+            await gate.acquire(time.monotonic() + 0.05, "tool", "tool")
+        assert gate.waiting == 0
+
+    run(scenario())
+
+
+def test_gate_rejects_rate_limited_calls_that_would_miss_their_deadline():
+    async def scenario():
+        gate = Gate(max_concurrent=0, max_queued=0, rate=0.1, burst=1)
+        await gate.acquire(time.monotonic() + 1, "tool", "tool")
+        with pytest.raises(OverloadedError, match="Rate limit"):
+            await gate.acquire(time.monotonic() + 1, "tool", "tool")
+        # The rejected call gave its token back
+        assert gate.bucket.tokens == pytest.approx(0.0, abs=0.01)
+
+    run(scenario())
+
+
+def test_gate_without_limits_admits_everything():
+    async def scenario():
+        gate = Gate(max_concurrent=0, max_queued=0)
+        for _ in range(100):
+            await gate.acquire(time.monotonic() + 1, "tool", "tool")
+        assert gate.active == 100
+
+    run(scenario())
@@ -0,0 +1,71 @@
+"""API tools in tools/api_integrations.py against a slow local upstream."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from tools import api_integrations, deadlines, http_client
+from tools.cache import Cache, MemoryBackend
+
+STORY_DELAY = 0.3
+
+
+class SlowHackerNews(BaseHTTPRequestHandler):
+    """Top stories at once; each story after STORY_DELAY seconds."""
+
+    def do_GET(self):
+        if self.path.endswith("/topstories.json"):
+            body = list(range(1, 11))
+        else:
+            time.sleep(STORY_DELAY)
+            story_id = int(self.path.rsplit("/", 1)[1].split(".")[0])
+            body = {"title": f"Story {story_id}", "score": story_id, "descendants": 0}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def get_news(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHackerNews)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setitem(http_client.UPSTREAMS, "hackernews", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(api_integrations, "get_cache", lambda: Cache(MemoryBackend()))
+    mcp = FastMCP("test")
+    api_integrations.register_api_tools(mcp)
+    yield mcp._tool_manager.get_tool("get_news").fn
+    server.shutdown()
+    server.server_close()
+
+
+def with_deadline(seconds, fn, **kwargs):
+    token = deadlines._current.set(deadlines.Deadline(seconds))
+    try:
+        return fn(**kwargs)
+    finally:
+        deadlines._current.reset(token)
+
+
+def test_get_news_keeps_stories_fetched_before_the_deadline(get_news):
+    # Enough time for two stories; the deadline lands during the third request
+    text = with_deadline(STORY_DELAY * 2.5, get_news, page_size=5)
+    assert "1. Story 1" in text and "2. Story 2" in text
+    assert "Story 3" not in text
+    assert "(Stopped after 2 of 5 stories: deadline reached)" in text
+
+
+def test_get_news_without_a_deadline_fetches_every_story(get_news):
+    text = get_news(page_size=2)
+    assert "2. Story 2" in text
+    assert "Stopped" not in text
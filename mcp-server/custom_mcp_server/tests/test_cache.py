@@ -0,0 +1,226 @@
+"""Cache backends and the Cache front end in tools/cache.py."""
+
+import asyncio
+import os
+import sqlite3
+import stat
+import tempfile
+import time
+
+import pytest
+
+from tools import cache as cache_module
+from tools.cache import Cache, MemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend(max_bytes=1024 * 1024)
+    else:
+        backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_set_get_delete(backend):
+    assert backend.get("k") is None
+    backend.set("k", b"value", 60)
+    assert backend.get("k") == b"value"
+    backend.set("k", b"other", 60)
+    assert backend.get("k") == b"other"
+    backend.delete("k")
+    assert backend.get("k") is None
+
+
+def test_entries_expire(backend, clock):
+    backend.set("k", b"value", 10)
+    clock[0] += 9
+    assert backend.get("k") == b"value"
+    clock[0] += 2
+    assert backend.get("k") is None
+
+
+def test_add_only_stores_absent_or_expired_keys(backend, clock):
+    assert backend.add("lock", b"1", 10)
+    assert not backend.add("lock", b"2", 10)
+    assert backend.get("lock") == b"1"
+    clock[0] += 11
+    assert backend.add("lock", b"3", 10)
+    assert backend.get("lock") == b"3"
+
+
+def test_values_larger_than_the_cache_are_not_stored(backend):
+    assert not backend.set("big", b"x" * (2 * 1024 * 1024), 60)
+    assert backend.get("big") is None
+    assert backend.set("small", b"x", 60)
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_bytes=30)
+    backend.set("a", b"x" * 10, 60)
+    backend.set("b", b"x" * 10, 60)
+    backend.set("c", b"x" * 10, 60)
+    backend.get("a")
+    backend.set("d", b"x" * 10, 60)
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.size == 30
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    try:
+        first.set("k", b"value", 60)
+        assert second.get("k") == b"value"
+        assert first.add("lock", b"1", 60)
+        assert not second.add("lock", b"1", 60)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_sqlite_add_reports_a_locked_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend, other = SQLiteBackend(path), SQLiteBackend(path)
+    try:
+        backend._connect().execute("PRAGMA busy_timeout = 0")
+        holder = other._connect()
+        holder.execute("BEGIN IMMEDIATE")
+        # The lock error itself, not a failed ROLLBACK of a transaction never begun
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            backend.add("lock", b"1", 60)
+        holder.execute("ROLLBACK")
+        assert backend.add("lock", b"1", 60)
+    finally:
+        backend.close()
+        other.close()
+
+
+def test_sqlite_default_path_is_in_a_private_directory():
+    backend = SQLiteBackend(None)
+    try:
+        directory = os.path.dirname(backend.path)
+        assert directory != tempfile.gettempdir()
+        assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+        backend.set("k", b"value", 60)
+        assert backend.get("k") == b"value"
+    finally:
+        backend.close()
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def test_sqlite_evict_trims_to_max_bytes(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=20000)
+    try:
+        for i in range(300):
+            backend.set(f"k{i}", b"x" * 100, 60)
+        backend.evict()
+        total = backend._connect().execute("SELECT SUM(size) FROM cache").fetchone()[0]
+        assert total <= 18000
+        assert backend.get("k0") is None
+        assert backend.get("k299") == b"x" * 100
+    finally:
+        backend.close()
+
+
+def test_only_cross_process_backends_are_shared(tmp_path):
+    assert not Cache(MemoryBackend()).shared
+    assert not Cache(None).shared
+    sqlite = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    assert Cache(sqlite).shared
+    sqlite.close()
+
+
+def test_get_or_compute_computes_once(backend):
+    cache = Cache(backend, ttls={"ns": 60})
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"answer": 42}
+
+    assert cache.get_or_compute("ns", ["a", 1], compute) == {"answer": 42}
+    assert cache.get_or_compute("ns", ["a", 1], compute) == {"answer": 42}
+    assert cache.get_or_compute("ns", ["a", 2], compute) == {"answer": 42}
+    assert len(calls) == 2
+
+
+def test_uncacheable_values_and_errors_are_not_stored(backend):
+    cache = Cache(backend, ttls={"ns": 60})
+    assert cache.get_or_compute("ns", ["k"], lambda: "partial", cacheable=lambda value: False) == "partial"
+    assert cache.get("ns", ["k"]) is None
+    with pytest.raises(ZeroDivisionError):
+        cache.get_or_compute("ns", ["k"], lambda: 1 / 0)
+    assert cache.get("ns", ["k"]) is None
+    # The failed call released its lock
+    assert cache.get_or_compute("ns", ["k"], lambda: "ok") == "ok"
+
+
+def test_zero_ttl_disables_a_namespace(backend):
+    cache = Cache(backend, ttls={"off": 0})
+    values = iter([1, 2])
+    assert cache.get_or_compute("off", ["k"], lambda: next(values)) == 1
+    assert cache.get_or_compute("off", ["k"], lambda: next(values)) == 2
+
+
+def test_set_and_get(backend):
+    cache = Cache(backend, ttls={"ns": 60})
+    cache.set("ns", ["k"], [1, "two"])
+    assert cache.get("ns", ["k"]) == [1, "two"]
+    assert cache.get("ns", ["other"]) is None
+    assert Cache(None).get("ns", ["k"]) is None
+
+
+def test_keys_are_namespaced_and_order_independent():
+    cache = Cache(MemoryBackend(), prefix="p")
+    assert cache.key("ns", {"a": 1, "b": 2}) == cache.key("ns", {"b": 2, "a": 1})
+    assert cache.key("ns", ["x"]).startswith("p:ns:")
+    assert cache.key("ns", ["x"]) != cache.key("other", ["x"])
+
+
+def test_aget_or_compute(backend):
+    cache = Cache(backend, ttls={"ns": 60})
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        first = await cache.aget_or_compute("ns", ["k"], compute)
+        second = await cache.aget_or_compute("ns", ["k"], compute)
+        return first, second
+
+    assert asyncio.run(scenario()) == ("value", "value")
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_wait_for_the_first(tmp_path):
+    cache = Cache(SQLiteBackend(str(tmp_path / "cache.sqlite3")), ttls={"ns": 60})
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(cache.aget_or_compute("ns", ["k"], compute) for _ in range(5)))
+
+    try:
+        assert asyncio.run(scenario()) == ["value"] * 5
+        assert len(calls) == 1
+    finally:
+        cache.close()
@@ -0,0 +1,136 @@
+"""Single-flight coalescing of identical tool calls in tools/coalescing.py."""
+
+import asyncio
+
+import pytest
+from mcp.server.fastmcp import Context
+
+from tools import coalescing
+from tools.coalescing import READ_ONLY, coalesce_tool
+from tools.deadlines import DeadlineExceeded
+from tools.instrumentation import REGISTRY, TOOL_ANNOTATIONS
+
+
+@pytest.fixture
+def tool(monkeypatch):
+    """A slow read-only tool, coalesced, with a log of the calls that actually ran."""
+    monkeypatch.setitem(TOOL_ANNOTATIONS, "slow_tool", READ_ONLY)
+    runs = []
+
+    async def slow_tool(query: str, fail: str = ""):
+        runs.append(query)
+        await asyncio.sleep(0.05)
+        if fail == "deadline" and len(runs) == 1:
+            raise DeadlineExceeded("out of time")
+        if fail == "error":
+            raise ValueError("upstream broke")
+        return f"result {len(runs)}"
+
+    return coalesce_tool(slow_tool, "slow_tool"), runs
+
+
+def coalesced_count():
+    return REGISTRY.value("mcp_tool_coalesced_total", {"tool": "slow_tool"})
+
+
+def test_identical_concurrent_calls_run_once(tool):
+    wrapped, runs = tool
+    before = coalesced_count()
+
+    async def calls():
+        return await asyncio.gather(*(wrapped("python") for _ in range(5)), wrapped(query="python"))
+
+    assert asyncio.run(calls()) == ["result 1"] * 6
+    assert runs == ["python"]
+    assert coalesced_count() - before == 5
+
+
+def test_different_arguments_run_separately(tool):
+    wrapped, runs = tool
+
+    async def calls():
+        return await asyncio.gather(wrapped("a"), wrapped("b"))
+
+    asyncio.run(calls())
+    assert sorted(runs) == ["a", "b"]
+
+
+def test_finished_calls_are_not_reused(tool):
+    wrapped, runs = tool
+    asyncio.run(wrapped("python"))
+    assert asyncio.run(wrapped("python")) == "result 2"
+
+
+def test_errors_are_shared(tool):
+    wrapped, runs = tool
+
+    async def calls():
+        return await asyncio.gather(wrapped("x", fail="error"), wrapped("x", fail="error"),
+                                    return_exceptions=True)
+
+    results = asyncio.run(calls())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert runs == ["x"]
+
+
+def test_waiters_rerun_after_the_first_call_runs_out_of_time(tool):
+    wrapped, runs = tool
+
+    async def calls():
+        return await asyncio.gather(wrapped("x", fail="deadline"), wrapped("x", fail="deadline"),
+                                    return_exceptions=True)
+
+    first, second = asyncio.run(calls())
+    # The deadline was the first caller's own; the waiter ran the call itself
+    assert isinstance(first, DeadlineExceeded)
+    assert second == "result 2"
+    assert runs == ["x", "x"]
+
+
+def test_waiters_rerun_after_the_first_call_is_cancelled(tool):
+    wrapped, runs = tool
+
+    async def calls():
+        first = asyncio.ensure_future(wrapped("x"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(wrapped("x"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(calls()) == "result 2"
+    assert runs == ["x", "x"]
+
+
+def test_calls_with_a_context_are_not_shared(monkeypatch):
+    monkeypatch.setitem(TOOL_ANNOTATIONS, "ctx_tool", READ_ONLY)
+    runs = []
+
+    async def ctx_tool(query: str, ctx: Context = None):
+        runs.append(query)
+        await asyncio.sleep(0.01)
+
+    wrapped = coalesce_tool(ctx_tool, "ctx_tool")
+
+    async def calls():
+        await asyncio.gather(wrapped("x", ctx=Context()), wrapped("x", ctx=Context()))
+
+    asyncio.run(calls())
+    assert runs == ["x", "x"]
+
+
+def test_only_idempotent_async_tools_are_wrapped(monkeypatch):
+    async def plain(query: str):
+        return query
+
+    def sync(query: str):
+        return query
+
+    monkeypatch.setitem(TOOL_ANNOTATIONS, "plain", None)
+    monkeypatch.setitem(TOOL_ANNOTATIONS, "sync", READ_ONLY)
+    assert coalesce_tool(plain, "plain") is plain
+    assert coalesce_tool(sync, "sync") is sync
+
+    # MCP_COALESCE_TOOLS overrides the annotation either way
+    monkeypatch.setattr(coalescing, "COALESCE_TOOLS", {"plain": True})
+    assert coalesce_tool(plain, "plain") is not plain
@@ -0,0 +1,72 @@
+"""Per-call deadlines in tools/deadlines.py."""
+
+import math
+import threading
+import time
+
+import pytest
+from mcp.server.fastmcp.exceptions import ToolError
+
+from tools import deadlines
+from tools.deadlines import Deadline, DeadlineExceeded, check_expiry, current_deadline
+
+
+def test_no_timeout_never_expires():
+    deadline = Deadline()
+    assert deadline.remaining() == math.inf
+    assert not deadline.expired
+    assert deadline.wall_clock() is None
+    assert deadline.cap(5) == 5
+    deadline.check()
+
+
+def test_remaining_counts_down(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(deadlines.time, "monotonic", lambda: now[0])
+    deadline = Deadline(10)
+    assert deadline.remaining() == pytest.approx(10)
+    now[0] += 4
+    assert deadline.remaining() == pytest.approx(6)
+    assert deadline.cap(30) == pytest.approx(6)
+    assert deadline.cap(1) == 1
+    now[0] += 6
+    assert deadline.expired
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded, match="Deadline of 10s exceeded"):
+        deadline.check()
+    with pytest.raises(DeadlineExceeded):
+        deadline.cap(1)
+
+
+def test_cancel_is_seen_from_other_threads():
+    deadline = Deadline(60)
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(deadline.expired))
+    deadline.cancel()
+    worker.start()
+    worker.join()
+    assert seen == [True]
+    assert deadline.cancelled
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded, match="cancelled"):
+        deadline.check()
+
+
+def test_wall_clock_tracks_remaining_time():
+    deadline = Deadline(30)
+    assert deadline.wall_clock() == pytest.approx(time.time() + 30, abs=1)
+
+
+def test_check_expiry():
+    check_expiry(None)
+    check_expiry(time.time() + 60)
+    with pytest.raises(DeadlineExceeded):
+        check_expiry(time.time() - 1)
+
+
+def test_outside_a_call_there_is_no_deadline():
+    assert current_deadline().remaining() == math.inf
+
+
+def test_deadline_exceeded_is_a_tool_error():
+    assert issubclass(DeadlineExceeded, ToolError)
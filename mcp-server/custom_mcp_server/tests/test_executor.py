@@ -0,0 +1,48 @@
+"""Offloading in tools/executor.py: small inputs inline, large ones in the process pool."""
+
+import asyncio
+import os
+
+import pytest
+
+from tools import executor
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools():
+    yield
+    executor.shutdown_process_pool()
+
+
+def run(size, **kwargs):
+    return asyncio.run(executor.run_cpu_bound(os.getpid, size=size, **kwargs))
+
+
+def test_small_inputs_run_inline(monkeypatch):
+    monkeypatch.setattr(executor, "OFFLOAD_THRESHOLD", 100)
+    assert run(99) == os.getpid()
+    assert executor._pool is None
+
+
+def test_large_inputs_run_in_the_process_pool(monkeypatch):
+    monkeypatch.setattr(executor, "OFFLOAD_THRESHOLD", 100)
+    monkeypatch.setattr(executor, "PROCESS_POOL_WORKERS", 1)
+    worker = run(100)
+    assert worker != os.getpid()
+    # The pool is created once and reused
+    assert run(10**6) == worker
+    assert run(50, threshold=10) == worker
+
+
+def test_no_pool_workers_means_always_inline(monkeypatch):
+    monkeypatch.setattr(executor, "PROCESS_POOL_WORKERS", 0)
+    assert run(10**9) == os.getpid()
+    assert executor._pool is None
+
+
+def test_pool_size_splits_cores_between_server_workers(monkeypatch):
+    monkeypatch.setattr(executor.os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("MCP_SERVER_WORKERS", "4")
+    assert executor._default_pool_size() == 2
+    monkeypatch.setenv("MCP_SERVER_WORKERS", "16")
+    assert executor._default_pool_size() == 1
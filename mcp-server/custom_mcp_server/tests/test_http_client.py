@@ -0,0 +1,190 @@
+"""The per-host circuit breaker and the DNS-caching transport in tools/http_client.py."""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from mcp.server.fastmcp.exceptions import ToolError
+
+from tools import http_client
+from tools.http_client import BREAKER_COOLDOWN, BREAKER_FAILURES, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(http_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+def trip(breaker):
+    for _ in range(BREAKER_FAILURES):
+        breaker.before_call()
+        breaker.record(False)
+
+
+def test_stays_closed_below_the_failure_threshold(clock):
+    breaker = CircuitBreaker("example.com")
+    for _ in range(BREAKER_FAILURES - 1):
+        breaker.before_call()
+        breaker.record(False)
+    breaker.before_call()
+    assert breaker.opened_at is None
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("example.com")
+    for _ in range(BREAKER_FAILURES - 1):
+        breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.failures == 1
+    assert breaker.opened_at is None
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("example.com")
+    trip(breaker)
+    with pytest.raises(CircuitOpenError, match="example.com is failing"):
+        breaker.before_call()
+    clock[0] += BREAKER_COOLDOWN - 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("example.com")
+    trip(breaker)
+    clock[0] += BREAKER_COOLDOWN
+    breaker.before_call()
+    assert breaker.trial_in_flight
+    # Everyone else waits for the trial's outcome
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes(clock):
+    breaker = CircuitBreaker("example.com")
+    trip(breaker)
+    clock[0] += BREAKER_COOLDOWN
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.opened_at is None
+    assert breaker.failures == 0
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_for_another_cooldown(clock):
+    breaker = CircuitBreaker("example.com")
+    trip(breaker)
+    clock[0] += BREAKER_COOLDOWN
+    breaker.before_call()
+    breaker.record(False)
+    assert breaker.opened_at == clock[0]
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker("example.com")
+    trip(breaker)
+    clock[0] += BREAKER_COOLDOWN
+    breaker.before_call()
+    breaker.abandon()
+    breaker.before_call()
+    assert breaker.trial_in_flight
+
+
+def test_circuit_open_is_a_tool_error():
+    assert issubclass(CircuitOpenError, ToolError)
+
+
+class EchoHost(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.headers["Host"].encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHost)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dns(monkeypatch):
+    cache = http_client.DNSCache(ttl=60)
+    lookups = []
+    getaddrinfo = http_client.socket.getaddrinfo
+
+    def counting_getaddrinfo(host, *args, **kwargs):
+        # Connecting to an address also calls getaddrinfo, without a lookup
+        if not http_client._is_ip(host):
+            lookups.append(host)
+        return getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(http_client, "DNS_CACHE", cache)
+    monkeypatch.setattr(http_client.socket, "getaddrinfo", counting_getaddrinfo)
+    return cache, lookups
+
+
+def test_transport_resolves_once_and_keeps_the_host_header(server, dns):
+    cache, lookups = dns
+    with httpx.Client(transport=http_client._CachingTransport(httpx.HTTPTransport())) as client:
+        for _ in range(3):
+            response = client.get(f"http://localhost:{server}/")
+            assert response.text == f"localhost:{server}"
+            assert response.url.host == "localhost"
+    assert lookups == ["localhost"]
+    assert cache.get("localhost", server)
+
+
+def test_transport_fails_over_to_the_next_address(server, dns):
+    cache, _ = dns
+    # Nothing listens on the IPv6 loopback
+    cache.put("localhost", server, ["::1", "127.0.0.1"])
+
+    async def fetch():
+        transport = http_client._AsyncCachingTransport(httpx.AsyncHTTPTransport())
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.get(f"http://localhost:{server}/")
+
+    assert asyncio.run(fetch()).text == f"localhost:{server}"
+
+
+def test_transport_forgets_addresses_that_all_fail(server, dns):
+    cache, _ = dns
+    cache.put("localhost", server, ["::1"])
+    with httpx.Client(transport=http_client._CachingTransport(httpx.HTTPTransport())) as client:
+        with pytest.raises(httpx.ConnectError):
+            client.get(f"http://localhost:{server}/")
+    assert cache.get("localhost", server) is None
+
+
+def test_tls_requests_keep_the_hostname_for_sni(dns):
+    cache, _ = dns
+    cache.put("example.com", 443, ["192.0.2.7"])
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200)
+
+    transport = http_client._CachingTransport(httpx.MockTransport(handler))
+    with httpx.Client(transport=transport) as client:
+        client.get("https://example.com/path?q=1")
+    (request,) = sent
+    assert str(request.url) == "https://192.0.2.7/path?q=1"
+    assert request.headers["Host"] == "example.com"
+    assert request.extensions["sni_hostname"] == "example.com"
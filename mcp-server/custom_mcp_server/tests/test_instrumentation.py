@@ -0,0 +1,94 @@
+"""Metrics in tools/instrumentation.py: histograms, the registry and merging workers' snapshots."""
+
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from tools import executor, instrumentation
+from tools.instrumentation import Histogram, MetricsRegistry
+
+DEAD_PID = 2**22 + 12345  # above the default pid_max, so never a live process
+
+
+def registry():
+    metrics = MetricsRegistry()
+    metrics.describe("calls_total", "counter", "Calls")
+    metrics.describe("in_flight", "gauge", "In flight")
+    metrics.describe("latency_seconds", "histogram", "Latency", (0.1, 1.0))
+    return metrics
+
+
+def test_histogram_buckets_are_upper_bounds():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 7.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1]
+    assert (histogram.count, histogram.sum) == (5, pytest.approx(8.65))
+
+
+def test_histogram_merge_ignores_other_buckets():
+    histogram = Histogram((0.1, 1.0))
+    histogram.merge_dict({"buckets": [0.1, 1.0], "counts": [1, 0, 2], "sum": 9.0, "count": 3})
+    histogram.merge_dict({"buckets": [5.0], "counts": [4, 4], "sum": 1.0, "count": 8})
+    assert (histogram.counts, histogram.count, histogram.sum) == ([1, 0, 2], 3, 9.0)
+
+
+def test_registry_renders_prometheus_text():
+    metrics = registry()
+    metrics.inc("calls_total", {"tool": "a"})
+    metrics.inc("calls_total", {"tool": "a"})
+    metrics.add("in_flight", {"tool": "a"}, 1)
+    metrics.observe("latency_seconds", {"tool": "a"}, 0.5)
+    assert metrics.value("calls_total", {"tool": "a"}) == 2
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE calls_total counter" in lines
+    assert 'calls_total{tool="a"} 2' in lines
+    assert 'in_flight{tool="a"} 1' in lines
+    assert 'latency_seconds_bucket{tool="a",le="0.1"} 0' in lines
+    assert 'latency_seconds_bucket{tool="a",le="1"} 1' in lines
+    assert 'latency_seconds_bucket{tool="a",le="+Inf"} 1' in lines
+    assert 'latency_seconds_count{tool="a"} 1' in lines
+
+
+def test_render_merges_other_workers_snapshots(tmp_path):
+    this_worker, other_worker = registry(), registry()
+    this_worker.inc("calls_total", {"tool": "a"})
+    other_worker.inc("calls_total", {"tool": "a"}, 2)
+    other_worker.add("in_flight", {"tool": "a"}, 3)
+    other_worker.observe("latency_seconds", {"tool": "a"}, 0.05)
+    snapshot = json.dumps(other_worker.snapshot())
+    # A live worker (our parent) and one that has exited
+    (tmp_path / f"{os.getppid()}.json").write_text(snapshot)
+    (tmp_path / f"{DEAD_PID}.json").write_text(snapshot)
+    (tmp_path / "junk.json").write_text("{")
+    this_worker.write_snapshot(str(tmp_path))
+
+    lines = this_worker.render(str(tmp_path)).splitlines()
+    # Our own snapshot file is not counted twice
+    assert 'calls_total{tool="a"} 5' in lines
+    # Exited workers' gauges no longer apply
+    assert 'in_flight{tool="a"} 3' in lines
+    assert 'latency_seconds_count{tool="a"} 2' in lines
+
+
+def test_metrics_endpoint_renders_off_the_event_loop(monkeypatch, tmp_path):
+    threads = []
+    render = instrumentation._render_metrics
+
+    def recording_render():
+        threads.append(threading.current_thread().name)
+        return render()
+
+    monkeypatch.setattr(instrumentation, "METRICS_MULTIPROC_DIR", str(tmp_path))
+    monkeypatch.setattr(instrumentation, "_render_metrics", recording_render)
+    try:
+        response = asyncio.run(instrumentation.metrics_endpoint(None))
+    finally:
+        executor.shutdown_process_pool()
+    assert b"# TYPE mcp_tool_calls_total counter" in response.body
+    assert threads and threads[0].startswith("tool")
+    assert (tmp_path / f"{os.getpid()}.json").exists()
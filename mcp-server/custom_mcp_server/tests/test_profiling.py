@@ -0,0 +1,110 @@
+"""Slow-call profiling in tools/profiling.py: arming, the threshold and admin auth."""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from tools import executor, profiling
+from tools.profiling import SlowCallProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = SlowCallProfiler(str(tmp_path), threshold_ms=200, interval_ms=1)
+    yield profiler
+    executor.shutdown_process_pool()
+
+
+def test_calls_arm_after_part_of_the_threshold(profiler):
+    call = profiler.begin("tool", {}, is_async=False)
+    assert call.armed_at - call.started == pytest.approx(0.1)
+    profiler.end(call)
+
+    profiler.always_on.add("tool")
+    call = profiler.begin("tool", {}, is_async=False)
+    assert call.armed_at == call.started
+    profiler.end(call)
+
+
+def test_fast_calls_are_neither_sampled_nor_written(profiler):
+    call = profiler.begin("tool", {"x": 1}, is_async=False)
+    time.sleep(0.05)
+    assert profiler.end(call) is None
+    assert not call.samples
+    assert profiler.profiles() == []
+
+
+def test_slow_calls_are_sampled_and_written(profiler):
+    call = profiler.begin("slow_tool", {"path": "/tmp"}, is_async=False)
+    time.sleep(0.25)
+    path = profiler.end(call)
+    assert path and "slow_tool" in path
+    assert call.samples
+    # Sampling only started once the call was armed
+    assert sum(call.samples.values()) < 0.25 / profiler.interval
+    text = open(path, encoding="utf-8").read()
+    assert "# reason: exceeded 200 ms threshold" in text
+    assert "# arguments: path='/tmp'" in text
+    assert "test_profiling.py:test_slow_calls_are_sampled_and_written" in text
+
+
+def test_always_on_tools_are_written_however_fast(profiler):
+    profiler.configure("tool", always_on=True)
+    call = profiler.begin("tool", {}, is_async=False)
+    assert profiler.end(call)
+    assert json.load(open(profiler._settings_path()))["always_on"] == ["tool"]
+
+
+def test_async_calls_are_written_from_the_thread_pool(profiler, monkeypatch):
+    threads = []
+    write = profiler._write
+
+    def recording_write(*args):
+        threads.append(threading.current_thread().name)
+        return write(*args)
+
+    monkeypatch.setattr(profiler, "_write", recording_write)
+    profiler.always_on.add("tool")
+    call = profiler.begin("tool", {}, is_async=True)
+    assert profiler.end(call) is None
+    executor.get_thread_pool().shutdown(wait=True)
+    assert threads[0].startswith("tool")
+    assert len(profiler.profiles()) == 1
+
+
+class FakeRequest:
+    method = "GET"
+
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def endpoint_status(headers):
+    return asyncio.run(profiling.profiling_endpoint(FakeRequest(headers))).status_code
+
+
+def test_admin_controls_fail_closed_without_a_token(monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", None)
+    assert not profiling._authorized({})
+    assert not profiling._authorized({"authorization": "Bearer "})
+    assert endpoint_status({}) == 403
+
+    mcp = FastMCP("test")
+    profiling.register_profiling_tools(mcp)
+    assert not mcp._tool_manager.list_tools()
+
+
+def test_admin_controls_need_the_bearer_token(monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert profiling._authorized({"authorization": "Bearer secret"})
+    assert not profiling._authorized({"authorization": "Bearer wrong"})
+    assert endpoint_status({}) == 401
+    assert endpoint_status({"authorization": "Bearer secret"}) == 200
+
+    mcp = FastMCP("test")
+    profiling.register_profiling_tools(mcp)
+    assert [tool.name for tool in mcp._tool_manager.list_tools()] == ["configure_profiling"]
@@ -0,0 +1,195 @@
+"""Paging, cursors and byte budgets in tools/responses.py."""
+
+import asyncio
+import os
+from dataclasses import dataclass
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
+
+from tools import data_processing, file_operations, responses
+from tools.cache import Cache, SQLiteBackend
+
+
+@dataclass(slots=True)
+class Entry:
+    name: str
+    size: int = None
+
+
+ITEMS = [Entry(f"file{i:03}.txt", i) for i in range(100)]
+
+
+@pytest.fixture(autouse=True)
+def cursors(monkeypatch):
+    store = responses.CursorStore()
+    monkeypatch.setattr(responses, "CURSORS", store)
+    return store
+
+
+def first_page(**kwargs):
+    return responses.paginate("test_tool", ITEMS, title="Files:", render=lambda entry: entry.name,
+                              serialize=lambda entry: entry, **kwargs)
+
+
+def walk(result, **kwargs):
+    """Items of every page starting from `result`, following next_cursor."""
+    items = list(result.structuredContent["items"])
+    while (cursor := result.structuredContent["next_cursor"]) is not None:
+        result = responses.page("test_tool", cursor, **kwargs)
+        items.extend(result.structuredContent["items"])
+    return items
+
+
+def test_first_page_respects_limit():
+    result = first_page(limit=10)
+    structured = result.structuredContent
+    assert structured["total"] == 100
+    assert structured["offset"] == 0
+    assert [item["name"] for item in structured["items"]] == [f"file{i:03}.txt" for i in range(10)]
+    assert structured["next_cursor"].endswith(".10")
+    assert "file009.txt" in result.content[0].text
+    assert "Showing 1-10 of 100" in result.content[0].text
+
+
+def test_cursor_pages_through_everything_once():
+    items = walk(first_page(limit=7), limit=7)
+    assert [item["name"] for item in items] == [entry.name for entry in ITEMS]
+
+
+def test_byte_budget_splits_pages():
+    result = first_page(max_bytes=responses.MIN_MAX_BYTES, output_format="json")
+    assert 0 < len(result.structuredContent["items"]) < 100
+    assert len(walk(result, max_bytes=responses.MIN_MAX_BYTES)) == 100
+
+
+def test_single_page_has_no_cursor_or_footer():
+    result = responses.paginate("test_tool", ITEMS[:3], title="Files:", render=lambda entry: entry.name)
+    assert result.structuredContent["next_cursor"] is None
+    assert "Showing" not in result.content[0].text
+
+
+def test_none_fields_are_dropped_from_items():
+    result = responses.paginate("test_tool", [Entry("a")], title="Files:", render=lambda entry: entry.name)
+    assert result.structuredContent["items"] == [{"name": "a"}]
+
+
+def test_structured_format_leaves_items_out_of_the_text():
+    result = first_page(limit=5, output_format="structured")
+    assert "file000.txt" not in result.content[0].text
+    assert len(result.structuredContent["items"]) == 5
+
+
+def test_json_text_body():
+    result = responses.paginate("test_tool", [1, 2], title="Rows", render=str, text_body="json_array")
+    assert "[\n1,\n2\n]" in result.content[0].text
+
+
+def test_unknown_output_format_is_rejected():
+    with pytest.raises(ToolError):
+        first_page(output_format="xml")
+
+
+@pytest.mark.parametrize("cursor", ["nodot", "key.notanumber", ".5"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ToolError, match="Invalid cursor"):
+        responses.page("test_tool", cursor)
+
+
+def test_cursor_is_bound_to_its_tool():
+    cursor = first_page(limit=5).structuredContent["next_cursor"]
+    with pytest.raises(ToolError, match="unknown or has expired"):
+        responses.page("other_tool", cursor)
+
+
+def test_expired_cursor_is_rejected(monkeypatch):
+    monkeypatch.setattr(responses, "CURSORS", responses.CursorStore(ttl=-1))
+    cursor = first_page(limit=5).structuredContent["next_cursor"]
+    with pytest.raises(ToolError, match="unknown or has expired"):
+        responses.page("test_tool", cursor)
+
+
+def test_cursor_store_is_lru_bounded():
+    store = responses.CursorStore(max_entries=2)
+    keys = [store.save("test_tool", {"n": n}) for n in range(3)]
+    assert len(store) == 2
+    with pytest.raises(ToolError):
+        store.load("test_tool", keys[0])
+    assert store.load("test_tool", keys[2]) == {"n": 2}
+
+
+def test_cursors_in_a_shared_cache_work_without_local_state(monkeypatch, tmp_path, cursors):
+    cache = Cache(SQLiteBackend(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(responses, "get_cache", lambda: cache)
+    try:
+        result = first_page(limit=10)
+        assert len(cursors) == 0
+        # Another worker has none of the callables; the stored state is enough
+        items = walk(result, limit=10)
+        assert [item["name"] for item in items] == [entry.name for entry in ITEMS]
+        text = responses.page("test_tool", result.structuredContent["next_cursor"], limit=2).content[0].text
+        assert "file010.txt\nfile011.txt" in text
+    finally:
+        cache.close()
+
+
+def test_state_too_large_for_the_shared_cache_stays_with_this_worker(monkeypatch, tmp_path, cursors):
+    cache = Cache(SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=512))
+    monkeypatch.setattr(responses, "get_cache", lambda: cache)
+    try:
+        result = first_page(limit=10)
+        cursor = result.structuredContent["next_cursor"]
+        assert cursor.split(".")[0].endswith(f"~{os.getpid()}")
+        assert len(cursors) == 1
+        assert "only works on the server worker that answered" in result.content[0].text
+        assert [item["name"] for item in walk(result, limit=10)] == [entry.name for entry in ITEMS]
+
+        # Another worker has the same cache but not this worker's memory
+        monkeypatch.setattr(responses.os, "getpid", lambda: 1)
+        with pytest.raises(ToolError, match="another server worker.*MCP_CACHE_MAX_BYTES"):
+            responses.page("test_tool", cursor)
+    finally:
+        cache.close()
+
+
+def test_cursor_alone_continues_a_tool(tmp_path):
+    for i in range(30):
+        (tmp_path / f"file{i:02}.txt").write_text("x")
+    mcp = FastMCP("test")
+    file_operations.register_file_tools(mcp)
+    list_directory = mcp._tool_manager.get_tool("list_directory").fn
+
+    first = list_directory(str(tmp_path), limit=10)
+    rest = list_directory(cursor=first.structuredContent["next_cursor"], limit=10)
+    assert rest.structuredContent["offset"] == 10
+    with pytest.raises(ToolError, match="directory is required without a cursor"):
+        list_directory()
+
+
+def test_optional_inputs_keep_json_strings_as_text():
+    # FastMCP decodes JSON-looking arguments unless the parameter is plain `str`
+    mcp = FastMCP("test")
+    data_processing.register_data_tools(mcp)
+    result = asyncio.run(mcp._tool_manager.call_tool(
+        "convert_data", {"data": '[{"name": "a"}]', "source_format": "json", "target_format": "csv"}))
+    assert result.structuredContent["headers"] == ["name"]
+    assert result.structuredContent["items"] == ["a"]
+
+
+def test_require_inputs_names_every_missing_input():
+    responses.require_inputs(data="a,b", source_format="csv")
+    with pytest.raises(ToolError, match="source_format, target_format are required without a cursor"):
+        responses.require_inputs(data="a,b", source_format="", target_format="")
+
+
+def test_text_budget_never_goes_below_the_floor():
+    assert responses.text_budget(None) == responses.DEFAULT_MAX_BYTES - responses._FRAME_RESERVE
+    assert responses.text_budget(responses.MIN_MAX_BYTES, used=4000) == responses.MIN_CONTENT_BYTES
+    assert responses.text_budget(1) == responses.MIN_MAX_BYTES - responses._FRAME_RESERVE
+
+
+def test_fit_text_keeps_whole_characters():
+    assert responses.fit_text("héllo", 2) == "h"
+    assert responses.fit_text("héllo", 3) == "hé"
+    assert responses.fit_text("abc", 10) == "abc"
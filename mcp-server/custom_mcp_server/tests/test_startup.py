@@ -0,0 +1,38 @@
+"""What server startup loads: tool categories' dependencies and background threads."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, threading
+import main
+main.create_mcp(categories=%r)
+print(json.dumps({
+    "modules": [name for name in ("psutil", "httpcore", "tools.http_client", "bs4") if name in sys.modules],
+    "threads": sorted(thread.name for thread in threading.enumerate()),
+}))
+"""
+
+
+def startup(categories):
+    # A fresh interpreter: this one has imported everything already
+    result = subprocess.run([sys.executable, "-c", PROBE % (categories,)], cwd=SERVER_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("categories", [["files"], ["data"], ["system"], ["files", "system", "data", "admin"]])
+def test_startup_loads_no_heavy_modules_or_threads(categories):
+    loaded = startup(categories)
+    assert loaded["modules"] == []
+    assert loaded["threads"] == ["MainThread"]
+
+
+def test_network_categories_load_the_http_client():
+    assert "tools.http_client" in startup(["api"])["modules"]
@@ -0,0 +1,135 @@
+"""Typed structured content of the list and file tools, checked end to end through an MCP client."""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from tools import data_processing, file_operations, system_utilities, web_scraping
+from tools.cache import Cache, MemoryBackend
+from tools.data_processing import ConvertedData
+from tools.file_operations import DirectoryListing, FileContent, FileInfo, FileSearchResults
+from tools.system_utilities import ProcessList
+from tools.web_scraping import LinkList
+
+PAGE = b"""<html><body>
+<a href="/docs">Docs</a> <a href="https://example.com/">Elsewhere</a> <a href="/docs">Again</a>
+</body></html>"""
+
+
+class Pages(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Pages)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(web_scraping, "get_cache", lambda: Cache(MemoryBackend()))
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def files(tmp_path):
+    for i in range(5):
+        (tmp_path / f"file{i}.py").write_text(f"import os  # {i}\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "notes.txt").write_text("hello\n")
+    return tmp_path
+
+
+def call_tools(calls):
+    """structuredContent of each (tool, arguments) call, made through a client session.
+
+    The server checks every result against the tool's output schema before
+    sending it, and the client checks it again, so a mismatch fails the call.
+    """
+    mcp = FastMCP("test")
+    file_operations.register_file_tools(mcp)
+    data_processing.register_data_tools(mcp)
+    web_scraping.register_web_tools(mcp)
+    system_utilities.register_system_tools(mcp)
+
+    async def run():
+        results = []
+        async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+            schemas = {tool.name: tool.outputSchema for tool in (await client.list_tools()).tools}
+            for name, arguments in calls:
+                assert schemas[name] is not None, f"{name} has no output schema"
+                result = await client.call_tool(name, arguments)
+                assert not result.isError, result.content[0].text
+                results.append(result.structuredContent)
+        return results
+
+    return asyncio.run(run())
+
+
+def test_file_tools_return_their_schemas(files):
+    listing, details, search, content, info = call_tools([
+        ("list_directory", {"directory": str(files), "limit": 3}),
+        ("list_directory", {"directory": str(files), "detailed": True}),
+        ("search_files", {"directory": str(files), "pattern": "*.py", "content_search": "import"}),
+        ("read_file", {"file_path": str(files / "notes.txt")}),
+        ("get_file_info", {"file_path": str(files / "notes.txt")}),
+    ])
+
+    listing = DirectoryListing.model_validate(listing)
+    assert (listing.total, len(listing.items)) == (7, 3)
+    assert listing.next_cursor is not None
+    # Directories come first and carry no size
+    assert listing.items[0].name == "sub" and listing.items[0].size is None
+
+    details = DirectoryListing.model_validate(details)
+    assert all(entry.size is not None for entry in details.items if entry.name.endswith(".py"))
+
+    search = FileSearchResults.model_validate(search)
+    assert (search.pattern, search.total) == ("*.py", 5)
+
+    content = FileContent.model_validate(content)
+    assert (content.content, content.size, content.next_cursor) == ("hello\n", 6, None)
+
+    info = FileInfo.model_validate(info)
+    assert (info.name, info.type, info.size) == ("notes.txt", "file", 6)
+
+
+def test_convert_data_returns_rows():
+    to_json, to_csv = call_tools([
+        ("convert_data", {"data": "name,size\na,1\nb,2\n", "source_format": "csv", "target_format": "json"}),
+        ("convert_data", {"data": '[{"name": "a", "size": 1}]', "source_format": "json", "target_format": "csv"}),
+    ])
+
+    to_json = ConvertedData.model_validate(to_json)
+    assert to_json.items == [{"name": "a", "size": "1"}, {"name": "b", "size": "2"}]
+
+    to_csv = ConvertedData.model_validate(to_csv)
+    assert to_csv.headers == ["name", "size"]
+    assert to_csv.total == 1
+
+
+def test_extract_links_returns_unique_links(page_url):
+    (links,) = call_tools([("extract_links", {"url": page_url})])
+    links = LinkList.model_validate(links)
+    assert links.url == page_url
+    assert [link.url for link in links.items] == [f"{page_url}docs", "https://example.com/"]
+
+
+def test_process_info_returns_processes():
+    (processes,) = call_tools([("get_process_info", {"sort_by": "memory", "window_seconds": 1})])
+    processes = ProcessList.model_validate(processes)
+    assert processes.sort_by == "memory"
+    assert processes.processes
+    assert processes.processes == sorted(processes.processes, key=lambda process: -process.memory_percent)
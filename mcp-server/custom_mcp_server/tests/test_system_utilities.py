@@ -0,0 +1,265 @@
+"""System utilities: process sampling, metrics history, host facts, ports and commands."""
+
+import asyncio
+import math
+import os
+import time
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp.exceptions import ToolError
+
+from tools import profiling, system_utilities
+from tools.system_utilities import ProcessSampler, ProcessSeries, _command_limit, parse_port_spec
+
+COMMAND_TOOLS = {"run_command", "get_job", "list_jobs", "cancel_job"}
+
+
+def burn_cpu(seconds: float):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def test_process_series_ring_keeps_the_newest_samples():
+    series = ProcessSeries(1, "proc", "user", 0.0, capacity=3)
+    for second in range(5):
+        series.append(float(second), second * 0.5, 100.0, float(second * 10))
+    assert list(series._sample(0)) == [4.0, 2.0, 100.0, 40.0]
+    assert list(series._sample(2)) == [2.0, 1.0, 100.0, 20.0]
+
+
+def test_process_series_rates_over_a_window():
+    series = ProcessSeries(1, "proc", "user", 0.0, capacity=10)
+    assert series.rates(10) is None
+    # 0.25 CPU seconds and 100 IO bytes per wall second
+    for second in range(6):
+        series.append(float(second), second * 0.25, 2048.0, second * 100.0)
+    cpu_percent, rss, io_rate = series.rates(window=2)
+    assert cpu_percent == pytest.approx(25.0)
+    assert rss == 2048.0
+    assert io_rate == pytest.approx(100.0)
+    # A window longer than the history uses what there is
+    assert series.rates(window=60)[0] == pytest.approx(25.0)
+
+
+def test_process_series_without_io_counters_reports_no_io_rate():
+    series = ProcessSeries(1, "proc", "user", 0.0, capacity=4)
+    series.append(0.0, 0.0, 1.0, math.nan)
+    series.append(1.0, 0.5, 1.0, math.nan)
+    assert series.rates(5) == (pytest.approx(50.0), 1.0, None)
+
+
+def test_sampler_measures_cpu_of_a_busy_process():
+    sampler = ProcessSampler(interval=0.1, history_size=10, cpu_budget=0)
+    sampler.sample_once()
+    assert not sampler.wait_ready(0)
+    burn_cpu(0.3)
+    sampler.sample_once()
+    assert sampler.wait_ready(0)
+
+    rows = sampler.top(window=60, sort_by="cpu", limit=None)
+    me = next(row for row in rows if row.pid == os.getpid())
+    assert me.cpu_percent > 10
+    assert me.rss > 0
+    assert sampler.process_count() >= 1
+
+
+def test_sampler_filters_and_sorts():
+    sampler = ProcessSampler(interval=0.1, history_size=10, cpu_budget=0)
+    sampler.sample_once()
+    sampler.sample_once()
+    name = next(row.name for row in sampler.top(window=60, limit=None) if row.pid == os.getpid())
+    rows = sampler.top(window=60, sort_by="memory", name_filter=name.upper(), limit=None)
+    assert rows and all(name.lower() in row.name.lower() for row in rows)
+    assert [row.rss for row in rows] == sorted((row.rss for row in rows), reverse=True)
+    with pytest.raises(ValueError, match="Unknown sort key"):
+        sampler.top(sort_by="threads")
+
+
+def test_sampler_stretches_its_interval_to_stay_in_budget():
+    sampler = ProcessSampler(interval=0.01, history_size=10, cpu_budget=1e-6)
+    sampler.sample_once()
+    assert sampler.effective_interval > sampler.interval
+    assert sampler.max_window == pytest.approx(sampler.effective_interval * 9)
+
+
+def collector(**kwargs):
+    kwargs.setdefault("store_path", None)
+    return system_utilities.MetricsCollector(interval=1, **kwargs)
+
+
+def test_metrics_roll_closed_minutes_up():
+    metrics = collector()
+    # Two minutes of samples every 10 s, then one sample to close minute two
+    for step in range(13):
+        metrics.record(3600 + step * 10, {"cpu.percent": float(step)})
+
+    resolution, rows = metrics.query("cpu.*", 3600, 3720, resolution="1m")
+    assert resolution == "1m"
+    (row,) = rows
+    assert row["points"] == 2 and row["samples"] == 12
+    assert (row["min"], row["max"]) == (0.0, 11.0)
+    assert row["avg"] == pytest.approx(5.5)
+    assert metrics.latest("cpu.percent") == 12.0
+
+
+def test_metrics_roll_closed_hours_up():
+    metrics = collector()
+    # One sample a minute for two hours and a bit
+    for minute in range(122):
+        metrics.record(minute * 60, {"memory.percent": float(minute % 60)})
+
+    _, (row,) = metrics.query("memory.percent", 0, 7200, resolution="1h")
+    assert row["points"] == 2
+    assert row["samples"] == 120
+    assert (row["min"], row["max"]) == (0.0, 59.0)
+    assert row["avg"] == pytest.approx(29.5)
+
+
+def test_metrics_auto_resolution_picks_the_tier_that_reaches_back():
+    metrics = collector(raw_size=5)
+    for minute in range(10):
+        metrics.record(minute * 60, {"cpu.percent": 1.0})
+    # The raw ring only holds the last five samples
+    assert metrics.query("*", 8 * 60, 600)[0] == "raw"
+    assert metrics.query("*", 0, 600)[0] == "1m"
+    with pytest.raises(ValueError, match="Unknown resolution"):
+        metrics.query("*", 0, 600, resolution="5m")
+
+
+def test_host_facts_are_computed_once(monkeypatch):
+    calls = []
+    real_processor = system_utilities.platform.processor
+
+    def processor():
+        calls.append(1)
+        return real_processor()
+
+    system_utilities.get_host_facts.cache_clear()
+    monkeypatch.setattr(system_utilities.platform, "processor", processor)
+    try:
+        first = system_utilities.collect_system_info()
+        second = system_utilities.collect_system_info()
+        assert system_utilities.get_host_facts() is system_utilities.get_host_facts()
+    finally:
+        system_utilities.get_host_facts.cache_clear()
+    assert len(calls) == 1
+    assert first["hostname"] == second["hostname"]
+    # Dynamic values are still read on every call
+    assert first["memory"]["total_bytes"] > 0
+    assert second["uptime_seconds"] >= first["uptime_seconds"]
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("80", [80]),
+    ("22,80,443", [22, 80, 443]),
+    ("8000-8003", [8000, 8001, 8002, 8003]),
+    ("443, 80-81 ,80", [80, 81, 443]),
+    ("1,65535", [1, 65535]),
+    ("5-5", [5]),
+    (8080, [8080]),
+])
+def test_parse_port_spec(spec, expected):
+    assert parse_port_spec(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["0", "65536", "100-50", "1-70000", "", ",", "abc", "1-2-3"])
+def test_parse_port_spec_rejects_bad_input(spec):
+    with pytest.raises(ValueError):
+        parse_port_spec(spec)
+
+
+def test_parse_port_spec_caps_the_port_count(monkeypatch):
+    monkeypatch.setattr(system_utilities, "MAX_PORTS_PER_SCAN", 10)
+    assert len(parse_port_spec("1-10")) == 10
+    with pytest.raises(ValueError, match="Too many ports"):
+        parse_port_spec("1-11")
+
+
+@pytest.mark.parametrize("value, default, maximum, expected", [
+    (None, 60, 3600, 60),        # server default
+    (30, 60, 3600, 30),          # client value within the cap
+    (10**9, 60, 3600, 3600),     # capped
+    (0, 60, 3600, 3600),         # "unlimited" still capped
+    (None, 0, 3600, 3600),       # no default, capped
+    (None, 0, 0, None),          # no default, no cap
+    (500, 60, 0, 500),           # no cap
+])
+def test_command_limit(value, default, maximum, expected):
+    assert _command_limit(value, default, maximum) == expected
+
+
+def registered_tools(monkeypatch, enabled, token):
+    monkeypatch.setattr(system_utilities, "COMMANDS_ENABLED", enabled)
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", token)
+    mcp = FastMCP("test")
+    system_utilities.register_system_tools(mcp)
+    return mcp
+
+
+@pytest.mark.parametrize("enabled, token", [(False, None), (False, "secret"), (True, None)])
+def test_command_tools_are_opt_in(monkeypatch, enabled, token):
+    mcp = registered_tools(monkeypatch, enabled, token)
+    names = {tool.name for tool in mcp._tool_manager.list_tools()}
+    assert "get_system_info" in names
+    assert not names & COMMAND_TOOLS
+
+
+def test_command_tools_need_the_admin_token(monkeypatch):
+    mcp = registered_tools(monkeypatch, True, "secret")
+    assert COMMAND_TOOLS <= {tool.name for tool in mcp._tool_manager.list_tools()}
+    for name, arguments in [("run_command", {"command": "true"}), ("list_jobs", {})]:
+        with pytest.raises(ToolError, match="Unauthorized"):
+            asyncio.run(mcp._tool_manager.call_tool(name, arguments))
+
+
+@pytest.mark.skipif(system_utilities.fcntl is None, reason="file locks need fcntl")
+def test_leader_lock_elects_one_holder(tmp_path):
+    first, second = system_utilities.LeaderLock("job", str(tmp_path)), system_utilities.LeaderLock("job", str(tmp_path))
+    assert first.acquire()
+    assert first.acquire()
+    assert not second.acquire()
+    first._file.close()
+    first._file = None
+    assert second.acquire()
+
+
+def test_leader_lock_without_a_shared_directory_always_leads():
+    assert system_utilities.LeaderLock("job", None).acquire()
+
+
+@pytest.mark.skipif(system_utilities.fcntl is None, reason="file locks need fcntl")
+def test_followers_read_the_journal_between_store_writes(tmp_path):
+    def worker():
+        return collector(store_path=str(tmp_path / "metrics.json"),
+                         leader_lock=system_utilities.LeaderLock("metrics", str(tmp_path)))
+
+    leader, follower = worker(), worker()
+    assert leader.leader_lock.acquire() and not follower.leader_lock.acquire()
+
+    leader.record(0, {"cpu.percent": 1.0})
+    leader._append_journal(0, {"cpu.percent": 1.0})
+    leader.save()
+    for second in (10, 20):
+        leader.record(second, {"cpu.percent": float(second)})
+        leader._append_journal(second, {"cpu.percent": float(second)})
+    store_mtime = os.stat(leader.store_path).st_mtime_ns
+
+    follower.refresh()
+    assert follower.latest("cpu.percent") == 20.0
+    # Only the journal was appended to; the store was not rewritten
+    assert os.stat(leader.store_path).st_mtime_ns == store_mtime
+    leader._append_journal(30, {"cpu.percent": 30.0})
+    follower.refresh()
+    _, (row,) = follower.query("cpu.percent", 0, 60, resolution="raw")
+    assert row["points"] == 4 and row["last"] == 30.0
+
+    # A full write starts a new journal; nothing is read twice
+    leader.record(30, {"cpu.percent": 30.0})
+    leader.save()
+    leader._append_journal(40, {"cpu.percent": 40.0})
+    follower.refresh()
+    follower.refresh()
+    _, (row,) = follower.query("cpu.percent", 0, 60, resolution="raw")
+    assert row["points"] == 5 and row["last"] == 40.0
@@ -1,18 +1,29 @@
 """
 Tools package for Custom MCP Server
 Contains all the tool modules for various functionalities.
+
+Tool modules are imported when one of their names is first accessed, so
+importing a single module (or the process pool unpickling a function)
+doesn't load every category and its dependencies.
 """
 
-from .file_operations import register_file_tools
-from .web_scraping import register_web_tools
-from .api_integrations import register_api_tools
-from .system_utilities import register_system_tools
-from .data_processing import register_data_tools
+import importlib
+
+_EXPORTS = {
+    'register_file_tools': 'file_operations',
+    'register_web_tools': 'web_scraping',
+    'register_api_tools': 'api_integrations',
+    'register_system_tools': 'system_utilities',
+    'register_data_tools': 'data_processing',
+    'register_profiling_tools': 'profiling',
+    'shutdown_system_tools': 'system_utilities',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'register_file_tools',
-    'register_web_tools',
-    'register_api_tools',
-    'register_system_tools',
-    'register_data_tools'
-] 
\ No newline at end of file
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
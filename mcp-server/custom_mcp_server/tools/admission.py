@@ -0,0 +1,287 @@
+"""
+Admission Control for MCP Server
+Per-tool and per-upstream-host concurrency limits and token-bucket rate
+limits, applied to every tool at registration. Calls that cannot be admitted
+within their queue timeout fail with an overload error instead of piling up.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from mcp.server.fastmcp.exceptions import ToolError
+
+from .deadlines import current_deadline
+from .executor import get_thread_pool
+from .instrumentation import LATENCY_BUCKETS, REGISTRY
+from .lazy import lazy_import
+
+# Loads httpx/httpcore, so only imported once a tool with an upstream runs
+http_client = lazy_import(f"{__package__}.http_client")
+
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("MCP_TOOL_MAX_CONCURRENT", "32"))
+DEFAULT_MAX_QUEUED = int(os.environ.get("MCP_TOOL_MAX_QUEUED", "128"))
+DEFAULT_QUEUE_TIMEOUT = float(os.environ.get("MCP_TOOL_QUEUE_TIMEOUT", "10"))
+DEFAULT_HOST_MAX_CONCURRENT = int(os.environ.get("MCP_HOST_MAX_CONCURRENT", "8"))
+HOST_GATE_CACHE_SIZE = 1024
+
+# Limits by tool name. Keys: max_concurrent, max_queued, queue_timeout
+# (seconds), rate (calls/second) and burst for a token bucket, upstream (an
+# http_client.UPSTREAMS name) or upstream_arg (argument holding a URL) to also
+# apply that host's limits, and inline to run a sync tool on the event loop thread.
+# Unlisted keys use the defaults above; 0 means unlimited.
+TOOL_LIMITS = {
+    # Disk-heavy file tools
+    "search_files": {"max_concurrent": 4},
+    "copy_file": {"max_concurrent": 4},
+    "delete_file": {"max_concurrent": 8},
+    "list_directory": {"max_concurrent": 8},
+    # Upstream services
+    "search_web": {"upstream": "duckduckgo"},
+    "extract_text": {"upstream_arg": "url"},
+    "extract_links": {"upstream_arg": "url"},
+    "get_weather": {"upstream": "wttr"},
+    "get_news": {"upstream": "hackernews"},
+    "get_crypto_prices": {"upstream": "coingecko"},
+    "get_ip_info": {"upstream": "ipapi"},
+    # These touch the command runner's asyncio tasks, so stay on the loop
+    "get_job": {"inline": True},
+    "list_jobs": {"inline": True},
+    "cancel_job": {"inline": True},
+}
+
+# Limits by upstream host, shared by every tool calling it. Hosts not listed
+# get DEFAULT_HOST_MAX_CONCURRENT and no rate limit.
+HOST_LIMITS = {
+    "html.duckduckgo.com": {"max_concurrent": 2, "rate": 1.0, "burst": 3},
+    "api.coingecko.com": {"max_concurrent": 2, "rate": 0.5, "burst": 5},
+    "ip-api.com": {"max_concurrent": 4, "rate": 0.7, "burst": 10},
+    "wttr.in": {"max_concurrent": 4, "rate": 1.0, "burst": 5},
+    "hacker-news.firebaseio.com": {"max_concurrent": 16},
+}
+
+
+def _load_overrides(variable: str, limits):
+    """Merge JSON overrides such as {"search_files": {"max_concurrent": 2}} from the environment."""
+    raw = os.environ.get(variable)
+    if not raw:
+        return
+    for key, values in json.loads(raw).items():
+        limits[key] = {**limits.get(key, {}), **values}
+
+
+_load_overrides("MCP_TOOL_LIMITS", TOOL_LIMITS)
+_load_overrides("MCP_HOST_LIMITS", HOST_LIMITS)
+
+REGISTRY.describe("mcp_tool_queue_depth", "gauge", "Tool calls waiting for admission")
+REGISTRY.describe("mcp_tool_queue_wait_seconds", "histogram", "Time tool calls waited for admission", LATENCY_BUCKETS)
+REGISTRY.describe("mcp_tool_rejected_total", "counter", "Tool calls rejected by admission control, by reason")
+REGISTRY.describe("mcp_upstream_in_flight", "gauge", "Admitted tool calls per upstream host")
+REGISTRY.describe("mcp_upstream_queue_depth", "gauge", "Tool calls waiting for an upstream host slot")
+
+
+class OverloadedError(ToolError):
+    """A call was rejected because its tool or upstream host is saturated; retry later."""
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/second up to `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds until it is actually available.
+
+        Tokens can go negative, so concurrent callers queue up behind each
+        other in order instead of all waking at once.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, 0.0)
+
+    def refund(self):
+        self.tokens += 1
+
+
+class Gate:
+    """Concurrency limit with a bounded wait queue and optional rate limit."""
+
+    def __init__(self, max_concurrent: int, max_queued: int, rate: float = 0, burst: float = 0,
+                 queue_metric: str = None, running_metric: str = None, labels=None, reason_prefix: str = ""):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.bucket = TokenBucket(rate, burst or rate) if rate > 0 else None
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+        self._queue_metric = queue_metric
+        self._running_metric = running_metric
+        self._labels = labels
+        self._reason_prefix = reason_prefix
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and self.waiting == 0
+
+    def _reject(self, tool: str, reason: str, message: str):
+        REGISTRY.inc("mcp_tool_rejected_total", {"tool": tool, "reason": self._reason_prefix + reason})
+        raise OverloadedError(message)
+
+    async def acquire(self, deadline: float, tool: str, what: str):
+        if self.bucket is not None:
+            wait = self.bucket.reserve()
+            if wait > deadline - time.monotonic():
+                self.bucket.refund()
+                self._reject(tool, "rate_limited", f"Rate limit for {what} exceeded; retry in {wait:.1f}s")
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        if self._semaphore is not None:
+            if self._semaphore.locked():
+                if self.waiting >= self.max_queued:
+                    self._reject(tool, "queue_full", f"Server busy: {what} has {self.active} calls running "
+                                                     f"and {self.waiting} queued; retry later")
+                self._set_waiting(1)
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    self._reject(tool, "queue_timeout", f"Server busy: timed out waiting for {what} "
+                                                        f"({self.active} running, {self.waiting} queued); retry later")
+                finally:
+                    self._set_waiting(-1)
+            else:
+                await self._semaphore.acquire()
+
+        self.active += 1
+        if self._running_metric:
+            REGISTRY.add(self._running_metric, self._labels, 1)
+
+    def release(self):
+        self.active -= 1
+        if self._running_metric:
+            REGISTRY.add(self._running_metric, self._labels, -1)
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def _set_waiting(self, delta: int):
+        self.waiting += delta
+        if self._queue_metric:
+            REGISTRY.add(self._queue_metric, self._labels, delta)
+
+
+_host_gates = OrderedDict()
+
+
+def get_host_gate(host: str) -> Gate:
+    """Shared gate for an upstream host; idle gates for unlisted hosts are evicted LRU."""
+    gate = _host_gates.get(host)
+    if gate is not None:
+        _host_gates.move_to_end(host)
+        return gate
+
+    limits = HOST_LIMITS.get(host, {})
+    # Unlisted hosts share one metrics label to keep label cardinality bounded
+    labels = {"host": host if host in HOST_LIMITS else "other"}
+    gate = _host_gates[host] = Gate(
+        limits.get("max_concurrent", DEFAULT_HOST_MAX_CONCURRENT),
+        limits.get("max_queued", DEFAULT_MAX_QUEUED),
+        limits.get("rate", 0), limits.get("burst", 0),
+        queue_metric="mcp_upstream_queue_depth", running_metric="mcp_upstream_in_flight",
+        labels=labels, reason_prefix="upstream_",
+    )
+    if len(_host_gates) > HOST_GATE_CACHE_SIZE:
+        for name in list(_host_gates):
+            if len(_host_gates) <= HOST_GATE_CACHE_SIZE:
+                break
+            if name not in HOST_LIMITS and _host_gates[name].idle:
+                del _host_gates[name]
+    return gate
+
+
+def _host_of(url) -> str:
+    if not isinstance(url, str):
+        return None
+    return urlparse(url if '://' in url else f"http://{url}").hostname
+
+
+def limit_tool(fn, name: str):
+    """Wrap a tool function with its TOOL_LIMITS admission control.
+
+    The wrapper is always async: sync tools run in the shared tool thread
+    pool (unless marked inline) so blocking I/O doesn't stall the event
+    loop, and their slot is held until the thread finishes even if the
+    call is cancelled.
+    """
+    limits = TOOL_LIMITS.get(name, {})
+    gate = Gate(
+        limits.get("max_concurrent", DEFAULT_MAX_CONCURRENT),
+        limits.get("max_queued", DEFAULT_MAX_QUEUED),
+        limits.get("rate", 0), limits.get("burst", 0),
+        queue_metric="mcp_tool_queue_depth", labels={"tool": name},
+    )
+    queue_timeout = limits.get("queue_timeout", DEFAULT_QUEUE_TIMEOUT)
+    upstream_name = limits.get("upstream")
+    upstream = None
+    upstream_arg = limits.get("upstream_arg")
+    is_async = inspect.iscoroutinefunction(fn)
+    inline = limits.get("inline", False)
+
+    async def admit(kwargs):
+        nonlocal upstream
+        if upstream_name and upstream is None:
+            # Resolved on the first call (then kept) so an overridden base
+            # URL gets that host's limits
+            upstream = http_client.upstream_host(upstream_name)
+        started = time.monotonic()
+        # Never queue past the call's own deadline
+        deadline = started + min(queue_timeout, current_deadline().remaining())
+        held = []
+        try:
+            await gate.acquire(deadline, name, name)
+            held.append(gate)
+            host = upstream or (_host_of(kwargs.get(upstream_arg)) if upstream_arg else None)
+            if host:
+                host_gate = get_host_gate(host)
+                await host_gate.acquire(deadline, name, host)
+                held.append(host_gate)
+        except BaseException:
+            for admitted in reversed(held):
+                admitted.release()
+            raise
+        REGISTRY.observe("mcp_tool_queue_wait_seconds", {"tool": name}, time.monotonic() - started)
+        return held
+
+    def release(held):
+        for admitted in reversed(held):
+            admitted.release()
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        held = await admit(kwargs)
+        if is_async or inline:
+            try:
+                result = fn(*args, **kwargs)
+                return await result if is_async else result
+            finally:
+                release(held)
+
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        future = asyncio.get_running_loop().run_in_executor(get_thread_pool(), call)
+        future.add_done_callback(lambda _: release(held))
+        return await asyncio.shield(future)
+
+    return wrapper
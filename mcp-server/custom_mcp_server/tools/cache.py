@@ -0,0 +1,480 @@
+"""
+Result Cache for MCP Server
+A small cache with pluggable backends, shared by the tools that fetch or
+compute reusable results (API responses, fetched pages, file digests and
+directory listings):
+
+- memory: per-process LRU, bounded by size (default)
+- sqlite: a local file shared by every worker on the host
+- redis: shared across hosts (needs the optional `redis` package)
+
+Values are JSON, keys are "<prefix>:<namespace>:<hash of the key parts>",
+and each namespace has its own TTL. Concurrent misses for the same key wait
+for the first caller's result instead of all recomputing it, across
+processes too (a short-lived lock entry in the backend).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from .deadlines import current_deadline
+from .instrumentation import REGISTRY
+
+CACHE_BACKEND = os.environ.get("MCP_CACHE_BACKEND", "memory").lower()
+# Unset means a file in a private directory made on first use, never a
+# fixed name in the shared temp directory that other users could pre-create
+CACHE_PATH = os.environ.get("MCP_CACHE_PATH") or None
+CACHE_URL = os.environ.get("MCP_CACHE_URL", "redis://localhost:6379/0")
+CACHE_PREFIX = os.environ.get("MCP_CACHE_PREFIX", "mcp")
+CACHE_MAX_BYTES = int(os.environ.get("MCP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_LOCK_TIMEOUT = float(os.environ.get("MCP_CACHE_LOCK_TIMEOUT", "30"))
+LOCK_POLL_INTERVAL = 0.05
+DEFAULT_TTL = 300
+
+# TTL in seconds by namespace; 0 disables caching for that namespace
+CACHE_TTLS = {
+    "weather": 600,
+    "news": 60,
+    "news_item": 300,
+    "crypto": 30,
+    "ip_info": 3600,
+    "search": 300,
+    "page": 300,
+    "file_digest": 86400,
+    "listing": 30,
+}
+
+if os.environ.get("MCP_CACHE_TTLS"):
+    CACHE_TTLS.update(json.loads(os.environ["MCP_CACHE_TTLS"]))
+
+REGISTRY.describe("mcp_cache_requests_total", "counter",
+                  "Cache lookups by namespace and result (hit, miss, coalesced, error)")
+
+_MISS = object()
+
+
+class CacheBackend(ABC):
+    """Byte-string store with per-entry TTLs."""
+
+    # Whether calls do I/O, so async callers should run them in a thread
+    blocking = False
+    # Whether other worker processes see the same entries
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """The value, or None if absent or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store a value for ttl seconds; False if it is too large to keep."""
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Store a value only if the key is absent or expired; True if stored."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove a key if present."""
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU holding at most max_bytes of values."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            return self._put(key, value, ttl)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.time():
+                return False
+            return self._put(key, value, ttl)
+
+    def _put(self, key, value, ttl):
+        self._remove(key)
+        if len(value) > self.max_bytes:
+            return False
+        self._entries[key] = (time.time() + ttl, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class SQLiteBackend(CacheBackend):
+    """A SQLite file shared by all processes on the host.
+
+    Entries past their TTL are skipped on read and purged, together with
+    the least recently used ones once the file's values exceed max_bytes,
+    every EVICT_EVERY writes.
+    """
+
+    blocking = True
+    shared = True
+    EVICT_EVERY = 64
+    # Reads refresh an entry's LRU position at most this often
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path: Optional[str] = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(prefix="mcp-cache-"), "cache.sqlite3")
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                               "expires_at REAL NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, key):
+        connection = self._connect()
+        row = connection.execute("SELECT value, expires_at, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now:
+            return None
+        if now - row[2] > self.TOUCH_INTERVAL:
+            connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return False
+        now = time.time()
+        self._connect().execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                                (key, value, now + ttl, len(value), now))
+        self._wrote()
+        return True
+
+    def add(self, key, value, ttl):
+        connection = self._connect()
+        now = time.time()
+        # Outside the try: if BEGIN fails (e.g. the database is locked) there is no
+        # transaction to roll back, and a ROLLBACK would hide the real error
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM cache WHERE key = ? AND expires_at < ?", (key, now))
+            stored = connection.execute("INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?, ?)",
+                                        (key, value, now + ttl, len(value), now)).rowcount == 1
+            connection.execute("COMMIT")
+        except BaseException:
+            # A failed COMMIT may already have ended the transaction
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        return stored
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _wrote(self):
+        with self._lock:
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY:
+                return
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones down to 90% of max_bytes."""
+        connection = self._connect()
+        connection.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        target = self.max_bytes * 0.9
+        while total > target:
+            rows = connection.execute("SELECT key, size FROM cache ORDER BY accessed LIMIT 100").fetchall()
+            if not rows:
+                break
+            connection.executemany("DELETE FROM cache WHERE key = ?", [(row[0],) for row in rows])
+            total -= sum(row[1] for row in rows)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+class RedisBackend(CacheBackend):
+    """Redis, for caches shared across hosts. Size limits are left to Redis'
+    own maxmemory policy (e.g. allkeys-lru)."""
+
+    blocking = True
+    shared = True
+
+    def __init__(self, url: str = CACHE_URL):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("MCP_CACHE_BACKEND=redis needs the redis package (pip install redis)") from e
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        return bool(self._client.set(key, value, px=max(int(ttl * 1000), 1)))
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(key, value, px=max(int(ttl * 1000), 1), nx=True))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def close(self):
+        self._client.close()
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+    "redis": RedisBackend,
+}
+
+
+class Cache:
+    """JSON values by namespace and key parts, with stampede protection."""
+
+    def __init__(self, backend: Optional[CacheBackend], prefix: str = CACHE_PREFIX, ttls=None):
+        self.backend = backend
+        self.prefix = prefix
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+
+    def key(self, namespace: str, parts) -> str:
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+        return f"{self.prefix}:{namespace}:{digest}"
+
+    def ttl(self, namespace: str) -> float:
+        return self.ttls.get(namespace, DEFAULT_TTL) if self.backend is not None else 0
+
+    @property
+    def shared(self) -> bool:
+        """Whether every worker process sees this cache's entries."""
+        return self.backend is not None and self.backend.shared
+
+    def _count(self, namespace: str, result: str):
+        REGISTRY.inc("mcp_cache_requests_total", {"namespace": namespace, "result": result})
+
+    def _load(self, namespace: str, key: str):
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            # A broken backend only costs the cache, not the call
+            self._count(namespace, "error")
+            return _MISS
+        return _MISS if value is None else json.loads(value)
+
+    def _store(self, namespace: str, key: str, value, ttl: float) -> bool:
+        try:
+            return self.backend.set(key, json.dumps(value, default=str).encode(), ttl)
+        except Exception:
+            self._count(namespace, "error")
+            return False
+
+    def _try_lock(self, namespace: str, key: str) -> Optional[bool]:
+        """True if we hold the key's lock, False if another caller does, None if locking failed."""
+        try:
+            return self.backend.add(key + ":lock", b"1", CACHE_LOCK_TIMEOUT)
+        except Exception:
+            self._count(namespace, "error")
+            return None
+
+    def _unlock(self, key: str):
+        try:
+            self.backend.delete(key + ":lock")
+        except Exception:
+            pass
+
+    def _wait_until(self) -> float:
+        return time.monotonic() + min(CACHE_LOCK_TIMEOUT, current_deadline().remaining())
+
+    def get(self, namespace: str, parts):
+        """The cached value for (namespace, parts), or None."""
+        if self.backend is None:
+            return None
+        value = self._load(namespace, self.key(namespace, parts))
+        return None if value is _MISS else value
+
+    def set(self, namespace: str, parts, value, ttl: Optional[float] = None) -> bool:
+        """Store a value for `ttl` seconds, by default the namespace's TTL.
+
+        Returns whether it was stored: False when caching is off, the value
+        is too large for the backend or the backend failed.
+        """
+        ttl = self.ttl(namespace) if ttl is None else ttl
+        if self.backend is not None and ttl > 0:
+            return self._store(namespace, self.key(namespace, parts), value, ttl)
+        return False
+
+    def get_or_compute(self, namespace: str, parts, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = None):
+        """Cached value for (namespace, parts), calling compute() on a miss.
+
+        Only one caller computes a missing value; others wait for it (up to
+        MCP_CACHE_LOCK_TIMEOUT or their deadline, then compute it themselves).
+        Exceptions and values failing `cacheable` aren't cached.
+        """
+        ttl = self.ttl(namespace)
+        if ttl <= 0:
+            return compute()
+        key = self.key(namespace, parts)
+        value = self._load(namespace, key)
+        if value is not _MISS:
+            self._count(namespace, "hit")
+            return value
+
+        wait_until = self._wait_until()
+        while (locked := self._try_lock(namespace, key)) is False and time.monotonic() < wait_until:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = self._load(namespace, key)
+            if value is not _MISS:
+                self._count(namespace, "coalesced")
+                return value
+
+        try:
+            if locked:
+                # Someone may have finished between our miss and taking the lock
+                value = self._load(namespace, key)
+                if value is not _MISS:
+                    self._count(namespace, "coalesced")
+                    return value
+            self._count(namespace, "miss")
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self._store(namespace, key, value, ttl)
+            return value
+        finally:
+            if locked:
+                self._unlock(key)
+
+    async def aget_or_compute(self, namespace: str, parts, compute: Callable[[], Any],
+                              cacheable: Callable[[Any], bool] = None):
+        """Async get_or_compute(); `compute` returns an awaitable."""
+        ttl = self.ttl(namespace)
+        if ttl <= 0:
+            return await compute()
+
+        async def call(method, *args):
+            if self.backend.blocking:
+                return await asyncio.to_thread(method, *args)
+            return method(*args)
+
+        key = self.key(namespace, parts)
+        value = await call(self._load, namespace, key)
+        if value is not _MISS:
+            self._count(namespace, "hit")
+            return value
+
+        wait_until = self._wait_until()
+        while (locked := await call(self._try_lock, namespace, key)) is False \
+                and time.monotonic() < wait_until:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            value = await call(self._load, namespace, key)
+            if value is not _MISS:
+                self._count(namespace, "coalesced")
+                return value
+
+        try:
+            if locked:
+                value = await call(self._load, namespace, key)
+                if value is not _MISS:
+                    self._count(namespace, "coalesced")
+                    return value
+            self._count(namespace, "miss")
+            value = await compute()
+            if cacheable is None or cacheable(value):
+                await call(self._store, namespace, key, value, ttl)
+            return value
+        finally:
+            if locked:
+                await call(self._unlock, key)
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Cache:
+    """The process-wide cache for MCP_CACHE_BACKEND, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if CACHE_BACKEND in ("off", "none", ""):
+                _cache = Cache(None)
+            elif CACHE_BACKEND not in BACKENDS:
+                raise RuntimeError(f"Unknown MCP_CACHE_BACKEND '{CACHE_BACKEND}'. "
+                                   f"Available: {', '.join(BACKENDS)}, off")
+            else:
+                _cache = Cache(BACKENDS[CACHE_BACKEND]())
+        return _cache
+
+
+def close_cache():
+    """Close backend connections (called on server shutdown)."""
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
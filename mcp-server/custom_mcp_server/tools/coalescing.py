@@ -0,0 +1,94 @@
+"""
+Request Coalescing for MCP Tool Calls
+Identical calls to an idempotent tool that arrive while one is already
+running share its result instead of each doing the work again (single
+flight). Tools opt in by registering with annotations=READ_ONLY, which also
+tells clients the tool has no side effects.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+
+from mcp.server.fastmcp import Context
+from mcp.types import ToolAnnotations
+
+from .deadlines import DeadlineExceeded
+from .instrumentation import REGISTRY, TOOL_ANNOTATIONS
+
+READ_ONLY = ToolAnnotations(readOnlyHint=True, idempotentHint=True)
+
+# Per-tool override of the idempotentHint, e.g. {"get_process_info": false}
+COALESCE_TOOLS = json.loads(os.environ.get("MCP_COALESCE_TOOLS") or "{}")
+
+REGISTRY.describe("mcp_tool_coalesced_total", "counter",
+                  "Tool calls answered by an identical call already in flight")
+
+
+def _call_key(signature, args, kwargs):
+    """Normalized arguments of a call, or None if it can't be safely shared."""
+    try:
+        bound = signature.bind(*args, **kwargs)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+    if any(isinstance(value, Context) for value in bound.arguments.values()):
+        return None
+    try:
+        return json.dumps(bound.arguments, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+
+
+def coalesce_tool(fn, name: str):
+    """Wrap an async tool function so identical concurrent calls run once.
+
+    The first call runs normally and publishes its outcome; later identical
+    calls await it. Errors are shared too, except when the first call ran
+    out of time or was cancelled: that belongs to its caller, so waiting
+    calls then run on their own deadlines instead.
+    """
+    annotations = TOOL_ANNOTATIONS.get(name)
+    enabled = COALESCE_TOOLS.get(name, bool(annotations and annotations.idempotentHint))
+    if not enabled or not inspect.iscoroutinefunction(fn):
+        return fn
+
+    signature = inspect.signature(fn)
+    labels = {"tool": name}
+    in_flight = {}
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        key = _call_key(signature, args, kwargs)
+        if key is None:
+            return await fn(*args, **kwargs)
+
+        while (shared := in_flight.get(key)) is not None:
+            # Waits without propagating this caller's cancellation into the shared call
+            await asyncio.wait((shared,))
+            if shared.cancelled() or isinstance(shared.exception(), DeadlineExceeded):
+                continue  # Cut short for its own caller; run it (or join whoever does)
+            REGISTRY.inc("mcp_tool_coalesced_total", labels)
+            return shared.result()
+
+        future = asyncio.get_running_loop().create_future()
+        in_flight[key] = future
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Marked retrieved so a call nobody joined doesn't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del in_flight[key]
+
+    return wrapper
@@ -9,164 +9,265 @@ import io
 import re
 import hashlib
 import base64
-from typing import Optional
+import functools
+import textwrap
+from typing import Annotated, Any, List, Optional
+
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import CallToolResult
+
+from . import responses
+from .coalescing import READ_ONLY
+from .deadlines import check_expiry, current_deadline
+from .executor import run_cpu_bound
+
+class ConvertedData(responses.Page):
+    """Rows of a conversion: CSV lines, JSON objects, or one JSON value when the input wasn't a list."""
+    source_format: str
+    target_format: str
+    headers: Optional[List[str]] = None
+    items: List[Any]
+
+
+# CPU-bound implementations live at module level so large inputs can be
+# pickled to the shared process pool; small inputs still run inline. They
+# take the call's deadline as a wall-clock `expires_at` (a contextvar doesn't
+# cross into pool processes) and check it between chunks of their loops.
+
+DEADLINE_CHECK_CHUNK = 10000
+
+
+def _chunks(items, expires_at=None):
+    """Yield slices of items, raising DeadlineExceeded between them once expires_at passes."""
+    for start in range(0, len(items), DEADLINE_CHECK_CHUNK):
+        check_expiry(expires_at)
+        yield items[start:start + DEADLINE_CHECK_CHUNK]
+
+
+def _process_json(json_data: str, operation: str = "format") -> str:
+    """Process JSON data with various operations."""
+    try:
+        data = json.loads(json_data)
+
+        if operation == "format":
+            formatted = json.dumps(data, indent=2, ensure_ascii=False)
+            result = f"JSON Processing - Operation: {operation}\n"
+            result += "=" * 50 + "\n"
+            result += "Formatted JSON:\n"
+            result += formatted
+            return result
+
+        elif operation == "validate":
+            result = f"JSON Processing - Operation: {operation}\n"
+            result += "=" * 50 + "\n"
+            result += "✅ JSON is valid\n"
+            result += f"Type: {type(data).__name__}\n"
+            if isinstance(data, dict):
+                result += f"Keys: {len(data)} ({', '.join(list(data.keys())[:10])}{'...' if len(data) > 10 else ''})\n"
+            elif isinstance(data, list):
+                result += f"Items: {len(data)}\n"
+            return result
+        else:
+            raise ToolError(f"Unknown operation '{operation}'. Available: format, validate")
+
+    except json.JSONDecodeError as e:
+        raise ToolError(f"Invalid JSON - {str(e)}") from e
+    except ToolError:
+        raise
+    except Exception as e:
+        raise ToolError(f"Error processing JSON: {str(e)}") from e
+
+
+def _analyze_text(text: str, analysis_type: str = "word_count", expires_at=None) -> str:
+    """Perform various text analysis operations."""
+    try:
+        results = [f"Text Analysis - Type: {analysis_type}"]
+        results.append("=" * 50)
+
+        if analysis_type == "word_count":
+            words = re.findall(r'\b\w+\b', text.lower())
+            words = [word for word in words if len(word) >= 3]
+
+            word_freq = {}
+            for chunk in _chunks(words, expires_at):
+                for word in chunk:
+                    word_freq[word] = word_freq.get(word, 0) + 1
+
+            # Sort by frequency
+            sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
+
+            results.append(f"Total words: {len(words)}")
+            results.append(f"Unique words: {len(word_freq)}")
+            results.append(f"Top 15 most frequent words:")
+            for word, count in sorted_words[:15]:
+                results.append(f"  {word}: {count}")
+
+        elif analysis_type == "char_count":
+            char_count = len(text)
+            char_count_no_spaces = len(text.replace(' ', ''))
+            lines = text.split('\n')
+            paragraphs = [p for p in text.split('\n\n') if p.strip()]
+
+            results.append(f"Total characters: {char_count}")
+            results.append(f"Characters (no spaces): {char_count_no_spaces}")
+            results.append(f"Lines: {len(lines)}")
+            results.append(f"Paragraphs: {len(paragraphs)}")
+            if lines:
+                results.append(f"Average line length: {char_count / len(lines):.1f} characters")
+
+        elif analysis_type == "sentiment":
+            # Simple sentiment analysis based on word lists
+            positive_words = ['good', 'great', 'excellent', 'amazing', 'wonderful', 'fantastic', 'love', 'like', 'happy', 'joy']
+            negative_words = ['bad', 'terrible', 'awful', 'hate', 'dislike', 'sad', 'angry', 'frustrated', 'disappointed']
+
+            words = re.findall(r'\b\w+\b', text.lower())
+            positive_count = sum(1 for word in words if word in positive_words)
+            negative_count = sum(1 for word in words if word in negative_words)
+
+            sentiment_score = positive_count - negative_count
+            total_sentiment_words = positive_count + negative_count
+
+            results.append(f"Positive words: {positive_count}")
+            results.append(f"Negative words: {negative_count}")
+            results.append(f"Sentiment score: {sentiment_score}")
+
+            if sentiment_score > 0:
+                sentiment = "Positive"
+            elif sentiment_score < 0:
+                sentiment = "Negative"
+            else:
+                sentiment = "Neutral"
+
+            results.append(f"Overall sentiment: {sentiment}")
+
+            if total_sentiment_words > 0:
+                results.append(f"Sentiment ratio: {positive_count / total_sentiment_words * 100:.1f}% positive")
+        else:
+            raise ToolError(f"Unknown analysis type '{analysis_type}'. Available: word_count, char_count, sentiment")
+
+        return "\n".join(results)
+    except ToolError:
+        raise
+    except Exception as e:
+        raise ToolError(f"Error analyzing text: {str(e)}") from e
+
+
+def _convert_data(data: str, source_format: str, target_format: str, expires_at=None):
+    """Parse data for conversion; returns (rows, csv headers or None, whole).
+
+    `whole` is set when the result is a single JSON value rather than rows.
+
+    Rows are rendered in the target format a page at a time by the tool, so
+    large conversions only pay for the part that is returned.
+    """
+    try:
+        # Parse source data
+        if source_format == "json":
+            parsed_data = json.loads(data)
+        elif source_format == "csv":
+            # Simple CSV parsing
+            lines = data.strip().split('\n')
+            if not lines:
+                raise ToolError("Empty CSV data")
+
+            headers = [h.strip() for h in lines[0].split(',')]
+            parsed_data = []
+            for chunk in _chunks(lines[1:], expires_at):
+                for line in chunk:
+                    values = [v.strip() for v in line.split(',')]
+                    if len(values) == len(headers):
+                        parsed_data.append(dict(zip(headers, values)))
+        else:
+            raise ToolError(f"Unsupported source format '{source_format}'")
+
+        # Check the data fits the target format
+        if target_format == "json":
+            if isinstance(parsed_data, list) and parsed_data:
+                return parsed_data, None, False
+            return [parsed_data], None, True
+        elif target_format == "csv":
+            if isinstance(parsed_data, list) and all(isinstance(item, dict) for item in parsed_data):
+                return parsed_data, list(parsed_data[0].keys()) if parsed_data else [], False
+            else:
+                raise ToolError("Data must be a list of dictionaries for CSV conversion")
+        else:
+            raise ToolError(f"Unsupported target format '{target_format}'")
+    except ToolError:
+        raise
+    except Exception as e:
+        raise ToolError(f"Error converting data: {str(e)}") from e
+
+
+def _csv_row(item, headers) -> str:
+    return ','.join(str(item.get(h, '')) for h in headers)
+
+
+def _json_row(item) -> str:
+    # Indented as an element of the JSON array the page is wrapped in
+    return textwrap.indent(json.dumps(item, indent=2, ensure_ascii=False), '  ')
+
 
 def register_data_tools(mcp):
     """Register all data processing tools with the MCP server."""
 
-    @mcp.tool(description="Format and validate JSON data")
-    def process_json(json_data: str, operation: str = "format") -> str:
+    @mcp.tool(description="Format and validate JSON data", annotations=READ_ONLY)
+    async def process_json(json_data: str, operation: str = "format") -> str:
         """Process JSON data with various operations."""
         try:
-            data = json.loads(json_data)
-            
-            if operation == "format":
-                formatted = json.dumps(data, indent=2, ensure_ascii=False)
-                result = f"JSON Processing - Operation: {operation}\n"
-                result += "=" * 50 + "\n"
-                result += "Formatted JSON:\n"
-                result += formatted
-                return result
-                
-            elif operation == "validate":
-                result = f"JSON Processing - Operation: {operation}\n"
-                result += "=" * 50 + "\n"
-                result += "✅ JSON is valid\n"
-                result += f"Type: {type(data).__name__}\n"
-                if isinstance(data, dict):
-                    result += f"Keys: {len(data)} ({', '.join(list(data.keys())[:10])}{'...' if len(data) > 10 else ''})\n"
-                elif isinstance(data, list):
-                    result += f"Items: {len(data)}\n"
-                return result
-            else:
-                return f"Error: Unknown operation '{operation}'. Available: format, validate"
-                
-        except json.JSONDecodeError as e:
-            return f"Error: Invalid JSON - {str(e)}"
+            return await run_cpu_bound(_process_json, json_data, operation, size=len(json_data))
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error processing JSON: {str(e)}"
+            raise ToolError(f"Error processing JSON: {str(e)}") from e
 
-    @mcp.tool(description="Analyze text for word count, sentiment, and readability")
-    def analyze_text(text: str, analysis_type: str = "word_count") -> str:
+    @mcp.tool(description="Analyze text for word count, sentiment, and readability", annotations=READ_ONLY)
+    async def analyze_text(text: str, analysis_type: str = "word_count") -> str:
         """Perform various text analysis operations."""
         try:
-            results = [f"Text Analysis - Type: {analysis_type}"]
-            results.append("=" * 50)
-            
-            if analysis_type == "word_count":
-                words = re.findall(r'\b\w+\b', text.lower())
-                words = [word for word in words if len(word) >= 3]
-                
-                word_freq = {}
-                for word in words:
-                    word_freq[word] = word_freq.get(word, 0) + 1
-                
-                # Sort by frequency
-                sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-                
-                results.append(f"Total words: {len(words)}")
-                results.append(f"Unique words: {len(word_freq)}")
-                results.append(f"Top 15 most frequent words:")
-                for word, count in sorted_words[:15]:
-                    results.append(f"  {word}: {count}")
-                    
-            elif analysis_type == "char_count":
-                char_count = len(text)
-                char_count_no_spaces = len(text.replace(' ', ''))
-                lines = text.split('\n')
-                paragraphs = [p for p in text.split('\n\n') if p.strip()]
-                
-                results.append(f"Total characters: {char_count}")
-                results.append(f"Characters (no spaces): {char_count_no_spaces}")
-                results.append(f"Lines: {len(lines)}")
-                results.append(f"Paragraphs: {len(paragraphs)}")
-                if lines:
-                    results.append(f"Average line length: {char_count / len(lines):.1f} characters")
-                    
-            elif analysis_type == "sentiment":
-                # Simple sentiment analysis based on word lists
-                positive_words = ['good', 'great', 'excellent', 'amazing', 'wonderful', 'fantastic', 'love', 'like', 'happy', 'joy']
-                negative_words = ['bad', 'terrible', 'awful', 'hate', 'dislike', 'sad', 'angry', 'frustrated', 'disappointed']
-                
-                words = re.findall(r'\b\w+\b', text.lower())
-                positive_count = sum(1 for word in words if word in positive_words)
-                negative_count = sum(1 for word in words if word in negative_words)
-                
-                sentiment_score = positive_count - negative_count
-                total_sentiment_words = positive_count + negative_count
-                
-                results.append(f"Positive words: {positive_count}")
-                results.append(f"Negative words: {negative_count}")
-                results.append(f"Sentiment score: {sentiment_score}")
-                
-                if sentiment_score > 0:
-                    sentiment = "Positive"
-                elif sentiment_score < 0:
-                    sentiment = "Negative"
-                else:
-                    sentiment = "Neutral"
-                
-                results.append(f"Overall sentiment: {sentiment}")
-                
-                if total_sentiment_words > 0:
-                    results.append(f"Sentiment ratio: {positive_count / total_sentiment_words * 100:.1f}% positive")
-            else:
-                return f"Error: Unknown analysis type '{analysis_type}'. Available: word_count, char_count, sentiment"
-            
-            return "\n".join(results)
+            return await run_cpu_bound(_analyze_text, text, analysis_type,
+                                       expires_at=current_deadline().wall_clock(), size=len(text))
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error analyzing text: {str(e)}"
+            raise ToolError(f"Error analyzing text: {str(e)}") from e
 
-    @mcp.tool(description="Convert data between JSON and CSV formats")
-    def convert_data(data: str, source_format: str, target_format: str) -> str:
+    @mcp.tool(description="Convert data between JSON and CSV formats; pass the returned cursor to get more rows", annotations=READ_ONLY)
+    async def convert_data(data: str = "", source_format: str = "", target_format: str = "", limit: Optional[int] = None,
+                           output_format: str = "text", max_bytes: Optional[int] = None,
+                           cursor: Optional[str] = None) -> Annotated[CallToolResult, ConvertedData]:
         """Convert data between different formats."""
         try:
-            # Parse source data
-            if source_format == "json":
-                parsed_data = json.loads(data)
-            elif source_format == "csv":
-                # Simple CSV parsing
-                lines = data.strip().split('\n')
-                if not lines:
-                    return "Error: Empty CSV data"
-                
-                headers = [h.strip() for h in lines[0].split(',')]
-                parsed_data = []
-                for line in lines[1:]:
-                    values = [v.strip() for v in line.split(',')]
-                    if len(values) == len(headers):
-                        parsed_data.append(dict(zip(headers, values)))
-            else:
-                return f"Error: Unsupported source format '{source_format}'"
-            
-            # Convert to target format
-            if target_format == "json":
-                output = json.dumps(parsed_data, indent=2, ensure_ascii=False)
-            elif target_format == "csv":
-                if isinstance(parsed_data, list) and all(isinstance(item, dict) for item in parsed_data):
-                    if parsed_data:
-                        headers = list(parsed_data[0].keys())
-                        csv_lines = [','.join(headers)]
-                        for item in parsed_data:
-                            row = [str(item.get(h, '')) for h in headers]
-                            csv_lines.append(','.join(row))
-                        output = '\n'.join(csv_lines)
-                    else:
-                        output = ""
-                else:
-                    return "Error: Data must be a list of dictionaries for CSV conversion"
+            if cursor:
+                return responses.page("convert_data", cursor, output_format=output_format,
+                                      max_bytes=max_bytes, limit=limit)
+            responses.require_inputs(data=data, source_format=source_format, target_format=target_format)
+
+            rows, headers, whole = await run_cpu_bound(_convert_data, data, source_format, target_format,
+                                                       expires_at=current_deadline().wall_clock(), size=len(data))
+
+            header = ["=" * 50]
+            if headers is not None:
+                header.append(','.join(headers))
+                render = serialize = functools.partial(_csv_row, headers=headers)
+                text_body = "lines"
+            elif whole:
+                render = functools.partial(json.dumps, indent=2, ensure_ascii=False)
+                serialize, text_body = None, "lines"
             else:
-                return f"Error: Unsupported target format '{target_format}'"
-            
-            result = f"Data Conversion: {source_format} → {target_format}\n"
-            result += "=" * 50 + "\n"
-            result += output
-            
-            return result
+                render, serialize, text_body = _json_row, None, "json_array"
+
+            return responses.paginate(
+                "convert_data", rows, title=f"Data Conversion: {source_format} → {target_format}",
+                header=header, render=render, serialize=serialize, text_body=text_body,
+                meta={"source_format": source_format, "target_format": target_format, "headers": headers},
+                output_format=output_format, max_bytes=max_bytes, limit=limit,
+            )
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error converting data: {str(e)}"
+            raise ToolError(f"Error converting data: {str(e)}") from e
 
-    @mcp.tool(description="Generate hash values for data")
+    @mcp.tool(description="Generate hash values for data", annotations=READ_ONLY)
     def hash_data(data: str, algorithm: str = "sha256") -> str:
         """Generate hash values for data."""
         try:
@@ -181,7 +282,7 @@ def register_data_tools(mcp):
             elif algorithm == "sha512":
                 hash_obj = hashlib.sha512(data_bytes)
             else:
-                return f"Error: Unsupported algorithm '{algorithm}'. Available: md5, sha1, sha256, sha512"
+                raise ToolError(f"Unsupported algorithm '{algorithm}'. Available: md5, sha1, sha256, sha512")
             
             hash_value = hash_obj.hexdigest()
             
@@ -191,10 +292,12 @@ def register_data_tools(mcp):
             results.append(f"Hash value: {hash_value}")
             
             return "\n".join(results)
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error generating hash: {str(e)}"
+            raise ToolError(f"Error generating hash: {str(e)}") from e
 
-    @mcp.tool(description="Encode or decode data using Base64 or URL encoding")
+    @mcp.tool(description="Encode or decode data using Base64 or URL encoding", annotations=READ_ONLY)
     def encode_decode(data: str, operation: str) -> str:
         """Encode or decode data using various methods."""
         try:
@@ -214,7 +317,7 @@ def register_data_tools(mcp):
                     results.append(f"Base64 input: {data}")
                     results.append(f"Decoded: {decoded}")
                 except Exception as e:
-                    return f"Error: Invalid Base64 data - {str(e)}"
+                    raise ToolError(f"Invalid Base64 data - {str(e)}") from e
                     
             elif operation == "url_encode":
                 encoded = urllib.parse.quote(data)
@@ -227,8 +330,10 @@ def register_data_tools(mcp):
                 results.append(f"Decoded: {decoded}")
                 
             else:
-                return f"Error: Unknown operation '{operation}'. Available: base64_encode, base64_decode, url_encode, url_decode"
+                raise ToolError(f"Unknown operation '{operation}'. Available: base64_encode, base64_decode, url_encode, url_decode")
             
             return "\n".join(results)
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error in encode/decode operation: {str(e)}" 
\ No newline at end of file
+            raise ToolError(f"Error in encode/decode operation: {str(e)}") from e
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Deadlines for MCP Tool Calls
+Every tool call carries a deadline, taken from the client's request `_meta`
+(`timeout_ms`) or the tool's default. Tools read it with current_deadline()
+to bound HTTP requests, filesystem walks and data loops, and the call is
+cancelled when the deadline passes or the client disconnects.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.server.lowlevel.server import request_ctx
+
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("MCP_TOOL_TIMEOUT", "120"))
+MAX_TOOL_TIMEOUT = float(os.environ.get("MCP_TOOL_MAX_TIMEOUT", "600"))
+
+# Time a cooperative tool gets past its deadline to return partial results
+# before the call is cancelled outright
+ENFORCEMENT_GRACE = 1.0
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# Default deadline in seconds by tool name; 0 means no default (a client
+# deadline still applies). Unlisted tools use MCP_TOOL_TIMEOUT.
+TOOL_TIMEOUTS = {
+    "list_directory": 30,
+    "search_files": 60,
+    "extract_text": 45,
+    "extract_links": 45,
+    "search_web": 30,
+    "get_weather": 30,
+    "get_news": 45,
+    "get_crypto_prices": 30,
+    "get_ip_info": 30,
+    # Bounded by its own timeout argument (capped at MCP_COMMAND_MAX_TIMEOUT),
+    # and background jobs outlive the call
+    "run_command": 0,
+}
+
+if os.environ.get("MCP_TOOL_TIMEOUTS"):
+    TOOL_TIMEOUTS.update(json.loads(os.environ["MCP_TOOL_TIMEOUTS"]))
+
+
+class DeadlineExceeded(ToolError):
+    """The call ran out of time or was cancelled by the client."""
+
+
+class Deadline:
+    """Expiry time of one tool call, plus a cancellation flag visible from worker threads."""
+
+    __slots__ = ("timeout", "expires_at", "_cancelled")
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout if timeout else math.inf
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        """Seconds left (math.inf without a deadline, 0 once cancelled)."""
+        if self._cancelled.is_set():
+            return 0.0
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self._cancelled.is_set() or time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Raise DeadlineExceeded if the call should stop."""
+        if self._cancelled.is_set():
+            raise DeadlineExceeded("Call was cancelled")
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(f"Deadline of {self.timeout:g}s exceeded")
+
+    def cap(self, timeout: float) -> float:
+        """A timeout for one blocking operation: `timeout` limited to the time left."""
+        self.check()
+        return max(min(timeout, self.remaining()), 0.001)
+
+    def wall_clock(self) -> Optional[float]:
+        """Expiry as a time.time() value, for work shipped to other processes."""
+        if self.expires_at == math.inf:
+            return None
+        return time.time() + self.remaining()
+
+
+_NO_DEADLINE = Deadline()
+_current = contextvars.ContextVar("tool_deadline", default=None)
+
+
+def current_deadline() -> Deadline:
+    """Deadline of the tool call running in this context (never expires outside a call)."""
+    return _current.get() or _NO_DEADLINE
+
+
+def check_expiry(expires_at: Optional[float]):
+    """Raise DeadlineExceeded once time.time() passes `expires_at` (see Deadline.wall_clock)."""
+    if expires_at is not None and time.time() >= expires_at:
+        raise DeadlineExceeded("Deadline exceeded")
+
+
+def _client_timeout() -> Optional[float]:
+    """Timeout requested by the client as `_meta.timeout_ms` on the tools/call request."""
+    try:
+        meta = request_ctx.get().meta
+    except LookupError:
+        return None
+    value = (meta.model_extra or {}).get("timeout_ms") if meta is not None else None
+    try:
+        return float(value) / 1000 if value is not None and float(value) > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def _watch_disconnect(request, deadline: Deadline, task: asyncio.Task):
+    """Cancel the deadline and `task` if the HTTP client goes away first."""
+    while not task.done():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        if await request.is_disconnected():
+            deadline.cancel()
+            task.cancel()
+            return
+
+
+def deadline_tool(fn, name: str):
+    """Wrap a tool function so each call runs under a Deadline.
+
+    Async tools are cancelled ENFORCEMENT_GRACE seconds after the deadline
+    and on client disconnect; the Deadline is cancelled too, so work running
+    in threads (which can't be interrupted) stops at its next check().
+    """
+    default = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+
+    def start():
+        timeout = _client_timeout() or default or None
+        return Deadline(min(timeout, MAX_TOOL_TIMEOUT) if timeout else None)
+
+    if not inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            deadline = start()
+            token = _current.set(deadline)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                deadline.cancel()
+                _current.reset(token)
+        return wrapper
+
+    async def run(deadline, args, kwargs):
+        try:
+            request = request_ctx.get().request
+        except LookupError:
+            request = None
+        if request is None or not hasattr(request, "is_disconnected"):
+            return await fn(*args, **kwargs)
+
+        # Run the tool as its own task so a disconnect cancels only the
+        # tool, not the server's request handling around it
+        call = asyncio.ensure_future(fn(*args, **kwargs))
+        watcher = asyncio.create_task(_watch_disconnect(request, deadline, call))
+        try:
+            return await call
+        except asyncio.CancelledError:
+            if deadline.cancelled and not asyncio.current_task().cancelling():
+                raise DeadlineExceeded("Client disconnected") from None
+            raise
+        finally:
+            watcher.cancel()
+
+    @functools.wraps(fn)
+    async def async_wrapper(*args, **kwargs):
+        deadline = start()
+        token = _current.set(deadline)
+        try:
+            if deadline.timeout is None:
+                return await run(deadline, args, kwargs)
+            scope = asyncio.timeout(deadline.timeout + ENFORCEMENT_GRACE)
+            try:
+                async with scope:
+                    return await run(deadline, args, kwargs)
+            except TimeoutError:
+                if scope.expired():
+                    raise DeadlineExceeded(f"{name} did not finish within its {deadline.timeout:g}s deadline") from None
+                raise
+        finally:
+            deadline.cancel()
+            _current.reset(token)
+
+    return async_wrapper
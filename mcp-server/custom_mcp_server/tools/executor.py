@@ -0,0 +1,82 @@
+"""
+Shared executors for tool work.
+A process pool keeps text analysis, JSON processing and HTML parsing off the
+event loop so large inputs don't stall every other in-flight MCP request; a
+thread pool runs the synchronous (blocking I/O) tools.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+
+def _default_pool_size() -> int:
+    # Split the machine's cores between the server's worker processes
+    server_workers = max(int(os.environ.get("MCP_SERVER_WORKERS", "1")), 1)
+    return max((os.cpu_count() or 1) // server_workers, 1)
+
+
+PROCESS_POOL_WORKERS = int(os.environ.get("MCP_PROCESS_POOL_WORKERS", str(_default_pool_size())))
+OFFLOAD_THRESHOLD = int(os.environ.get("MCP_OFFLOAD_THRESHOLD", str(64 * 1024)))
+TOOL_THREADS = int(os.environ.get("MCP_TOOL_THREADS", "64"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_thread_pool = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use.
+
+    Workers are spawned rather than forked: the server has background
+    threads, and forking a threaded process can deadlock the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Return the thread pool that runs synchronous tools, creating it on first use."""
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+        return _thread_pool
+
+
+def shutdown_process_pool():
+    """Shut down the shared pools, cancelling work that has not started."""
+    global _pool, _thread_pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
+
+
+async def run_cpu_bound(func, *args, size: int = 0, threshold: Optional[int] = None, **kwargs):
+    """Run func(*args, **kwargs) inline for small inputs, in the process pool for large ones.
+
+    `func` must be a module-level function so it can be pickled. `size` is
+    the input size in characters/bytes; anything below `threshold` (default
+    OFFLOAD_THRESHOLD) runs inline because shipping it to a worker would
+    cost more than the work itself.
+    """
+    threshold = OFFLOAD_THRESHOLD if threshold is None else threshold
+    if PROCESS_POOL_WORKERS <= 0 or size < threshold:
+        return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(func, *args, **kwargs))
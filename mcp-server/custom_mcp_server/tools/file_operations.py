@@ -3,16 +3,27 @@ File Operations Tools for MCP Server
 Provides comprehensive file system operations.
 """
 
+import fnmatch
+import functools
+import hashlib
 import os
 import shutil
 import glob
 import json
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Annotated, Any, Dict, List, Optional
 import mimetypes
 
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import CallToolResult
 from pydantic import BaseModel, Field
 
+from . import responses
+from .cache import get_cache
+from .coalescing import READ_ONLY
+from .deadlines import current_deadline
+
 # Pydantic models for tool parameters
 class ReadFileParams(BaseModel):
     file_path: str = Field(description="Path to the file to read")
@@ -51,26 +62,209 @@ class CreateDirectoryParams(BaseModel):
 class GetFileInfoParams(BaseModel):
     file_path: str = Field(description="Path to the file to get information about")
 
+# Result models, returned as structured content alongside the text. List
+# entries are slotted dataclasses: pages of them stay small in the cursor store
+@dataclass(slots=True)
+class DirectoryEntry:
+    name: str
+    type: str
+    size: Optional[int] = None
+    modified: Optional[float] = None
+    mime_type: Optional[str] = None
+
+@dataclass(slots=True)
+class FileMatch:
+    path: str
+    type: str
+    size: Optional[int] = None
+
+class DirectoryListing(responses.Page):
+    directory: str
+    items: List[DirectoryEntry]
+
+class FileSearchResults(responses.Page):
+    directory: str
+    pattern: str
+    items: List[FileMatch]
+
+class FileContent(BaseModel):
+    file: str
+    size: int
+    offset: int
+    content: str
+    next_cursor: Optional[str] = None
+
+class FileInfo(BaseModel):
+    path: str
+    name: str
+    type: str
+    size: int
+    created: float
+    modified: float
+    accessed: float
+    permissions: str
+    mime_type: Optional[str] = None
+    checksum_algorithm: Optional[str] = None
+    checksum: Optional[str] = None
+
+CHECKSUM_ALGORITHMS = ("md5", "sha1", "sha256")
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+# Paging helpers: results are rendered (and stat'ed) one page at a time
+
+def _render_match(path: Path) -> str:
+    if path.is_file():
+        return f"  📄 {path} ({path.stat().st_size} bytes)"
+    return f"  📁 {path}/"
+
+def _serialize_match(path: Path) -> FileMatch:
+    if path.is_file():
+        return FileMatch(str(path), "file", path.stat().st_size)
+    return FileMatch(str(path), "directory")
+
+def _render_entry(entry, detailed: bool = False) -> str:
+    item, is_dir = entry
+    if not detailed:
+        return f"📁 {item.name}/" if is_dir else f"📄 {item.name}"
+    stat = item.stat()
+    if is_dir:
+        return f"📁 {item.name}/ (modified: {stat.st_mtime})"
+    mime_type = mimetypes.guess_type(item.name)[0] or "unknown"
+    return f"📄 {item.name} ({stat.st_size} bytes, {mime_type}, modified: {stat.st_mtime})"
+
+def _serialize_entry(entry, detailed: bool = False) -> DirectoryEntry:
+    item, is_dir = entry
+    result = DirectoryEntry(item.name, "directory" if is_dir else "file")
+    if detailed:
+        stat = item.stat()
+        result.modified = stat.st_mtime
+        if not is_dir:
+            result.size = stat.st_size
+            result.mime_type = mimetypes.guess_type(item.name)[0] or "unknown"
+    return result
+
+def _read_chunk(path: Path, encoding: str, position: int, budget: int):
+    """Up to `budget` UTF-8 bytes of text from a tell() position; returns (text, next position or None)."""
+    with open(path, 'r', encoding=encoding) as f:
+        if position:
+            f.seek(position)
+        chunk = f.read(budget)
+        content = responses.fit_text(chunk, budget)
+        if len(content) < len(chunk):
+            f.seek(position)
+            f.read(len(content))
+        next_position = f.tell()
+        return content, next_position if f.read(1) else None
+
+def _walk_entries(root: Path, pattern: str, recursive: bool = True):
+    """Yield (path, matched) for every entry under root, without following symlinked directories.
+
+    Every entry is yielded, matching or not, so callers can check their
+    deadline even in trees where nothing matches. Names are matched with
+    fnmatch; a pattern containing "/" is matched against the relative path.
+    """
+    match_path = "/" in pattern
+    stack = [(str(root), "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        for entry in entries:
+            relative = prefix + entry.name
+            if match_path:
+                matched = fnmatch.fnmatch(relative, pattern) or (recursive and fnmatch.fnmatch(relative, "*/" + pattern))
+            else:
+                matched = fnmatch.fnmatch(entry.name, pattern)
+            yield Path(entry.path), matched
+            if recursive:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, relative + "/"))
+                except OSError:
+                    pass
+
+def _file_digest(path: Path, algorithm: str) -> str:
+    """Hex digest of a file, streamed in blocks so large files stay within the call's deadline."""
+    deadline = current_deadline()
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while block := f.read(CHECKSUM_BLOCK_SIZE):
+            deadline.check()
+            digest.update(block)
+    return digest.hexdigest()
+
+def _scan_directory(directory: Path, show_hidden: bool):
+    """Sorted [name, is_dir] pairs, and whether the deadline cut the scan short."""
+    deadline = current_deadline()
+    entries = []
+    for item in directory.iterdir():
+        if deadline.expired:
+            return entries, True
+        if not show_hidden and item.name.startswith('.'):
+            continue
+        entries.append([item.name, item.is_dir()])
+    # Directories first, then by name
+    entries.sort(key=lambda entry: (not entry[1], entry[0]))
+    return entries, False
+
 def register_file_tools(mcp):
     """Register all file operation tools with the MCP server."""
 
-    @mcp.tool(description="Read the contents of a file")
-    def read_file(file_path: str, encoding: str = "utf-8") -> str:
+    @mcp.tool(description="Read the contents of a file, in parts of at most max_bytes; pass the returned cursor to read the rest", annotations=READ_ONLY)
+    def read_file(file_path: str, encoding: str = "utf-8", output_format: str = "text",
+                  max_bytes: Optional[int] = None, cursor: Optional[str] = None) -> Annotated[CallToolResult, FileContent]:
         """Read the contents of a file."""
         try:
+            offset = 0
+            position = 0
+            if cursor:
+                state, offset = responses.load_cursor("read_file", cursor)
+                file_path, encoding, position = state["path"], state["encoding"], state["position"]
+
             file_path_obj = Path(file_path)
             if not file_path_obj.exists():
-                return f"Error: File '{file_path}' does not exist."
+                raise ToolError(f"File '{file_path}' does not exist.")
             
             if file_path_obj.is_dir():
-                return f"Error: '{file_path}' is a directory, not a file."
-            
-            with open(file_path_obj, 'r', encoding=encoding) as f:
-                content = f.read()
-            
-            return f"File: {file_path}\nSize: {file_path_obj.stat().st_size} bytes\n\n{content}"
+                raise ToolError(f"'{file_path}' is a directory, not a file.")
+
+            responses.check_output_format(output_format)
+
+            stat = file_path_obj.stat()
+            if cursor and stat.st_mtime != state["mtime"]:
+                raise ToolError(f"'{file_path}' changed since the cursor was issued; read it again without a cursor.")
+
+            header = f"File: {file_path}\nSize: {stat.st_size} bytes\n\n"
+            budget = responses.text_budget(max_bytes, len(header.encode()))
+            content, next_position = _read_chunk(file_path_obj, encoding, position, budget)
+
+            next_cursor = None
+            if next_position is not None:
+                next_cursor = responses.save_cursor("read_file", {
+                    "path": file_path, "encoding": encoding, "mtime": stat.st_mtime, "position": next_position,
+                }, offset + len(content))
+
+            structured = {
+                "file": file_path, "size": stat.st_size, "offset": offset,
+                "content": content, "next_cursor": next_cursor,
+            }
+            if output_format == "json":
+                return responses.tool_result(responses.dump_json(structured), structured)
+
+            # Structured callers get the content once, in the structured result
+            result = header + content if output_format == "text" else header.rstrip()
+            if next_cursor or offset:
+                result += f"\n\n📄 Characters {offset + 1}-{offset + len(content)}"
+                if next_cursor:
+                    result += f"; more with cursor=\"{next_cursor}\""
+            return responses.tool_result(result, structured)
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error reading file: {str(e)}"
+            raise ToolError(f"Error reading file: {str(e)}") from e
 
     @mcp.tool(description="Write content to a file")
     def write_file(file_path: str, content: str, encoding: str = "utf-8", append: bool = False) -> str:
@@ -88,98 +282,111 @@ def register_file_tools(mcp):
             action = "appended to" if append else "written to"
             return f"Successfully {action} file: {file_path}"
         except Exception as e:
-            return f"Error writing file: {str(e)}"
+            raise ToolError(f"Error writing file: {str(e)}") from e
 
-    @mcp.tool(description="Search for files by pattern and optionally by content")
-    def search_files(directory: str, pattern: str, content_search: Optional[str] = None, recursive: bool = True) -> str:
+    @mcp.tool(description="Search for files by pattern and optionally by content; pass the returned cursor to get more results", annotations=READ_ONLY)
+    def search_files(directory: str = "", pattern: str = "", content_search: Optional[str] = None, recursive: bool = True,
+                     limit: Optional[int] = 20, output_format: str = "text", max_bytes: Optional[int] = None,
+                     cursor: Optional[str] = None) -> Annotated[CallToolResult, FileSearchResults]:
         """Search for files by pattern and optionally by content."""
         try:
+            if cursor:
+                return responses.page("search_files", cursor, output_format=output_format,
+                                      max_bytes=max_bytes, limit=limit)
+            responses.require_inputs(directory=directory, pattern=pattern)
+
             directory_obj = Path(directory)
             if not directory_obj.exists():
-                return f"Error: Directory '{directory}' does not exist."
+                raise ToolError(f"Directory '{directory}' does not exist.")
             
-            # Search by file pattern
-            if recursive:
-                full_pattern = f"**/{pattern}"
-            else:
-                full_pattern = pattern
-            
-            files = list(directory_obj.glob(full_pattern))
-            
-            results = []
-            
-            # If content search is specified, filter files by content
-            if content_search:
-                content_matches = []
-                for file_path in files:
-                    if file_path.is_file():
-                        try:
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                file_content = f.read()
-                                if content_search.lower() in file_content.lower():
-                                    content_matches.append(file_path)
-                        except:
-                            continue
-                files = content_matches
+            # Walk (and match content) until the call's deadline, then report
+            # what was found so far. The deadline is checked at every entry,
+            # not only at matches, so a search with no hits still stops in time
+            deadline = current_deadline()
+            partial = None
+            needle = content_search.lower() if content_search else None
+            files = []
+            checked = 0
+            for file_path, matched in _walk_entries(directory_obj, pattern, recursive):
+                if deadline.expired:
+                    partial = f"stopped after checking {checked} paths: deadline reached"
+                    break
+                checked += 1
+                if not matched:
+                    continue
+
+                # If content search is specified, keep only files containing it
+                if needle is not None:
+                    if not file_path.is_file():
+                        continue
+                    try:
+                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                            if needle not in f.read().lower():
+                                continue
+                    except:
+                        continue
+                files.append(file_path)
             
             if files:
-                results.append(f"Found {len(files)} files matching criteria:")
-                for file_path in files[:20]:  # Limit to first 20 results
-                    if file_path.is_file():
-                        size = file_path.stat().st_size
-                        results.append(f"  📄 {file_path} ({size} bytes)")
-                    else:
-                        results.append(f"  📁 {file_path}/")
-                
-                if len(files) > 20:
-                    results.append(f"  ... and {len(files) - 20} more files")
+                title = f"Found {len(files)} files matching criteria:"
             else:
-                results.append("No files found matching the criteria.")
+                title = "No files found matching the criteria."
             
-            return "\n".join(results)
+            return responses.paginate(
+                "search_files", files, title=title, render=_render_match, serialize=_serialize_match,
+                notes=[f"⚠️ Partial results ({partial})"] if partial else [],
+                meta={"directory": directory, "pattern": pattern},
+                output_format=output_format, max_bytes=max_bytes, limit=limit,
+            )
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error searching files: {str(e)}"
+            raise ToolError(f"Error searching files: {str(e)}") from e
 
-    @mcp.tool(description="List contents of a directory")
-    def list_directory(directory: str, show_hidden: bool = False, detailed: bool = False) -> str:
+    @mcp.tool(description="List contents of a directory; pass the returned cursor to get more entries", annotations=READ_ONLY)
+    def list_directory(directory: str = "", show_hidden: bool = False, detailed: bool = False,
+                       limit: Optional[int] = None, output_format: str = "text",
+                       max_bytes: Optional[int] = None, cursor: Optional[str] = None) -> Annotated[CallToolResult, DirectoryListing]:
         """List contents of a directory."""
         try:
+            if cursor:
+                return responses.page("list_directory", cursor, output_format=output_format,
+                                      max_bytes=max_bytes, limit=limit)
+            responses.require_inputs(directory=directory)
+
             directory_obj = Path(directory)
             if not directory_obj.exists():
-                return f"Error: Directory '{directory}' does not exist."
+                raise ToolError(f"Directory '{directory}' does not exist.")
             
             if not directory_obj.is_dir():
-                return f"Error: '{directory}' is not a directory."
+                raise ToolError(f"'{directory}' is not a directory.")
             
-            items = []
-            for item in directory_obj.iterdir():
-                if not show_hidden and item.name.startswith('.'):
-                    continue
-                
-                if detailed:
-                    stat = item.stat()
-                    size = stat.st_size
-                    modified = stat.st_mtime
-                    
-                    if item.is_dir():
-                        items.append(f"📁 {item.name}/ (modified: {modified})")
-                    else:
-                        mime_type = mimetypes.guess_type(item.name)[0] or "unknown"
-                        items.append(f"📄 {item.name} ({size} bytes, {mime_type}, modified: {modified})")
-                else:
-                    if item.is_dir():
-                        items.append(f"📁 {item.name}/")
-                    else:
-                        items.append(f"📄 {item.name}")
+            # A directory's mtime changes whenever entries are added, removed or renamed
+            directory_stat = directory_obj.stat()
+            names, partial = get_cache().get_or_compute(
+                "listing", [str(directory_obj.resolve()), directory_stat.st_mtime_ns, show_hidden],
+                functools.partial(_scan_directory, directory_obj, show_hidden),
+                cacheable=lambda listing: not listing[1],
+            )
+            entries = [(directory_obj / name, is_dir) for name, is_dir in names]
             
-            if items:
-                result = f"Contents of {directory}:\n" + "\n".join(sorted(items))
+            if entries:
+                title = f"Contents of {directory}:"
             else:
-                result = f"Directory {directory} is empty."
+                title = f"Directory {directory} is empty."
             
-            return result
+            return responses.paginate(
+                "list_directory", entries, title=title,
+                render=functools.partial(_render_entry, detailed=detailed),
+                serialize=functools.partial(_serialize_entry, detailed=detailed),
+                notes=[f"⚠️ Partial listing ({len(entries)} entries): deadline reached"] if partial else [],
+                meta={"directory": directory},
+                output_format=output_format, max_bytes=max_bytes, limit=limit,
+            )
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error listing directory: {str(e)}"
+            raise ToolError(f"Error listing directory: {str(e)}") from e
 
     @mcp.tool(description="Delete a file or directory")
     def delete_file(file_path: str, recursive: bool = False) -> str:
@@ -187,7 +394,7 @@ def register_file_tools(mcp):
         try:
             file_path_obj = Path(file_path)
             if not file_path_obj.exists():
-                return f"Error: '{file_path}' does not exist."
+                raise ToolError(f"'{file_path}' does not exist.")
             
             if file_path_obj.is_dir():
                 if recursive:
@@ -195,14 +402,16 @@ def register_file_tools(mcp):
                     return f"Successfully deleted directory: {file_path}"
                 else:
                     if any(file_path_obj.iterdir()):
-                        return f"Error: Directory '{file_path}' is not empty. Use recursive=true to delete."
+                        raise ToolError(f"Directory '{file_path}' is not empty. Use recursive=true to delete.")
                     file_path_obj.rmdir()
                     return f"Successfully deleted empty directory: {file_path}"
             else:
                 file_path_obj.unlink()
                 return f"Successfully deleted file: {file_path}"
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error deleting: {str(e)}"
+            raise ToolError(f"Error deleting: {str(e)}") from e
 
     @mcp.tool(description="Copy a file or directory")
     def copy_file(source: str, destination: str, recursive: bool = False) -> str:
@@ -212,7 +421,7 @@ def register_file_tools(mcp):
             destination_obj = Path(destination)
             
             if not source_obj.exists():
-                return f"Error: Source '{source}' does not exist."
+                raise ToolError(f"Source '{source}' does not exist.")
             
             # Create parent directories for destination
             destination_obj.parent.mkdir(parents=True, exist_ok=True)
@@ -222,12 +431,14 @@ def register_file_tools(mcp):
                     shutil.copytree(source_obj, destination_obj, dirs_exist_ok=True)
                     return f"Successfully copied directory: {source} → {destination}"
                 else:
-                    return f"Error: Source is a directory. Use recursive=true to copy directories."
+                    raise ToolError(f"Source is a directory. Use recursive=true to copy directories.")
             else:
                 shutil.copy2(source_obj, destination_obj)
                 return f"Successfully copied file: {source} → {destination}"
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error copying: {str(e)}"
+            raise ToolError(f"Error copying: {str(e)}") from e
 
     @mcp.tool(description="Create a directory")
     def create_directory(directory: str, parents: bool = True) -> str:
@@ -237,32 +448,56 @@ def register_file_tools(mcp):
             directory_obj.mkdir(parents=parents, exist_ok=True)
             return f"Successfully created directory: {directory}"
         except Exception as e:
-            return f"Error creating directory: {str(e)}"
+            raise ToolError(f"Error creating directory: {str(e)}") from e
 
-    @mcp.tool(description="Get detailed information about a file or directory")
-    def get_file_info(file_path: str) -> str:
+    @mcp.tool(description="Get detailed information about a file or directory, optionally with a checksum (md5, sha1, sha256)", annotations=READ_ONLY)
+    def get_file_info(file_path: str, checksum: Optional[str] = None) -> Annotated[CallToolResult, FileInfo]:
         """Get detailed information about a file or directory."""
         try:
             file_path_obj = Path(file_path)
             if not file_path_obj.exists():
-                return f"Error: '{file_path}' does not exist."
+                raise ToolError(f"'{file_path}' does not exist.")
+            
+            if checksum is not None and checksum not in CHECKSUM_ALGORITHMS:
+                raise ToolError(f"Unsupported checksum '{checksum}'. Available: {', '.join(CHECKSUM_ALGORITHMS)}")
             
             stat = file_path_obj.stat()
-            info = [
-                f"Path: {file_path_obj.absolute()}",
-                f"Name: {file_path_obj.name}",
-                f"Type: {'Directory' if file_path_obj.is_dir() else 'File'}",
+            info = {
+                "path": str(file_path_obj.absolute()),
+                "name": file_path_obj.name,
+                "type": "directory" if file_path_obj.is_dir() else "file",
+                "size": stat.st_size,
+                "created": stat.st_ctime,
+                "modified": stat.st_mtime,
+                "accessed": stat.st_atime,
+                "permissions": oct(stat.st_mode)[-3:],
+            }
+            lines = [
+                f"Path: {info['path']}",
+                f"Name: {info['name']}",
+                f"Type: {info['type'].capitalize()}",
                 f"Size: {stat.st_size} bytes",
                 f"Created: {stat.st_ctime}",
                 f"Modified: {stat.st_mtime}",
                 f"Accessed: {stat.st_atime}",
-                f"Permissions: {oct(stat.st_mode)[-3:]}",
+                f"Permissions: {info['permissions']}",
             ]
             
             if file_path_obj.is_file():
-                mime_type = mimetypes.guess_type(file_path_obj.name)[0] or "unknown"
-                info.append(f"MIME Type: {mime_type}")
+                info["mime_type"] = mimetypes.guess_type(file_path_obj.name)[0] or "unknown"
+                lines.append(f"MIME Type: {info['mime_type']}")
+                if checksum:
+                    # Keyed on identity and change markers, so an edited or replaced file is re-hashed
+                    info["checksum_algorithm"] = checksum
+                    info["checksum"] = get_cache().get_or_compute(
+                        "file_digest",
+                        [str(file_path_obj.resolve()), stat.st_size, stat.st_mtime_ns, stat.st_ino, checksum],
+                        functools.partial(_file_digest, file_path_obj, checksum),
+                    )
+                    lines.append(f"{checksum.upper()}: {info['checksum']}")
             
-            return "\n".join(info)
+            return responses.tool_result("\n".join(lines), info)
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error getting file info: {str(e)}" 
\ No newline at end of file
+            raise ToolError(f"Error getting file info: {str(e)}") from e
\ No newline at end of file
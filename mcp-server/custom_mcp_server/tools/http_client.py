@@ -0,0 +1,426 @@
+"""
+Shared HTTP Client for MCP Server
+One pooled httpx client (sync for threaded tools, async for async tools)
+used by every network tool: keep-alive connections, HTTP/2 when `h2` is
+installed, jittered retries for idempotent requests, per-host circuit
+breakers that fail fast while a host is down, and a small DNS cache.
+"""
+
+import asyncio
+import importlib.util
+import ipaddress
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+from mcp.server.fastmcp.exceptions import ToolError
+
+from .deadlines import current_deadline
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+DEFAULT_HEADERS = {'User-Agent': USER_AGENT}
+
+HTTP2_ENABLED = (os.environ.get("MCP_HTTP2", "1").lower() not in ("0", "false", "no", "off")
+                 and importlib.util.find_spec("h2") is not None)
+MAX_CONNECTIONS = int(os.environ.get("MCP_HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.environ.get("MCP_HTTP_MAX_KEEPALIVE", "20"))
+RETRIES = int(os.environ.get("MCP_HTTP_RETRIES", "2"))
+RETRY_BACKOFF = 0.25
+RETRY_BACKOFF_CAP = 4.0
+MAX_RETRY_AFTER = 10.0
+BREAKER_FAILURES = int(os.environ.get("MCP_HTTP_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("MCP_HTTP_BREAKER_COOLDOWN", "30"))
+DNS_CACHE_TTL = float(os.environ.get("MCP_DNS_CACHE_TTL", "300"))
+DNS_CACHE_SIZE = 1024
+BREAKER_CACHE_SIZE = 1024
+
+# Base URLs of the external services the tools call, by name. Override them
+# with JSON in MCP_UPSTREAM_URLS, e.g. to point the tools at
+# benchmarks/fake_upstream.py: {"wttr": "http://127.0.0.1:8700/wttr"}
+UPSTREAMS = {
+    "wttr": "http://wttr.in",
+    "hackernews": "https://hacker-news.firebaseio.com",
+    "coingecko": "https://api.coingecko.com",
+    "ipapi": "http://ip-api.com",
+    "duckduckgo": "https://html.duckduckgo.com",
+}
+
+if os.environ.get("MCP_UPSTREAM_URLS"):
+    UPSTREAMS.update(json.loads(os.environ["MCP_UPSTREAM_URLS"]))
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def upstream_url(name: str, path: str = "") -> str:
+    """URL of `path` on the named upstream service."""
+    return UPSTREAMS[name].rstrip('/') + path
+
+
+def upstream_host(name: str) -> str:
+    return httpx.URL(UPSTREAMS[name]).host
+
+
+class CircuitOpenError(ToolError):
+    """The upstream host is failing and calls to it are being short-circuited."""
+
+
+class DNSCache:
+    """getaddrinfo results per (host, port), kept for `ttl` seconds."""
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL, max_entries: int = DNS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int):
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, host: str, port: int, addresses):
+        with self._lock:
+            self._entries[(host, port)] = (time.monotonic() + self.ttl, addresses)
+            self._entries.move_to_end((host, port))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def resolve(self, host: str, port: int):
+        addresses = self.get(host, port)
+        if addresses is None:
+            try:
+                infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except OSError as e:
+                # Surface as a connect error, as httpx would without the cache
+                raise httpx.ConnectError(str(e)) from e
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            self.put(host, port, addresses)
+        return addresses
+
+    async def resolve_async(self, host: str, port: int):
+        addresses = self.get(host, port)
+        if addresses is None:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except OSError as e:
+                raise httpx.ConnectError(str(e)) from e
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            self.put(host, port, addresses)
+        return addresses
+
+
+DNS_CACHE = DNSCache()
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+# A connection to one address failed; try the host's next one
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def _cached_targets(request):
+    """(host, port, requests to try in order) for a request, or None to send it as is."""
+    url = request.url
+    if _is_ip(url.host) or url.scheme not in ("http", "https"):
+        return None
+    port = url.port or (443 if url.scheme == "https" else 80)
+
+    def to_address(address):
+        # Same request sent to the address: the Host header keeps virtual
+        # hosting working and sni_hostname keeps TLS SNI and certificate
+        # checks on the real hostname
+        headers = request.headers.copy()
+        headers.setdefault("Host", url.netloc.decode("ascii"))
+        return httpx.Request(request.method, url.copy_with(host=address), headers=headers,
+                             stream=request.stream,
+                             extensions={**request.extensions, "sni_hostname": url.host})
+
+    return url.host, port, to_address
+
+
+class _CachingTransport(httpx.BaseTransport):
+    """httpx transport that connects to DNS_CACHE addresses.
+
+    Wraps a regular HTTPTransport through httpx's public transport API, so
+    it does not depend on httpx or httpcore internals.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        targets = _cached_targets(request)
+        if targets is None:
+            return self._transport.handle_request(request)
+        host, port, to_address = targets
+        error = None
+        for address in DNS_CACHE.resolve(host, port):
+            try:
+                return self._transport.handle_request(to_address(address))
+            except CONNECT_ERRORS as e:
+                error = e
+        DNS_CACHE.invalidate(host, port)
+        raise error
+
+    def close(self):
+        self._transport.close()
+
+
+class _AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of _CachingTransport."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        targets = _cached_targets(request)
+        if targets is None:
+            return await self._transport.handle_async_request(request)
+        host, port, to_address = targets
+        error = None
+        for address in await DNS_CACHE.resolve_async(host, port):
+            try:
+                return await self._transport.handle_async_request(to_address(address))
+            except CONNECT_ERRORS as e:
+                error = e
+        DNS_CACHE.invalidate(host, port)
+        raise error
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class CircuitBreaker:
+    """Per-host breaker: opens after BREAKER_FAILURES consecutive failures,
+    short-circuits calls for BREAKER_COOLDOWN seconds, then lets one trial
+    call through (half-open) to decide whether to close again."""
+
+    __slots__ = ("host", "failures", "opened_at", "trial_in_flight", "_lock")
+
+    def __init__(self, host: str):
+        self.host = host
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + BREAKER_COOLDOWN - time.monotonic()
+            if remaining > 0 or self.trial_in_flight:
+                raise CircuitOpenError(
+                    f"{self.host} is failing ({self.failures} consecutive errors); "
+                    f"not calling it for another {max(remaining, 0):.0f}s"
+                )
+            self.trial_in_flight = True
+
+    def record(self, success: bool):
+        with self._lock:
+            self.trial_in_flight = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= BREAKER_FAILURES:
+                self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """The call ended without telling us anything about the host (e.g. cancelled)."""
+        with self._lock:
+            self.trial_in_flight = False
+
+
+_breakers = OrderedDict()
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """Breaker for a host; closed breakers for least recently used hosts are evicted."""
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is not None:
+            _breakers.move_to_end(host)
+            return breaker
+        breaker = _breakers[host] = CircuitBreaker(host)
+        if len(_breakers) > BREAKER_CACHE_SIZE:
+            for name in list(_breakers):
+                if len(_breakers) <= BREAKER_CACHE_SIZE:
+                    break
+                if _breakers[name].opened_at is None:
+                    del _breakers[name]
+        return breaker
+
+
+def _client_options():
+    return {
+        'headers': DEFAULT_HEADERS,
+        'follow_redirects': True,
+        'http2': HTTP2_ENABLED,
+        'limits': httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+    }
+
+
+_sync_client = None
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    """Shared sync client, safe to use from the tool thread pool."""
+    global _sync_client
+    with _clients_lock:
+        if _sync_client is None:
+            options = _client_options()
+            transport = httpx.HTTPTransport(http2=options['http2'], limits=options['limits'])
+            _sync_client = httpx.Client(transport=_CachingTransport(transport), **options)
+        return _sync_client
+
+
+def get_async_client():
+    """Shared async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            options = _client_options()
+            transport = httpx.AsyncHTTPTransport(http2=options['http2'], limits=options['limits'])
+            client = _async_clients[loop] = httpx.AsyncClient(
+                transport=_AsyncCachingTransport(transport), **options)
+        return client
+
+
+async def close_http_clients():
+    """Close pooled connections (called on server shutdown)."""
+    global _sync_client
+    with _clients_lock:
+        sync_client, _sync_client = _sync_client, None
+        async_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.aclose()
+
+
+def _backoff(attempt: int, response=None) -> float:
+    """Full-jitter exponential backoff, honouring a short Retry-After."""
+    if response is not None:
+        retry_after = response.headers.get('retry-after', '')
+        if retry_after.isdigit():
+            # A long Retry-After means give up now rather than hold the call
+            return float(retry_after) if float(retry_after) <= MAX_RETRY_AFTER else math.inf
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF * 2 ** attempt))
+
+
+def _retry_delay(attempt: int, attempts: int, deadline, response=None) -> Optional[float]:
+    """Seconds to wait before the next attempt, or None to give up now."""
+    if attempt == attempts - 1:
+        return None
+    delay = _backoff(attempt, response)
+    return delay if delay < deadline.remaining() else None
+
+
+def _is_failure(response) -> bool:
+    """Whether a response counts against the host's circuit breaker."""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+# Malformed URLs and unsupported schemes are the caller's problem, not the host's
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+def _plan(method: str, url: str, retries: Optional[int]):
+    host = httpx.URL(url).host
+    attempts = 1 + (RETRIES if retries is None else retries) if method.upper() in IDEMPOTENT_METHODS else 1
+    return get_breaker(host), attempts
+
+
+def request(method: str, url: str, *, timeout: float = 30.0, retries: Optional[int] = None, **kwargs):
+    """Send a request with the shared sync client; returns an httpx.Response.
+
+    Idempotent methods are retried on connection errors, timeouts and
+    429/502/503/504 with jittered backoff, within the call's deadline.
+    Raises CircuitOpenError straight away while the host's breaker is open.
+    """
+    breaker, attempts = _plan(method, url, retries)
+    deadline = current_deadline()
+    client = get_client()
+    for attempt in range(attempts):
+        attempt_timeout = deadline.cap(timeout)
+        breaker.before_call()
+        try:
+            response = client.request(method, url, timeout=attempt_timeout, **kwargs)
+        except RETRYABLE_ERRORS:
+            breaker.record(False)
+            delay = _retry_delay(attempt, attempts, deadline)
+            if delay is None:
+                raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        else:
+            breaker.record(not _is_failure(response))
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            delay = _retry_delay(attempt, attempts, deadline, response)
+            if delay is None:
+                return response
+        time.sleep(delay)
+
+
+async def arequest(method: str, url: str, *, timeout: float = 30.0, retries: Optional[int] = None, **kwargs):
+    """Async counterpart of request() using the shared async client."""
+    breaker, attempts = _plan(method, url, retries)
+    deadline = current_deadline()
+    client = get_async_client()
+    for attempt in range(attempts):
+        attempt_timeout = deadline.cap(timeout)
+        breaker.before_call()
+        try:
+            response = await client.request(method, url, timeout=attempt_timeout, **kwargs)
+        except RETRYABLE_ERRORS:
+            breaker.record(False)
+            delay = _retry_delay(attempt, attempts, deadline)
+            if delay is None:
+                raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        else:
+            breaker.record(not _is_failure(response))
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            delay = _retry_delay(attempt, attempts, deadline, response)
+            if delay is None:
+                return response
+        await asyncio.sleep(delay)
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+async def aget(url: str, **kwargs):
+    return await arequest("GET", url, **kwargs)
@@ -0,0 +1,357 @@
+"""
+Tool Instrumentation for MCP Server
+Records per-tool call counts, errors, latency, payload sizes and in-flight
+requests, and exposes them in the Prometheus text format on /metrics.
+"""
+
+import asyncio
+import functools
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from mcp.server.fastmcp import Context
+from mcp.types import CallToolResult, TextContent
+from starlette.responses import PlainTextResponse
+
+from .executor import get_thread_pool
+from .lazy import lazy_import
+
+# Only needed when merging other workers' snapshots
+psutil = lazy_import("psutil")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# With several server workers each process writes its metrics here and
+# /metrics merges them, so a scrape sees totals whichever worker answers
+METRICS_MULTIPROC_DIR = os.environ.get("MCP_METRICS_MULTIPROC_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get("MCP_METRICS_FLUSH_INTERVAL", "5"))
+
+
+class Histogram:
+    """Fixed-bucket histogram (non-cumulative counts, plus +Inf)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {"buckets": list(self.buckets), "counts": self.counts, "sum": self.sum, "count": self.count}
+
+    def merge_dict(self, data):
+        if tuple(data["buckets"]) != self.buckets:
+            return
+        self.counts = [a + b for a, b in zip(self.counts, data["counts"])]
+        self.sum += data["sum"]
+        self.count += data["count"]
+
+
+def _label_key(labels) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=None) -> str:
+    pairs = list(key) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets=None):
+        self._descriptions[name] = (kind, help_text, tuple(buckets) if buckets else None)
+
+    def inc(self, name: str, labels=None, value: float = 1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add(self, name: str, labels=None, value: float = 1):
+        """Adjust a gauge by `value` (negative to decrease)."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def set(self, name: str, labels=None, value: float = 0):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, labels, value: float):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._descriptions[name][2])
+            histogram.observe(value)
+
+    def value(self, name: str, labels=None) -> float:
+        """Current counter or gauge value (0 if never set)."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, list(map(list, labels)), value] for (name, labels), value in self._counters.items()],
+                "gauges": [[name, list(map(list, labels)), value] for (name, labels), value in self._gauges.items()],
+                "histograms": [[name, list(map(list, labels)), histogram.to_dict()]
+                               for (name, labels), histogram in self._histograms.items()],
+            }
+
+    def write_snapshot(self, directory: str):
+        """Atomically write this process's snapshot to <directory>/<pid>.json."""
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _merged(self, directory=None):
+        """Merge this process's values with snapshots written by other workers."""
+        counters, gauges, histograms = {}, {}, {}
+
+        def merge(snapshot, live=True):
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            # Gauges of exited workers (e.g. in-flight counts) no longer apply
+            if live:
+                for name, labels, value in snapshot["gauges"]:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, data in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                if key not in histograms:
+                    histograms[key] = Histogram(data["buckets"])
+                histograms[key].merge_dict(data)
+
+        merge(self.snapshot())
+        if directory:
+            own = os.path.join(directory, f"{os.getpid()}.json")
+            for path in glob.glob(os.path.join(directory, "*.json")):
+                if path == own:
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                    pid = int(os.path.basename(path).split('.')[0])
+                except (OSError, ValueError):
+                    continue
+                merge(snapshot, live=psutil.pid_exists(pid))
+        return counters, gauges, histograms
+
+    def render(self, directory=None) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        counters, gauges, histograms = self._merged(directory)
+        lines = []
+
+        for name, (kind, help_text, _) in sorted(self._descriptions.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind in ("counter", "gauge"):
+                values = counters if kind == "counter" else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+            elif kind == "histogram":
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_number(float(bound)))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("mcp_tool_calls_total", "counter", "Tool calls started")
+REGISTRY.describe("mcp_tool_errors_total", "counter", "Tool calls that raised, by exception type")
+REGISTRY.describe("mcp_tool_cancelled_total", "counter", "Tool calls cancelled before completing")
+REGISTRY.describe("mcp_tool_in_flight", "gauge", "Tool calls currently executing")
+REGISTRY.describe("mcp_tool_duration_seconds", "histogram", "Tool call latency", LATENCY_BUCKETS)
+REGISTRY.describe("mcp_tool_request_size_bytes", "histogram", "Size of tool arguments", SIZE_BUCKETS)
+REGISTRY.describe("mcp_tool_response_size_bytes", "histogram", "Size of tool results", SIZE_BUCKETS)
+
+
+def payload_size(value) -> int:
+    """Approximate serialized size of tool arguments or results in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(payload_size(item) for item in value.values() if not isinstance(item, Context))
+    if isinstance(value, CallToolResult):
+        text = sum(payload_size(block.text) for block in value.content if isinstance(block, TextContent))
+        return text + payload_size(value.structuredContent)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+class _CallRecorder:
+    """Records the metrics for one tool call."""
+
+    __slots__ = ("labels", "started")
+
+    def __init__(self, tool: str, arguments):
+        self.labels = {"tool": tool}
+        REGISTRY.inc("mcp_tool_calls_total", self.labels)
+        REGISTRY.add("mcp_tool_in_flight", self.labels, 1)
+        REGISTRY.observe("mcp_tool_request_size_bytes", self.labels, payload_size(arguments))
+        self.started = time.perf_counter()
+
+    def finish(self, result=None, error: BaseException = None):
+        REGISTRY.add("mcp_tool_in_flight", self.labels, -1)
+        REGISTRY.observe("mcp_tool_duration_seconds", self.labels, time.perf_counter() - self.started)
+        if isinstance(error, asyncio.CancelledError):
+            REGISTRY.inc("mcp_tool_cancelled_total", self.labels)
+        elif error is not None:
+            REGISTRY.inc("mcp_tool_errors_total", {**self.labels, "type": type(error).__name__})
+        else:
+            REGISTRY.observe("mcp_tool_response_size_bytes", self.labels, payload_size(result))
+
+
+def instrument_tool(fn, name: str):
+    """Wrap a tool function (sync or async) so every call is recorded.
+
+    functools.wraps keeps the original signature visible to FastMCP, so the
+    generated input schema is unchanged.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            recorder = _CallRecorder(name, kwargs)
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException as e:
+                recorder.finish(error=e)
+                raise
+            recorder.finish(result)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        recorder = _CallRecorder(name, kwargs)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            recorder.finish(error=e)
+            raise
+        recorder.finish(result)
+        return result
+    return wrapper
+
+
+# Annotations each tool was registered with, by name, for wrappers that
+# depend on them (e.g. coalescing idempotent tools)
+TOOL_ANNOTATIONS = {}
+
+
+class InstrumentedMCP:
+    """Stands in for FastMCP inside register_*_tools and instruments every @mcp.tool.
+
+    Each tool is wrapped for call metrics outermost, then by each of
+    `wrappers` in order; a wrapper is a callable (fn, tool_name) -> fn and
+    can look up the tool's TOOL_ANNOTATIONS.
+    """
+
+    def __init__(self, mcp, wrappers=()):
+        self._mcp = mcp
+        self._wrappers = tuple(wrappers)
+
+    def tool(self, name=None, *args, **kwargs):
+        register = self._mcp.tool(name, *args, **kwargs)
+
+        def decorator(fn):
+            tool_name = name or fn.__name__
+            TOOL_ANNOTATIONS[tool_name] = kwargs.get("annotations")
+            for wrap in reversed(self._wrappers):
+                fn = wrap(fn, tool_name)
+            return register(instrument_tool(fn, tool_name))
+        return decorator
+
+    def __getattr__(self, attribute):
+        return getattr(self._mcp, attribute)
+
+
+_flush_thread = None
+
+
+def start_metrics_flusher(directory=METRICS_MULTIPROC_DIR, interval: float = METRICS_FLUSH_INTERVAL):
+    """Periodically write this worker's snapshot so other workers can merge it."""
+    global _flush_thread
+    if not directory or _flush_thread is not None:
+        return
+
+    def flush():
+        while True:
+            try:
+                REGISTRY.write_snapshot(directory)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    os.makedirs(directory, exist_ok=True)
+    _flush_thread = threading.Thread(target=flush, name="metrics-flusher", daemon=True)
+    _flush_thread.start()
+
+
+def _render_metrics() -> str:
+    if METRICS_MULTIPROC_DIR:
+        REGISTRY.write_snapshot(METRICS_MULTIPROC_DIR)
+    return REGISTRY.render(METRICS_MULTIPROC_DIR)
+
+
+async def metrics_endpoint(request):
+    """Starlette handler for GET /metrics.
+
+    Writing this worker's snapshot and merging every other worker's is file
+    I/O, so it runs in the tool thread pool instead of on the event loop.
+    """
+    text = await asyncio.get_running_loop().run_in_executor(get_thread_pool(), _render_metrics)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,41 @@
+"""
+Deferred imports for heavy tool dependencies.
+Tool modules bind `bs4`, `psutil` etc. through lazy_import so
+registering tools (and their schemas) doesn't pay for importing them; the
+import happens on first attribute access, i.e. when a tool first runs.
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+
+    __slots__ = ("_name", "_module", "_lock")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Tools run on the event loop and in worker threads, so the first
+        # accesses may race; the import itself happens once
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy for module `name` that imports it when first used."""
+    return LazyModule(name)
@@ -0,0 +1,376 @@
+"""
+Profiling Hooks for MCP Server
+Samples the stack of tool calls that have run long enough to be heading
+past a latency threshold (or every call of tools with always-on sampling)
+and writes a profile for calls that exceed it to a rotating directory.
+"""
+
+import functools
+import hmac
+import inspect
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from mcp.server.fastmcp import Context
+from mcp.server.fastmcp.exceptions import ToolError
+from starlette.responses import JSONResponse
+
+from .executor import get_thread_pool
+
+PROFILE_DIR = os.environ.get("MCP_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "mcp-profiles")
+PROFILE_THRESHOLD_MS = float(os.environ.get("MCP_PROFILE_THRESHOLD_MS", "2000"))
+PROFILE_INTERVAL_MS = float(os.environ.get("MCP_PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_FILES = int(os.environ.get("MCP_PROFILE_MAX_FILES", "50"))
+# Sampling of a call starts once it has run this fraction of the threshold,
+# so calls that finish well under it cost nothing beyond bookkeeping
+PROFILE_ARM_FRACTION = float(os.environ.get("MCP_PROFILE_ARM_FRACTION", "0.5"))
+# Required by the admin endpoint and admin tools; without it they are off
+ADMIN_TOKEN = os.environ.get("MCP_ADMIN_TOKEN") or None
+
+SETTINGS_FILE = "profiling.json"
+MAX_STACK_DEPTH = 128
+
+
+class _ActiveCall:
+    __slots__ = ("tool", "arguments", "thread_id", "is_async", "started", "armed_at", "samples")
+
+    def __init__(self, tool: str, arguments, thread_id: int, is_async: bool, arm_delay: float):
+        self.tool = tool
+        self.arguments = arguments
+        self.thread_id = thread_id
+        self.is_async = is_async
+        self.started = time.perf_counter()
+        self.armed_at = self.started + arm_delay
+        self.samples = Counter()
+
+
+def _collapse(frame) -> str:
+    """Render a frame's stack as 'file:function;...' from the root down."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def summarize_arguments(arguments, limit: int = 120) -> str:
+    parts = []
+    for name, value in arguments.items():
+        if isinstance(value, Context):
+            continue
+        text = repr(value)
+        if len(text) > limit:
+            text = f"{text[:limit]}... ({len(text)} chars)"
+        parts.append(f"{name}={text}")
+    return ", ".join(parts)
+
+
+class SlowCallProfiler:
+    """Sampling profiler for tool calls.
+
+    One background thread samples the executing thread of every armed call
+    via sys._current_frames() every interval, and sleeps otherwise. A call
+    is armed once it has run `arm_fraction` of the threshold (at once for
+    tools with always-on sampling), so fast calls are never sampled. When a
+    call ends its samples are written as collapsed stacks (flamegraph.pl /
+    speedscope format) if it ran longer than the threshold or its tool has
+    always-on sampling; otherwise they are dropped.
+    Settings live in a file in the profile directory so an admin change
+    reaches every server worker.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, threshold_ms: float = PROFILE_THRESHOLD_MS,
+                 interval_ms: float = PROFILE_INTERVAL_MS, max_files: int = PROFILE_MAX_FILES,
+                 arm_fraction: float = PROFILE_ARM_FRACTION):
+        self.directory = directory
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1000
+        self.arm_fraction = arm_fraction
+        self.max_files = max_files
+        self.always_on = set()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._settings_mtime = None
+        self._settings_checked = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0 or bool(self.always_on)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="tool-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                calls = list(self._active.values())
+            now = time.perf_counter()
+            armed = [call for call in calls if call.armed_at <= now]
+            if not armed:
+                # Sleep until the oldest call arms, checking for new calls
+                # often enough that they arm at most half a delay late.
+                # begin() only wakes us for calls that arm at once
+                timeout = self._poll_interval()
+                if calls:
+                    next_armed = min(call.armed_at for call in calls) - now
+                    timeout = next_armed if timeout is None else min(timeout, next_armed)
+                self._wake.wait(timeout)
+                self._wake.clear()
+                continue
+
+            frames = sys._current_frames()
+            for call in armed:
+                frame = frames.get(call.thread_id)
+                if frame is not None:
+                    call.samples[_collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _poll_interval(self) -> Optional[float]:
+        delay = self.threshold_ms / 1000 * self.arm_fraction
+        return delay / 2 if delay > 0 else None
+
+    def begin(self, tool: str, arguments, is_async: bool) -> Optional[_ActiveCall]:
+        self._sync_settings()
+        if not self.enabled:
+            return None
+        arm_delay = 0.0 if tool in self.always_on else self.threshold_ms / 1000 * self.arm_fraction
+        call = _ActiveCall(tool, arguments, threading.get_ident(), is_async, arm_delay)
+        with self._lock:
+            self._active[id(call)] = call
+        self._ensure_thread()
+        if not arm_delay:
+            self._wake.set()
+        return call
+
+    def end(self, call: Optional[_ActiveCall], error: Optional[BaseException] = None) -> Optional[str]:
+        if call is None:
+            return None
+        duration_ms = (time.perf_counter() - call.started) * 1000
+        with self._lock:
+            self._active.pop(id(call), None)
+
+        if call.tool in self.always_on:
+            reason = "always-on sampling"
+        elif self.threshold_ms > 0 and duration_ms >= self.threshold_ms:
+            reason = f"exceeded {self.threshold_ms:g} ms threshold"
+        else:
+            return None
+
+        if call.is_async:
+            # Async tools end on the event loop thread; keep the file I/O off it
+            get_thread_pool().submit(self._save, call, duration_ms, reason, error)
+            return None
+        return self._save(call, duration_ms, reason, error)
+
+    def _save(self, call: _ActiveCall, duration_ms: float, reason: str, error) -> Optional[str]:
+        try:
+            return self._write(call, duration_ms, reason, error)
+        except OSError:
+            return None
+
+    def _write(self, call: _ActiveCall, duration_ms: float, reason: str, error) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        path = os.path.join(self.directory, f"{stamp}-{call.tool}-{duration_ms:.0f}ms-{os.getpid()}.txt")
+
+        lines = [
+            f"# tool: {call.tool}",
+            f"# arguments: {summarize_arguments(call.arguments)}",
+            f"# duration_ms: {duration_ms:.1f}",
+            f"# reason: {reason}",
+            f"# outcome: {type(error).__name__ if error else 'ok'}",
+            f"# samples: {sum(call.samples.values())} (every {self.interval * 1000:g} ms, "
+            f"from {(call.armed_at - call.started) * 1000:.0f} ms into the call)",
+        ]
+        if call.is_async:
+            lines.append("# note: async tool; samples show whatever the event loop thread was running")
+        lines.append("# format: collapsed stacks (flamegraph.pl, speedscope)")
+        for stack, count in call.samples.most_common():
+            lines.append(f"{stack} {count}")
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        self._rotate()
+        return path
+
+    def profiles(self):
+        """Profile files in the directory, newest first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.txt')]
+        except OSError:
+            return []
+        return sorted(names, reverse=True)
+
+    def _rotate(self):
+        for name in self.profiles()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _settings_path(self) -> str:
+        return os.path.join(self.directory, SETTINGS_FILE)
+
+    def _sync_settings(self):
+        """Reload settings written by any worker, checking the file at most once a second."""
+        now = time.monotonic()
+        if now - self._settings_checked < 1.0:
+            return
+        self._settings_checked = now
+        try:
+            mtime = os.stat(self._settings_path()).st_mtime
+        except OSError:
+            return
+        if mtime == self._settings_mtime:
+            return
+        try:
+            with open(self._settings_path(), 'r', encoding='utf-8') as f:
+                settings = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._settings_mtime = mtime
+        self.threshold_ms = float(settings.get("threshold_ms", self.threshold_ms))
+        self.always_on = set(settings.get("always_on", []))
+
+    def configure(self, tool: Optional[str] = None, always_on: Optional[bool] = None,
+                  threshold_ms: Optional[float] = None):
+        """Update settings and persist them for the other workers."""
+        self._settings_checked = 0.0
+        self._sync_settings()
+        if tool and always_on is not None:
+            if always_on:
+                self.always_on.add(tool)
+            else:
+                self.always_on.discard(tool)
+        if threshold_ms is not None:
+            self.threshold_ms = float(threshold_ms)
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._settings_path()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"threshold_ms": self.threshold_ms, "always_on": sorted(self.always_on)}, f)
+        os.replace(tmp_path, self._settings_path())
+        self._settings_mtime = os.stat(self._settings_path()).st_mtime
+        return self.status()
+
+    def status(self):
+        self._sync_settings()
+        return {
+            "directory": self.directory,
+            "threshold_ms": self.threshold_ms,
+            "always_on": sorted(self.always_on),
+            "interval_ms": self.interval * 1000,
+            "max_files": self.max_files,
+            "recent_profiles": self.profiles()[:10],
+        }
+
+
+PROFILER = SlowCallProfiler()
+
+
+def profile_tool(fn, name: str):
+    """Wrap a tool function so slow calls are profiled."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            call = PROFILER.begin(name, kwargs, is_async=True)
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException as e:
+                PROFILER.end(call, e)
+                raise
+            PROFILER.end(call)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = PROFILER.begin(name, kwargs, is_async=False)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            PROFILER.end(call, e)
+            raise
+        PROFILER.end(call)
+        return result
+    return wrapper
+
+
+def format_profiling_status(status) -> str:
+    results = ["Profiling Settings"]
+    results.append("=" * 40)
+    threshold = f"{status['threshold_ms']:g} ms" if status['threshold_ms'] > 0 else "disabled"
+    results.append(f"Slow-call threshold: {threshold}")
+    results.append(f"Always-on sampling: {', '.join(status['always_on']) or 'none'}")
+    results.append(f"Sample interval: {status['interval_ms']:g} ms")
+    results.append(f"Directory: {status['directory']} (keeps {status['max_files']} files)")
+    if status['recent_profiles']:
+        results.append("\nRecent profiles:")
+        for name in status['recent_profiles']:
+            results.append(f"  {name}")
+    return "\n".join(results)
+
+
+def register_profiling_tools(mcp):
+    """Register profiling admin tools with the MCP server (only when an admin token is set)."""
+    if not ADMIN_TOKEN:
+        print("⚠️  MCP_ADMIN_TOKEN is not set; configure_profiling is not registered")
+        return
+
+    @mcp.tool(description="Show or change slow-call profiling: threshold and always-on sampling per tool "
+                          "(needs the admin token)")
+    def configure_profiling(tool_name: Optional[str] = None, always_on: Optional[bool] = None,
+                            threshold_ms: Optional[float] = None, ctx: Context = None) -> str:
+        """Show or update profiling settings (applies to all server workers)."""
+        if not _authorized(_request_headers(ctx)):
+            raise ToolError("Unauthorized: send 'Authorization: Bearer <MCP_ADMIN_TOKEN>' with the MCP request")
+        if always_on is not None and not tool_name:
+            raise ToolError("tool_name is required when setting always_on")
+        if tool_name is None and always_on is None and threshold_ms is None:
+            return format_profiling_status(PROFILER.status())
+        return format_profiling_status(PROFILER.configure(tool_name, always_on, threshold_ms))
+
+
+def _request_headers(ctx: Optional[Context]):
+    """Headers of the HTTP request carrying a tool call, or {} without one (e.g. stdio)."""
+    try:
+        request = ctx.request_context.request if ctx is not None else None
+    except ValueError:
+        request = None
+    return request.headers if request is not None else {}
+
+
+def _authorized(headers) -> bool:
+    """The same check for the admin endpoint and the admin tools; fails closed without a token."""
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(headers.get("authorization", ""), f"Bearer {ADMIN_TOKEN}")
+
+
+async def profiling_endpoint(request):
+    """GET returns profiling settings; POST {"tool", "always_on", "threshold_ms"} updates them."""
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "admin endpoint disabled: set MCP_ADMIN_TOKEN"}, status_code=403)
+    if not _authorized(request.headers):
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    if request.method == "POST":
+        try:
+            body = await request.json()
+            status = PROFILER.configure(body.get("tool"), body.get("always_on"), body.get("threshold_ms"))
+        except (ValueError, TypeError, AttributeError) as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return JSONResponse(status)
+    return JSONResponse(PROFILER.status())
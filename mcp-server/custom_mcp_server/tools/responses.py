@@ -0,0 +1,323 @@
+"""
+Tool Response Envelope for MCP Server
+Pages list-like tool results (links, files, rows) under a per-call byte
+budget, as the usual text or as compact JSON, and hands out opaque cursors
+for the next page. The full result is cached briefly server-side, so a
+cursor fetches the next page without recomputing it. The result sits in
+process memory, or in the shared result cache when its backend is shared
+between workers, so any worker can continue a listing.
+
+Every page is also returned as MCP structured content, typed by a Page
+subclass the tool declares as its output schema, so clients get the items
+as data whichever text format they asked for. With output_format
+"structured" the text is only a summary and items are never rendered.
+"""
+
+import dataclasses
+import functools
+import json
+import operator
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import CallToolResult, TextContent
+from pydantic import BaseModel
+
+from .cache import get_cache
+
+DEFAULT_MAX_BYTES = int(os.environ.get("MCP_MAX_RESPONSE_BYTES", "65536"))
+MIN_MAX_BYTES = 1024
+CURSOR_TTL = float(os.environ.get("MCP_CURSOR_TTL", "300"))
+CURSOR_MAX_ENTRIES = int(os.environ.get("MCP_CURSOR_MAX_ENTRIES", "256"))
+# Separates a cursor key from the pid of the worker holding its state, for
+# states too large for the shared cache
+_WORKER_MARK = "~"
+
+OUTPUT_FORMATS = ("text", "json", "structured")
+
+# Room kept for the title, notes and the "more with cursor" footer
+_FRAME_RESERVE = 512
+# Content a page always gets, however much of max_bytes a long title or
+# header leaves; responses may then exceed a small max_bytes
+MIN_CONTENT_BYTES = 256
+
+# How a text page joins its rendered items, by name so cursor state stays JSON
+TEXT_BODIES = {
+    "lines": "\n".join,
+    "json_array": lambda rows: "[\n" + ",\n".join(rows) + "\n]",
+}
+
+
+class Page(BaseModel):
+    """Structured content of one page; tools subclass it with typed `items` and their meta fields."""
+
+    title: str
+    total: int
+    offset: int
+    next_cursor: Optional[str] = None
+    notes: List[str] = []
+
+
+def _portable(state: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON form of a cursor state: a listing's items are serialized and rendered up front."""
+    if "items" not in state:
+        return state
+    items = [[to_plain(state["serialize"](item)), state["render"](item)] for item in state["items"]]
+    return {**{name: value for name, value in state.items() if name not in ("render", "serialize")},
+            "items": items}
+
+
+def _restore(state: Dict[str, Any]) -> Dict[str, Any]:
+    if "items" not in state:
+        return state
+    return {**state, "serialize": operator.itemgetter(0), "render": operator.itemgetter(1)}
+
+
+class CursorStore:
+    """Results behind live cursors, expired after `ttl` seconds unused.
+
+    States live in process memory, LRU-bounded, unless the result cache has
+    a shared backend; then they are stored there as JSON so a cursor works
+    on whichever worker the next request reaches. A state the shared cache
+    won't take (too large, or the backend is failing) stays in this
+    worker's memory under a key naming the worker, so other workers can
+    say why they can't continue it.
+    """
+
+    def __init__(self, ttl: float = CURSOR_TTL, max_entries: int = CURSOR_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, tool: str, state: Dict[str, Any]) -> str:
+        key = secrets.token_urlsafe(9)
+        cache = get_cache()
+        if cache.shared:
+            if cache.set("cursor", [key], {"tool": tool, "state": _portable(state)}, self.ttl):
+                return key
+            key = f"{key}{_WORKER_MARK}{os.getpid()}"
+        now = time.monotonic()
+        with self._lock:
+            # Entries are kept in last-used order, so expired ones sit at the front
+            while self._entries and next(iter(self._entries.values()))[1] < now:
+                self._entries.popitem(last=False)
+            self._entries[key] = (tool, now + self.ttl, state)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    def load(self, tool: str, key: str) -> Dict[str, Any]:
+        worker = self.worker(key)
+        if worker is not None and worker != os.getpid():
+            raise ToolError("Cursor belongs to another server worker: the result was too large for the "
+                            "shared cache (MCP_CACHE_MAX_BYTES), so it is kept in that worker's memory. "
+                            "Repeat the call without a cursor, ideally with a narrower query")
+        cache = get_cache()
+        if cache.shared and worker is None:
+            entry = cache.get("cursor", [key])
+            if entry is None or entry["tool"] != tool:
+                raise ToolError("Cursor is unknown or has expired; repeat the call without a cursor")
+            # Using a cursor keeps it alive, as in memory
+            cache.set("cursor", [key], entry, self.ttl)
+            return _restore(entry["state"])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != tool or entry[1] < time.monotonic():
+                raise ToolError("Cursor is unknown or has expired; repeat the call without a cursor")
+            self._entries[key] = (tool, time.monotonic() + self.ttl, entry[2])
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    @staticmethod
+    def worker(key: str) -> Optional[int]:
+        """Pid of the worker whose memory holds the key's state, if not shared."""
+        _, mark, pid = key.partition(_WORKER_MARK)
+        return int(pid) if mark and pid.isdigit() else None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+CURSORS = CursorStore()
+
+
+def _parse_cursor(cursor: str):
+    key, _, position = cursor.rpartition(".")
+    if not key or not position.isdigit():
+        raise ToolError(f"Invalid cursor '{cursor}'")
+    return key, int(position)
+
+
+def _byte_budget(max_bytes: Optional[int]) -> int:
+    if max_bytes is None:
+        return DEFAULT_MAX_BYTES
+    return max(int(max_bytes), MIN_MAX_BYTES)
+
+
+def check_output_format(output_format: str):
+    if output_format not in OUTPUT_FORMATS:
+        raise ToolError(f"Unknown output_format '{output_format}'. Available: {', '.join(OUTPUT_FORMATS)}")
+
+
+@functools.lru_cache(maxsize=None)
+def _field_names(cls):
+    return tuple(field.name for field in dataclasses.fields(cls))
+
+
+def to_plain(value):
+    """JSON-ready form of a result item: dataclass entries become dicts without their None fields."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {name: item for name in _field_names(type(value))
+                if (item := getattr(value, name)) is not None}
+    return value
+
+
+def _json_default(value):
+    plain = to_plain(value)
+    return str(value) if plain is value else plain
+
+
+def dump_json(value) -> str:
+    """Compact JSON used for every json-format response."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+def tool_result(text: str, structured: Dict[str, Any]) -> CallToolResult:
+    """A tool response carrying `text` for display and `structured` as its typed content."""
+    return CallToolResult(content=[TextContent(type="text", text=text)], structuredContent=structured)
+
+
+def _identity(item):
+    return item
+
+
+def paginate(tool: str, items: Sequence, *, title: str, header: Sequence[str] = (),
+             render: Callable[[Any], str], serialize: Callable[[Any], Any] = None,
+             text_body: str = "lines", notes: Sequence[str] = (),
+             meta: Optional[Dict[str, Any]] = None, output_format: str = "text",
+             max_bytes: Optional[int] = None, limit: Optional[int] = None) -> CallToolResult:
+    """First page of `items` as a tool response.
+
+    `render` turns one item into a text line and `serialize` into a JSON
+    value (or a dataclass entry); both run only for the items on the page
+    being returned, and `meta` becomes fields of the structured content.
+    `text_body` names how the rendered lines are joined (see TEXT_BODIES), and
+    `header` lines follow the title in text responses only. When more items
+    remain, the response carries a cursor for page().
+    """
+    check_output_format(output_format)
+    state = {
+        "items": items, "title": title, "header": list(header), "render": render, "serialize": serialize or _identity,
+        "text_body": text_body, "notes": list(notes), "meta": meta or {},
+    }
+    return _page(tool, state, None, 0, output_format, max_bytes, limit)
+
+
+def page(tool: str, cursor: str, *, output_format: str = "text",
+         max_bytes: Optional[int] = None, limit: Optional[int] = None) -> CallToolResult:
+    """The page of a cached result that `cursor` points at."""
+    check_output_format(output_format)
+    key, offset = _parse_cursor(cursor)
+    state = CURSORS.load(tool, key)
+    if "items" not in state:
+        raise ToolError(f"Cursor '{cursor}' does not belong to a listing")
+    return _page(tool, state, key, offset, output_format, max_bytes, limit)
+
+
+def _page(tool, state, key, offset, output_format, max_bytes, limit):
+    items = state["items"]
+    framing = len(state["title"].encode()) + sum(len(line.encode()) + 1 for line in state["header"] + state["notes"])
+    budget = text_budget(max_bytes, framing)
+    as_text = output_format == "text"
+
+    chosen = []
+    rendered = []
+    used = 0
+    end = offset
+    while end < len(items) and (not limit or len(chosen) < limit):
+        item = items[end]
+        value = to_plain(state["serialize"](item))
+        line = state["render"](item) if as_text else dump_json(value)
+        size = len(line.encode()) + 1
+        # Always return at least one item so paging can't stall
+        if chosen and used + size > budget:
+            break
+        chosen.append(value)
+        if as_text:
+            rendered.append(line)
+        used += size
+        end += 1
+
+    next_cursor = None
+    if end < len(items):
+        if key is None:
+            key = CURSORS.save(tool, state)
+        next_cursor = f"{key}.{end}"
+
+    notes = list(state["notes"])
+    if next_cursor and CURSORS.worker(key) is not None:
+        notes.append("⚠️ This result is too large for the shared cache, so its cursor only works on "
+                     "the server worker that answered")
+
+    structured = {
+        "title": state["title"], **state["meta"], "total": len(items), "offset": offset,
+        "items": chosen, "next_cursor": next_cursor, "notes": notes,
+    }
+    if output_format == "json":
+        return tool_result(dump_json(structured), structured)
+
+    lines = [state["title"]]
+    if as_text:
+        lines.extend(state["header"])
+        if rendered:
+            lines.append(TEXT_BODIES[state["text_body"]](rendered))
+    lines.extend(notes)
+    if next_cursor or offset or (items and not as_text):
+        shown = f"Showing {offset + 1}-{end} of {len(items)}" if chosen else f"No items past {offset} of {len(items)}"
+        lines.append(f"📄 {shown}" + (f"; more with cursor=\"{next_cursor}\"" if next_cursor else ""))
+    return tool_result("\n".join(lines), structured)
+
+
+def require_inputs(**inputs):
+    """Raise unless every input is given; paged tools need them only for calls without a cursor.
+
+    Such inputs default to "" rather than None: FastMCP decodes JSON-looking
+    strings for parameters not annotated exactly `str`, which would turn
+    convert_data's JSON `data` into a list.
+    """
+    missing = [name for name, value in inputs.items() if not value]
+    if missing:
+        raise ToolError(f"{', '.join(missing)} {'is' if len(missing) == 1 else 'are'} required without a cursor")
+
+
+def fit_text(text: str, max_bytes: int) -> str:
+    """Longest prefix of text that is at most max_bytes when UTF-8 encoded."""
+    encoded = text.encode()
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", "ignore")
+
+
+def save_cursor(tool: str, state: Dict[str, Any], position: int = 0) -> str:
+    """Cursor for tools that page their own state (e.g. read_file)."""
+    return f"{CURSORS.save(tool, state)}.{position}"
+
+
+def load_cursor(tool: str, cursor: str):
+    """(state, position) saved by save_cursor()."""
+    key, position = _parse_cursor(cursor)
+    return CURSORS.load(tool, key), position
+
+
+def text_budget(max_bytes: Optional[int], used: int = 0) -> int:
+    """Bytes of content a response can carry besides its footer and `used` bytes of header.
+
+    Never less than MIN_CONTENT_BYTES, so reads and pages always make progress.
+    """
+    return max(_byte_budget(max_bytes) - _FRAME_RESERVE - used, MIN_CONTENT_BYTES)
@@ -3,106 +3,1453 @@ System Utilities Tools for MCP Server
 Provides system monitoring, command execution, and utility functions.
 """
 
-import psutil
+import asyncio
+import fnmatch
+import functools
+import json
+import math
+import os
 import platform
 import socket
-from datetime import datetime
+import threading
+import re
+import shlex
+import signal
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Annotated, List, Optional
 
-def register_system_tools(mcp):
-    """Register all system utility tools with the MCP server."""
+from mcp.server.fastmcp import Context
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import CallToolResult
+from pydantic import BaseModel
+
+from . import profiling, responses
+from .coalescing import READ_ONLY
+from .deadlines import current_deadline
+from .instrumentation import METRICS_MULTIPROC_DIR
+from .lazy import lazy_import
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows
+    fcntl = resource = None
+
+# Imported on first use, when a system tool first runs
+psutil = lazy_import("psutil")
+
+# Process sampler configuration
+PROCESS_SAMPLE_INTERVAL = float(os.environ.get("MCP_PROCESS_SAMPLE_INTERVAL", "2.0"))
+PROCESS_HISTORY_SIZE = int(os.environ.get("MCP_PROCESS_HISTORY_SIZE", "60"))
+PROCESS_SAMPLER_CPU_BUDGET = float(os.environ.get("MCP_PROCESS_SAMPLER_CPU_BUDGET", "0.02"))
+# Set by main() for worker processes. Every worker keeps its own process
+# history, so they split the sampler budget, and background jobs need one
+SERVER_WORKERS = max(int(os.environ.get("MCP_SERVER_WORKERS", "1")), 1)
+
+PROCESS_SORT_KEYS = ("cpu", "memory", "io")
+
+# System metrics collector configuration
+METRICS_INTERVAL = float(os.environ.get("MCP_METRICS_INTERVAL", "5.0"))
+METRICS_RAW_SIZE = int(os.environ.get("MCP_METRICS_RAW_SIZE", "720"))
+METRICS_MINUTE_SIZE = int(os.environ.get("MCP_METRICS_MINUTE_SIZE", "1440"))
+METRICS_HOUR_SIZE = int(os.environ.get("MCP_METRICS_HOUR_SIZE", "720"))
+# With several workers one of them collects and the others read its store,
+# so the store defaults into the shared directory. The full store is written
+# once the persist interval has passed and a minute has rolled up; samples
+# in between are appended to a journal next to it
+METRICS_STORE_PATH = os.environ.get("MCP_METRICS_STORE") or (
+    os.path.join(METRICS_MULTIPROC_DIR, "system-metrics.json") if METRICS_MULTIPROC_DIR else None)
+METRICS_PERSIST_INTERVAL = float(os.environ.get("MCP_METRICS_PERSIST_INTERVAL", "60"))
+
+ROLLUP_COLUMNS = ("min", "max", "avg", "p95", "count")
+
+# Port checker configuration
+PORT_OWNER_CACHE_TTL = float(os.environ.get("MCP_PORT_OWNER_CACHE_TTL", "2.0"))
+MAX_PORTS_PER_SCAN = 65535
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1", "0.0.0.0", "::")
+
+# Command runner configuration. run_command executes arbitrary commands as
+# the server user, so its tools are only registered when explicitly enabled
+# and an admin token is set, and every call must carry that token
+COMMANDS_ENABLED = os.environ.get("MCP_ENABLE_COMMANDS", "").lower() in ("1", "true", "yes", "on")
+COMMAND_MAX_CONCURRENT = int(os.environ.get("MCP_COMMAND_MAX_CONCURRENT", "4"))
+COMMAND_MAX_QUEUED = int(os.environ.get("MCP_COMMAND_MAX_QUEUED", "32"))
+COMMAND_OUTPUT_LIMIT = int(os.environ.get("MCP_COMMAND_OUTPUT_LIMIT", str(64 * 1024)))
+COMMAND_DEFAULT_TIMEOUT = float(os.environ.get("MCP_COMMAND_TIMEOUT", "60"))
+# Server-side limits: defaults when the client gives none, and caps on what
+# it asks for (0 = no default / no cap)
+COMMAND_MAX_TIMEOUT = float(os.environ.get("MCP_COMMAND_MAX_TIMEOUT", "3600"))
+COMMAND_DEFAULT_CPU_LIMIT = int(os.environ.get("MCP_COMMAND_CPU_LIMIT", "600"))
+COMMAND_MAX_CPU_LIMIT = int(os.environ.get("MCP_COMMAND_MAX_CPU_LIMIT", "3600"))
+COMMAND_DEFAULT_MEMORY_MB = int(os.environ.get("MCP_COMMAND_MEMORY_LIMIT_MB", "4096"))
+COMMAND_MAX_MEMORY_MB = int(os.environ.get("MCP_COMMAND_MAX_MEMORY_LIMIT_MB", "16384"))
+COMMAND_JOB_HISTORY = int(os.environ.get("MCP_COMMAND_JOB_HISTORY", "100"))
+
+# Catches obvious accidents only; it is trivially bypassed and is not a
+# security boundary (the admin token is)
+BLOCKED_EXECUTABLES = {"shutdown", "reboot", "halt", "poweroff", "init", "mkfs", "fdisk", "format"}
+BLOCKED_PATTERNS = (
+    re.compile(r'\brm\s+(-\w*\s+)*-\w*[rR]\w*\s+(-\w+\s+)*/(\s|$|\*)'),  # rm -rf /
+    re.compile(r':\(\)\s*\{'),                                         # fork bomb
+    re.compile(r'\bdd\s+.*\bof=/dev/'),                                  # overwrite devices
+    re.compile(r'\bmkfs(\.\w+)?\b'),
+)
+METRIC_RESOLUTIONS = ("auto", "raw", "1m", "1h")
+
+
+@dataclass(slots=True)
+class ProcessInfo:
+    """One process's rates over a window; built for every sampled process, so kept slotted."""
+    pid: int
+    name: str
+    username: str
+    status: str
+    cpu_percent: float
+    rss: int
+    memory_percent: float
+    io_rate: Optional[float] = None
+
+
+class ProcessList(BaseModel):
+    """Structured result of get_process_info."""
+    window_seconds: float
+    sort_by: str
+    processes: List[ProcessInfo]
+    sampled_processes: int
+    sample_interval: float
+
+
+class ProcessSeries:
+    """Fixed-size ring buffer of (timestamp, cpu seconds, rss bytes, io bytes) samples for one process."""
+
+    FIELDS = 4
+
+    __slots__ = ("pid", "name", "username", "create_time", "status", "_data", "_capacity", "_head", "_count")
+
+    def __init__(self, pid: int, name: str, username: str, create_time: float, capacity: int):
+        self.pid = pid
+        self.name = name
+        self.username = username
+        self.create_time = create_time
+        self.status = ""
+        self._data = array('d', [0.0]) * (capacity * self.FIELDS)
+        self._capacity = capacity
+        self._head = 0
+        self._count = 0
+
+    def append(self, timestamp: float, cpu_seconds: float, rss: float, io_bytes: float):
+        offset = self._head * self.FIELDS
+        self._data[offset] = timestamp
+        self._data[offset + 1] = cpu_seconds
+        self._data[offset + 2] = rss
+        self._data[offset + 3] = io_bytes
+        self._head = (self._head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def _sample(self, age: int):
+        """Return the sample `age` steps back from the newest (0 = newest)."""
+        index = (self._head - 1 - age) % self._capacity
+        offset = index * self.FIELDS
+        return self._data[offset:offset + self.FIELDS]
+
+    def rates(self, window: float):
+        """Return (cpu percent, rss bytes, io bytes/s) over the given window, or None if not enough samples."""
+        if self._count < 2:
+            return None
+
+        newest = self._sample(0)
+        oldest = self._sample(1)
+        # Walk back to the oldest sample still inside the window
+        for age in range(2, self._count):
+            candidate = self._sample(age)
+            if newest[0] - candidate[0] > window:
+                break
+            oldest = candidate
+
+        elapsed = newest[0] - oldest[0]
+        if elapsed <= 0:
+            return None
+
+        cpu_percent = max(newest[1] - oldest[1], 0.0) / elapsed * 100
+        if math.isnan(newest[3]) or math.isnan(oldest[3]):
+            io_rate = None
+        else:
+            io_rate = max(newest[3] - oldest[3], 0.0) / elapsed
+        return cpu_percent, newest[2], io_rate
+
+
+class ProcessSampler:
+    """Background sampler keeping a rolling CPU/RSS/IO history for every process.
+
+    psutil's cpu_percent needs two samples to be meaningful, so a single
+    process_iter() call reports 0.0% everywhere. The sampler sweeps /proc on
+    an interval, stores cumulative counters in per-process ring buffers and
+    derives rates over any window up to interval * history_size seconds.
+    The sampler measures its own CPU time and stretches the interval when a
+    sweep would exceed the configured CPU budget.
+    """
+
+    def __init__(self, interval: float = PROCESS_SAMPLE_INTERVAL, history_size: int = PROCESS_HISTORY_SIZE,
+                 cpu_budget: float = PROCESS_SAMPLER_CPU_BUDGET / SERVER_WORKERS):
+        self.interval = interval
+        self.history_size = max(history_size, 2)
+        self.cpu_budget = cpu_budget
+        self.effective_interval = interval
+        self.sweeps = 0
+        self.last_sweep_seconds = 0.0
+        self.last_sweep_cpu_seconds = 0.0
+        self._series = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._total_memory = psutil.virtual_memory().total
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="process-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample_once()
+            self._stop.wait(self.effective_interval)
+
+    def sample_once(self):
+        """Take one sweep over all processes and append a sample to each series."""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        now = time.time()
+
+        seen = {}
+        for proc in psutil.process_iter():
+            try:
+                with proc.oneshot():
+                    create_time = proc.create_time()
+                    series = self._series.get(proc.pid)
+                    # A recycled pid gets a fresh series
+                    if series is None or series.create_time != create_time:
+                        try:
+                            username = proc.username()
+                        except (psutil.AccessDenied, KeyError):
+                            username = "?"
+                        series = ProcessSeries(proc.pid, proc.name(), username, create_time, self.history_size)
+
+                    cpu = proc.cpu_times()
+                    rss = proc.memory_info().rss
+                    try:
+                        io = proc.io_counters()
+                        io_bytes = float(io.read_bytes + io.write_bytes)
+                    except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                        io_bytes = math.nan
+                    series.status = proc.status()
+                    series.append(now, cpu.user + cpu.system, float(rss), io_bytes)
+                    seen[proc.pid] = series
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
 
-    @mcp.tool(description="Get comprehensive system information")
-    def get_system_info(detailed: bool = False) -> str:
-        """Get comprehensive system information."""
+        # Swap in the new map; exited processes drop out here
+        with self._lock:
+            self._series = seen
+
+        self.last_sweep_seconds = time.perf_counter() - wall_start
+        self.last_sweep_cpu_seconds = time.thread_time() - cpu_start
+        self.sweeps += 1
+
+        # Keep sampler CPU usage within budget by stretching the interval
+        if self.cpu_budget > 0:
+            self.effective_interval = max(self.interval, self.last_sweep_cpu_seconds / self.cpu_budget)
+
+        if self.sweeps >= 2:
+            self._ready.set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until at least two sweeps exist so rates can be computed."""
+        return self._ready.wait(timeout)
+
+    @property
+    def max_window(self) -> float:
+        return self.effective_interval * (self.history_size - 1)
+
+    @property
+    def overhead_percent(self) -> float:
+        if self.effective_interval <= 0:
+            return 0.0
+        return self.last_sweep_cpu_seconds / self.effective_interval * 100
+
+    def process_count(self) -> int:
+        with self._lock:
+            return len(self._series)
+
+    def top(self, window: float = 10.0, sort_by: str = "cpu", name_filter: Optional[str] = None,
+            user: Optional[str] = None, limit: Optional[int] = 10):
+        """Return per-process rates over `window` seconds, sorted and filtered."""
+        if sort_by not in PROCESS_SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{sort_by}'. Available: {', '.join(PROCESS_SORT_KEYS)}")
+
+        with self._lock:
+            series_list = list(self._series.values())
+
+        name_filter = name_filter.lower() if name_filter else None
+        rows = []
+        for series in series_list:
+            if name_filter and name_filter not in series.name.lower():
+                continue
+            if user and series.username != user:
+                continue
+            rates = series.rates(window)
+            if rates is None:
+                continue
+            cpu_percent, rss, io_rate = rates
+            rows.append(ProcessInfo(
+                series.pid, series.name, series.username, series.status, cpu_percent, int(rss),
+                rss / self._total_memory * 100 if self._total_memory else 0.0, io_rate,
+            ))
+
+        sort_field = {'cpu': 'cpu_percent', 'memory': 'rss', 'io': 'io_rate'}[sort_by]
+        rows.sort(key=lambda row: getattr(row, sort_field) or 0, reverse=True)
+        return rows[:limit] if limit else rows
+
+
+@functools.lru_cache(maxsize=1)
+def get_host_facts():
+    """Static host facts, computed once per process.
+
+    platform.processor() can shell out and none of these change while the
+    server runs, so they are cached instead of recomputed on every call.
+    """
+    if platform.system() == "Windows":
+        disk_path, disk_label = 'C:\\', "Disk (C:)"
+    else:
+        disk_path, disk_label = '/', "Disk (root)"
+
+    return {
+        'os': platform.system(),
+        'release': platform.release(),
+        'architecture': platform.architecture()[0],
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'hostname': socket.gethostname(),
+        'physical_cores': psutil.cpu_count(logical=False),
+        'logical_cores': psutil.cpu_count(logical=True),
+        'boot_time': psutil.boot_time(),
+        'disk_path': disk_path,
+        'disk_label': disk_label,
+    }
+
+
+def collect_system_info(detailed: bool = False):
+    """Combine cached host facts with one snapshot of the dynamic values."""
+    facts = get_host_facts()
+    memory = psutil.virtual_memory()
+
+    info = {
+        'os': facts['os'],
+        'release': facts['release'],
+        'architecture': facts['architecture'],
+        'machine': facts['machine'],
+        'processor': facts['processor'],
+        'hostname': facts['hostname'],
+        'cpu': {
+            'physical_cores': facts['physical_cores'],
+            'logical_cores': facts['logical_cores'],
+        },
+        'memory': {
+            'total_bytes': memory.total,
+            'available_bytes': memory.available,
+            'used_bytes': memory.used,
+            'percent': memory.percent,
+        },
+        'boot_time': datetime.fromtimestamp(facts['boot_time']).isoformat(timespec='seconds'),
+        'uptime_seconds': int(time.time() - facts['boot_time']),
+    }
+
+    try:
+        disk = psutil.disk_usage(facts['disk_path'])
+        info['disk'] = {
+            'label': facts['disk_label'],
+            'path': facts['disk_path'],
+            'total_bytes': disk.total,
+            'used_bytes': disk.used,
+            'free_bytes': disk.free,
+            'percent': round(disk.used / disk.total * 100, 1) if disk.total else 0.0,
+        }
+    except Exception as e:
+        info['disk'] = {'label': facts['disk_label'], 'error': str(e)}
+
+    if detailed:
+        # The background sampler already tracks every pid; only list them before its first sweep
+        sampler = get_process_sampler()
+        info['process_count'] = sampler.process_count() if sampler.sweeps else len(psutil.pids())
+
+    return info
+
+
+def format_system_info(info) -> str:
+    """Render collect_system_info() output as the human-readable report."""
+    results = ["System Information"]
+    results.append("=" * 40)
+
+    # Basic system info
+    results.append(f"OS: {info['os']} {info['release']}")
+    results.append(f"Architecture: {info['architecture']}")
+    results.append(f"Machine: {info['machine']}")
+    results.append(f"Processor: {info['processor']}")
+    results.append(f"Hostname: {info['hostname']}")
+
+    # CPU info
+    results.append(f"\nCPU:")
+    results.append(f"  Physical cores: {info['cpu']['physical_cores']}")
+    results.append(f"  Logical cores: {info['cpu']['logical_cores']}")
+
+    # Memory info
+    memory = info['memory']
+    results.append(f"\nMemory:")
+    results.append(f"  Total: {memory['total_bytes'] / (1024**3):.2f} GB")
+    results.append(f"  Available: {memory['available_bytes'] / (1024**3):.2f} GB")
+    results.append(f"  Used: {memory['used_bytes'] / (1024**3):.2f} GB ({memory['percent']}%)")
+
+    # Disk info
+    disk = info['disk']
+    if 'error' in disk:
+        results.append(f"\nDisk: Error getting disk info - {disk['error']}")
+    else:
+        results.append(f"\n{disk['label']}:")
+        results.append(f"  Total: {disk['total_bytes'] / (1024**3):.2f} GB")
+        results.append(f"  Used: {disk['used_bytes'] / (1024**3):.2f} GB ({disk['percent']:.1f}%)")
+        results.append(f"  Free: {disk['free_bytes'] / (1024**3):.2f} GB")
+
+    # Boot time
+    boot_time = datetime.fromisoformat(info['boot_time'])
+    results.append(f"\nSystem:")
+    results.append(f"  Boot time: {boot_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    results.append(f"  Uptime: {timedelta(seconds=info['uptime_seconds'])}")
+
+    if 'process_count' in info:
+        results.append(f"\nProcesses: {info['process_count']} running")
+
+    return "\n".join(results)
+
+
+def parse_port_spec(spec: str):
+    """Parse '22,80,8000-8100' into a sorted list of unique ports."""
+    ports = set()
+    for part in str(spec).replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            low, high = (int(value) for value in part.split('-', 1))
+        else:
+            low = high = int(part)
+        if not 1 <= low <= high <= 65535:
+            raise ValueError(f"Invalid port or range '{part}' (ports are 1-65535)")
+        ports.update(range(low, high + 1))
+        if len(ports) > MAX_PORTS_PER_SCAN:
+            raise ValueError(f"Too many ports (max {MAX_PORTS_PER_SCAN})")
+    if not ports:
+        raise ValueError("No ports given")
+    return sorted(ports)
+
+
+_port_owner_cache = (0.0, {})
+_port_owner_lock = threading.Lock()
+
+
+def get_port_owners(ttl: float = PORT_OWNER_CACHE_TTL):
+    """Map local port -> pid from one net_connections() snapshot, cached for `ttl` seconds.
+
+    Listening sockets win over established ones so the owner is the server,
+    not a client that happens to use the same local port.
+    """
+    global _port_owner_cache
+    with _port_owner_lock:
+        taken_at, owners = _port_owner_cache
+        if time.monotonic() - taken_at < ttl:
+            return owners
+
+        owners = {}
         try:
-            results = ["System Information"]
-            results.append("=" * 40)
-            
-            # Basic system info
-            results.append(f"OS: {platform.system()} {platform.release()}")
-            results.append(f"Architecture: {platform.architecture()[0]}")
-            results.append(f"Machine: {platform.machine()}")
-            results.append(f"Processor: {platform.processor()}")
-            results.append(f"Hostname: {socket.gethostname()}")
-            
-            # CPU info
-            cpu_count = psutil.cpu_count(logical=False)
-            cpu_logical = psutil.cpu_count(logical=True)
-            
-            results.append(f"\nCPU:")
-            results.append(f"  Physical cores: {cpu_count}")
-            results.append(f"  Logical cores: {cpu_logical}")
-            
-            # Memory info
-            memory = psutil.virtual_memory()
-            
-            results.append(f"\nMemory:")
-            results.append(f"  Total: {memory.total / (1024**3):.2f} GB")
-            results.append(f"  Available: {memory.available / (1024**3):.2f} GB")
-            results.append(f"  Used: {memory.used / (1024**3):.2f} GB ({memory.percent}%)")
-            
-            # Disk info (cross-platform)
+            connections = psutil.net_connections(kind='inet')
+        except psutil.AccessDenied:
+            connections = []
+        for conn in connections:
+            if not conn.laddr or conn.pid is None:
+                continue
+            port = conn.laddr.port
+            if port not in owners or conn.status == psutil.CONN_LISTEN:
+                owners[port] = conn.pid
+
+        _port_owner_cache = (time.monotonic(), owners)
+        return owners
+
+
+def _process_label(pid: int) -> str:
+    try:
+        return f"{psutil.Process(pid).name()} (PID: {pid})"
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return f"PID {pid}"
+
+
+def _is_local_host(host: str, addresses) -> bool:
+    if host in LOCAL_HOSTS:
+        return True
+    local = {addr.address.split('%')[0] for addrs in psutil.net_if_addrs().values() for addr in addrs}
+    return any(sockaddr[0] in local for _, sockaddr in addresses)
+
+
+def _port_owner_labels(host: str, addresses, ports):
+    """Map port -> owning process label for ports on this machine; blocking, so run it in a thread."""
+    if not _is_local_host(host, addresses):
+        return {}
+    owners = get_port_owners()
+    return {port: _process_label(owners[port]) for port in ports if port in owners}
+
+
+async def _resolve(host: str):
+    """Resolve host to a de-duplicated list of (family, sockaddr) for TCP connects."""
+    loop = asyncio.get_running_loop()
+    host = host.strip('[]')
+    infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    addresses = []
+    for family, _, _, _, sockaddr in infos:
+        if family in (socket.AF_INET, socket.AF_INET6) and (family, sockaddr) not in addresses:
+            addresses.append((family, sockaddr))
+    if not addresses:
+        raise ValueError(f"Could not resolve host '{host}'")
+    return addresses
+
+
+async def _probe(family, sockaddr, port: int, timeout: float) -> str:
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    target = (sockaddr[0], port) + tuple(sockaddr[2:])
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, target), timeout)
+        return "open"
+    except asyncio.TimeoutError:
+        return "filtered"
+    except OSError:
+        return "closed"
+    finally:
+        sock.close()
+
+
+async def scan_ports(host: str, ports, timeout: float = 0.5, concurrency: int = 256):
+    """Probe ports concurrently; returns (addresses, {port: 'open'|'closed'|'filtered'|'skipped'}).
+
+    Every resolved address is tried in order until one accepts, so
+    'localhost' works whether a service bound to IPv4 or IPv6. Ports not
+    yet probed when the call's deadline passes are reported as 'skipped'.
+    """
+    deadline = current_deadline()
+    addresses = await _resolve(host)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def check(port):
+        async with semaphore:
+            status = "closed"
+            for family, sockaddr in addresses:
+                if deadline.expired:
+                    return port, "skipped"
+                probe_timeout = min(timeout, deadline.remaining())
+                result = await _probe(family, sockaddr, port, probe_timeout)
+                if result == "filtered" and probe_timeout < timeout:
+                    # Cut short by the deadline, so we don't actually know
+                    return port, "skipped"
+                if result == "open":
+                    return port, result
+                if result == "filtered":
+                    status = result
+            return port, status
+
+    results = await asyncio.gather(*(check(port) for port in ports))
+    return addresses, dict(results)
+
+
+_process_sampler = None
+_process_sampler_lock = threading.Lock()
+
+
+def get_process_sampler() -> ProcessSampler:
+    """Return the shared process sampler, starting it on first use."""
+    global _process_sampler
+    with _process_sampler_lock:
+        if _process_sampler is None:
+            _process_sampler = ProcessSampler().start()
+        return _process_sampler
+
+
+class ColumnRing:
+    """Fixed-size, array-backed ring of timestamped rows with named float columns."""
+
+    __slots__ = ("columns", "_times", "_data", "_capacity", "_head", "_count")
+
+    def __init__(self, columns, capacity: int):
+        self.columns = tuple(columns)
+        self._times = array('d', [0.0]) * capacity
+        self._data = {column: array('d', [0.0]) * capacity for column in self.columns}
+        self._capacity = capacity
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp: float, *values: float):
+        self._times[self._head] = timestamp
+        for column, value in zip(self.columns, values):
+            self._data[column][self._head] = value
+        self._head = (self._head + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def _indexes(self):
+        start = self._head - self._count
+        return [(start + i) % self._capacity for i in range(self._count)]
+
+    @property
+    def oldest_time(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return self._times[(self._head - self._count) % self._capacity]
+
+    def latest(self):
+        """Return (timestamp, {column: value}) for the newest row, or None."""
+        if not self._count:
+            return None
+        index = (self._head - 1) % self._capacity
+        return self._times[index], {column: self._data[column][index] for column in self.columns}
+
+    def select(self, start: float, end: float):
+        """Return (times, {column: values}) for rows with start <= timestamp <= end."""
+        indexes = [i for i in self._indexes() if start <= self._times[i] <= end]
+        times = [self._times[i] for i in indexes]
+        return times, {column: [self._data[column][i] for i in indexes] for column in self.columns}
+
+    def to_dict(self):
+        indexes = self._indexes()
+        data = {column: [self._data[column][i] for i in indexes] for column in self.columns}
+        data["times"] = [self._times[i] for i in indexes]
+        return data
+
+    def load_dict(self, data):
+        for row in zip(data["times"], *(data[column] for column in self.columns)):
+            self.append(*row)
+
+
+def _percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def _summarize(values):
+    return min(values), max(values), sum(values) / len(values), _percentile(values, 95), float(len(values))
+
+
+def _slope_per_minute(times, values) -> float:
+    """Least-squares slope of values over time, in units per minute."""
+    if len(times) < 2:
+        return 0.0
+    mean_t = sum(times) / len(times)
+    mean_v = sum(values) / len(values)
+    denominator = sum((t - mean_t) ** 2 for t in times)
+    if denominator == 0:
+        return 0.0
+    numerator = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values))
+    return numerator / denominator * 60
+
+
+def _parse_time(value: Optional[str], now: float, default: float) -> float:
+    """Parse '-15m' / '-2h' / '-1d' offsets, 'now', 'HH:MM' (today) or ISO timestamps into epoch seconds."""
+    if not value:
+        return default
+    value = value.strip()
+    if value == "now":
+        return now
+
+    match = re.fullmatch(r'-(\d+(?:\.\d+)?)([smhd])', value)
+    if match:
+        amount = float(match.group(1))
+        unit = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+        return now - amount * unit
+
+    if re.fullmatch(r'\d{1,2}:\d{2}', value):
+        hours, minutes = (int(part) for part in value.split(':'))
+        moment = datetime.fromtimestamp(now).replace(hour=hours, minute=minutes, second=0, microsecond=0)
+        # A clock time later than now refers to yesterday
+        if moment.timestamp() > now:
+            moment -= timedelta(days=1)
+        return moment.timestamp()
+
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Unrecognized time '{value}'. Use -15m, -2h, -1d, HH:MM or an ISO timestamp")
+
+
+class LeaderLock:
+    """Non-blocking file lock electing one worker process for shared background work.
+
+    Without a shared directory (one worker) every process leads. The lock is
+    held until the process exits, so another worker can take over from a
+    worker that died or was restarted.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = METRICS_MULTIPROC_DIR):
+        self.path = os.path.join(directory, f"{name}.lock") if directory and fcntl else None
+        self._file = None
+
+    def acquire(self) -> bool:
+        if self.path is None or self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+
+class MetricsCollector:
+    """Background collector keeping a fixed-memory history of system metrics.
+
+    Raw samples (CPU, memory, disk IO rates and per-interface network rates)
+    go into array-backed rings; closed minute and hour buckets are rolled up
+    into min/max/avg/p95 rings so longer horizons cost a constant amount of
+    memory. Hourly p95 values are approximated from the minute p95s. When a
+    store path is configured, the rings are periodically persisted as JSON
+    and reloaded on start. With several workers only the one holding the
+    leader lock samples and writes the store, appending each raw sample to a
+    journal between full writes; the others reload the store when it changes
+    and read the journal lines added since their last look, so every worker
+    answers from the same history.
+    """
+
+    def __init__(self, interval: float = METRICS_INTERVAL, raw_size: int = METRICS_RAW_SIZE,
+                 minute_size: int = METRICS_MINUTE_SIZE, hour_size: int = METRICS_HOUR_SIZE,
+                 store_path: Optional[str] = METRICS_STORE_PATH,
+                 persist_interval: float = METRICS_PERSIST_INTERVAL,
+                 leader_lock: Optional[LeaderLock] = None):
+        self.interval = interval
+        self.store_path = store_path
+        self.persist_interval = persist_interval
+        self.leader_lock = leader_lock or LeaderLock("metrics-collector")
+        self.leading = False
+        self._loaded_mtime = None
+        # Only needed when other workers read the store
+        self.journal_path = f"{store_path}.journal" if store_path and self.leader_lock.path else None
+        self._journal_position = (None, 0)
+        self._rolled_up = False
+        self._sizes = {"raw": raw_size, "1m": minute_size, "1h": hour_size}
+        self._tiers = {"raw": {}, "1m": {}, "1h": {}}
+        self._pending_minute = {}
+        self._pending_hour = {}
+        self._last_counters = None
+        self._last_persist = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self.leading = self.leader_lock.acquire()
+            self.load()
+            # Prime cpu_percent so the first sample measures a real interval
+            psutil.cpu_percent(interval=None)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-collector", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.leading:
+            self.save()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
             try:
-                if platform.system() == "Windows":
-                    disk = psutil.disk_usage('C:\\')
-                    disk_label = "Disk (C:)"
+                if not self.leading and self.leader_lock.acquire():
+                    # The previous leader exited; continue from its last save
+                    # and journal
+                    self.leading = True
+                    self.load(replace=True)
+                if not self.leading:
+                    self.refresh()
+                    continue
+                self.sample_once()
+                # Write the whole store when the rollup rings have changed
+                if (self.store_path and self._rolled_up
+                        and time.time() - self._last_persist >= self.persist_interval):
+                    self.save()
+            except Exception:
+                # Keep collecting; a failed sample just leaves a gap
+                continue
+
+    def _read_counters(self):
+        disk = psutil.disk_io_counters()
+        nics = psutil.net_io_counters(pernic=True)
+        return {
+            "disk": (disk.read_bytes, disk.write_bytes) if disk else None,
+            "net": {name: (nic.bytes_sent, nic.bytes_recv) for name, nic in nics.items()},
+        }
+
+    def sample_once(self, now: Optional[float] = None):
+        """Collect one sample of every metric and record it."""
+        now = time.time() if now is None else now
+        memory = psutil.virtual_memory()
+        values = {
+            "cpu.percent": psutil.cpu_percent(interval=None),
+            "memory.percent": memory.percent,
+            "memory.used_bytes": float(memory.used),
+        }
+
+        counters = self._read_counters()
+        if self._last_counters is not None:
+            last_time, last = self._last_counters
+            elapsed = now - last_time
+            if elapsed > 0:
+                if counters["disk"] and last["disk"]:
+                    values["disk.read_bytes_per_s"] = max(counters["disk"][0] - last["disk"][0], 0) / elapsed
+                    values["disk.write_bytes_per_s"] = max(counters["disk"][1] - last["disk"][1], 0) / elapsed
+                for name, (sent, recv) in counters["net"].items():
+                    if name in last["net"]:
+                        last_sent, last_recv = last["net"][name]
+                        values[f"net.{name}.sent_bytes_per_s"] = max(sent - last_sent, 0) / elapsed
+                        values[f"net.{name}.recv_bytes_per_s"] = max(recv - last_recv, 0) / elapsed
+        self._last_counters = (now, counters)
+
+        self.record(now, values)
+        if self.journal_path:
+            self._append_journal(now, values)
+
+    def _ring(self, tier: str, metric: str) -> ColumnRing:
+        rings = self._tiers[tier]
+        ring = rings.get(metric)
+        if ring is None:
+            columns = ("value",) if tier == "raw" else ROLLUP_COLUMNS
+            ring = rings[metric] = ColumnRing(columns, self._sizes[tier])
+        return ring
+
+    def record(self, now: float, values):
+        """Append raw values and roll closed minute/hour buckets into the rollup rings."""
+        minute_start = now - now % 60
+        with self._lock:
+            for metric, value in values.items():
+                self._ring("raw", metric).append(now, value)
+
+                bucket = self._pending_minute.get(metric)
+                if bucket is not None and bucket[0] != minute_start:
+                    self._close_minute(metric, *bucket)
+                    bucket = None
+                if bucket is None:
+                    bucket = self._pending_minute[metric] = (minute_start, [])
+                bucket[1].append(value)
+
+    def _close_minute(self, metric: str, minute_start: float, samples):
+        self._rolled_up = True
+        row = _summarize(samples)
+        self._ring("1m", metric).append(minute_start, *row)
+
+        hour_start = minute_start - minute_start % 3600
+        bucket = self._pending_hour.get(metric)
+        if bucket is not None and bucket[0] != hour_start:
+            self._close_hour(metric, *bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self._pending_hour[metric] = (hour_start, [])
+        bucket[1].append(row)
+
+    def _close_hour(self, metric: str, hour_start: float, rows):
+        count = sum(row[4] for row in rows)
+        self._ring("1h", metric).append(
+            hour_start,
+            min(row[0] for row in rows),
+            max(row[1] for row in rows),
+            sum(row[2] * row[4] for row in rows) / count,
+            _percentile([row[3] for row in rows], 95),
+            count,
+        )
+
+    def metric_names(self):
+        with self._lock:
+            return sorted(set(self._tiers["raw"]) | set(self._tiers["1m"]) | set(self._tiers["1h"]))
+
+    def latest(self, metric: str) -> Optional[float]:
+        with self._lock:
+            ring = self._tiers["raw"].get(metric)
+            row = ring.latest() if ring else None
+        return row[1]["value"] if row else None
+
+    def _choose_resolution(self, start: float) -> str:
+        for tier in ("raw", "1m", "1h"):
+            oldest = [ring.oldest_time for ring in self._tiers[tier].values() if len(ring)]
+            if oldest and min(oldest) <= start:
+                return tier
+        # Nothing reaches back that far; use the longest tier that has data
+        for tier in ("1h", "1m", "raw"):
+            if any(len(ring) for ring in self._tiers[tier].values()):
+                return tier
+        return "raw"
+
+    def query(self, pattern: str, start: float, end: float, resolution: str = "auto"):
+        """Return (resolution, [summary dicts]) for metrics matching a glob pattern."""
+        if resolution not in METRIC_RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'. Available: {', '.join(METRIC_RESOLUTIONS)}")
+
+        with self._lock:
+            tier = self._choose_resolution(start) if resolution == "auto" else resolution
+            summaries = []
+            for metric in sorted(self._tiers[tier]):
+                if not fnmatch.fnmatchcase(metric, pattern):
+                    continue
+                times, columns = self._tiers[tier][metric].select(start, end)
+                if not times:
+                    continue
+
+                if tier == "raw":
+                    points = columns["value"]
+                    low, high, avg, p95, count = _summarize(points)
                 else:
-                    disk = psutil.disk_usage('/')
-                    disk_label = "Disk (root)"
-                    
-                results.append(f"\n{disk_label}:")
-                results.append(f"  Total: {disk.total / (1024**3):.2f} GB")
-                results.append(f"  Used: {disk.used / (1024**3):.2f} GB ({disk.used/disk.total*100:.1f}%)")
-                results.append(f"  Free: {disk.free / (1024**3):.2f} GB")
-            except Exception as e:
-                results.append(f"\nDisk: Error getting disk info - {str(e)}")
-            
-            # Boot time
-            boot_time = datetime.fromtimestamp(psutil.boot_time())
-            uptime = datetime.now() - boot_time
-            results.append(f"\nSystem:")
-            results.append(f"  Boot time: {boot_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            results.append(f"  Uptime: {str(uptime).split('.')[0]}")
-            
-            if detailed:
-                # Running processes count
-                process_count = len(psutil.pids())
-                results.append(f"\nProcesses: {process_count} running")
-            
-            return "\n".join(results)
+                    points = columns["avg"]
+                    count = sum(columns["count"])
+                    low = min(columns["min"])
+                    high = max(columns["max"])
+                    avg = sum(a * c for a, c in zip(columns["avg"], columns["count"])) / count
+                    p95 = _percentile(columns["p95"], 95)
+
+                summaries.append({
+                    "metric": metric,
+                    "points": len(times),
+                    "samples": int(count),
+                    "first_time": times[0],
+                    "last_time": times[-1],
+                    "min": low,
+                    "max": high,
+                    "avg": avg,
+                    "p95": p95,
+                    "last": points[-1],
+                    "slope_per_minute": _slope_per_minute(times, points),
+                })
+        return tier, summaries
+
+    def save(self):
+        """Persist all tiers to the store path (atomic replace) and start a new journal."""
+        if not self.store_path:
+            return
+        with self._lock:
+            payload = {
+                "version": 1,
+                "saved_at": time.time(),
+                "tiers": {tier: {metric: ring.to_dict() for metric, ring in rings.items()}
+                          for tier, rings in self._tiers.items()},
+            }
+            self._rolled_up = False
+        # Per-process temporary file so concurrent writers never share one
+        tmp_path = f"{self.store_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.store_path)
+        if self.journal_path:
+            # A new file rather than a truncated one, so readers notice the
+            # switch by its inode even if it has already grown again
+            open(tmp_path, 'w').close()
+            os.replace(tmp_path, self.journal_path)
+        self._last_persist = time.time()
+
+    def _append_journal(self, now: float, values):
+        line = json.dumps({"t": now, "v": values}) + "\n"
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def _read_journal(self):
+        """Append journal samples written since the last read to the raw rings."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                last_inode, position = self._journal_position
+                if inode != last_inode:
+                    position = 0
+                f.seek(position)
+                data = f.read()
+        except OSError:
+            return
+        # The leader may be halfway through a line; leave it for next time
+        end = data.rfind(b"\n") + 1
+        self._journal_position = (inode, position + end)
+        with self._lock:
+            for line in data[:end].splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                for metric, value in entry["v"].items():
+                    ring = self._ring("raw", metric)
+                    # Samples already in the store are in the journal until it is replaced
+                    latest = ring.latest()
+                    if latest is None or entry["t"] > latest[0]:
+                        ring.append(entry["t"], value)
+
+    def refresh(self):
+        """Reload the store if the leader has rewritten it, then read new journal lines."""
+        try:
+            mtime = os.stat(self.store_path).st_mtime_ns if self.store_path else None
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != self._loaded_mtime:
+            self.load(replace=True)
+        elif self.journal_path:
+            self._read_journal()
+
+    def load(self, replace: bool = False):
+        """Reload persisted tiers and the journal, ignoring a missing or corrupt store.
+
+        With replace the loaded history replaces what is in memory instead of
+        being appended to it.
+        """
+        if self.store_path and os.path.exists(self.store_path):
+            try:
+                mtime = os.stat(self.store_path).st_mtime_ns
+                with open(self.store_path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                with self._lock:
+                    if replace:
+                        self._tiers = {"raw": {}, "1m": {}, "1h": {}}
+                        self._pending_minute = {}
+                        self._pending_hour = {}
+                    self._loaded_mtime = mtime
+                    for tier, rings in payload.get("tiers", {}).items():
+                        if tier not in self._tiers:
+                            continue
+                        for metric, data in rings.items():
+                            self._ring(tier, metric).load_dict(data)
+            except (OSError, ValueError, KeyError):
+                pass
+        if self.journal_path:
+            self._journal_position = (None, 0)
+            self._read_journal()
+
+
+_metrics_collector = None
+_metrics_collector_lock = threading.Lock()
+
+
+def get_metrics_collector() -> MetricsCollector:
+    """Return the shared system metrics collector, starting it on first use."""
+    global _metrics_collector
+    with _metrics_collector_lock:
+        if _metrics_collector is None:
+            _metrics_collector = MetricsCollector().start()
+        return _metrics_collector
+
+
+def _format_metric_value(metric: str, value: float) -> str:
+    if metric.endswith("_bytes_per_s"):
+        return f"{value / 1024:.1f} KB/s"
+    if metric.endswith("_bytes"):
+        return f"{value / (1024**3):.2f} GB"
+    if metric.endswith("percent"):
+        return f"{value:.1f}%"
+    return f"{value:.2f}"
+
+
+class OutputTail:
+    """Keeps only the last `limit` bytes of a stream, plus the total byte count."""
+
+    __slots__ = ("limit", "total", "_buffer")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.total = 0
+        self._buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        self._buffer += data
+        overflow = len(self._buffer) - self.limit
+        if overflow > 0:
+            del self._buffer[:overflow]
+
+    @property
+    def retained(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self._buffer)
+
+    def text(self) -> str:
+        return self._buffer.decode('utf-8', errors='replace')
+
+
+class CommandJob:
+    """A command submitted to the JobManager, with its limits, state and output tails."""
+
+    def __init__(self, command: str, argv, shell: bool, cwd: Optional[str], timeout: float,
+                 cpu_limit: Optional[int], memory_limit_mb: Optional[int], output_limit: int):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.argv = argv
+        self.shell = shell
+        self.cwd = cwd
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.state = "queued"
+        self.pid = None
+        self.returncode = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stdout = OutputTail(output_limit)
+        self.stderr = OutputTail(output_limit)
+        self.done = asyncio.Event()
+        self._process = None
+        self._task = None
+
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    @property
+    def runtime(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def apply_limits(self):
+        """Set the CPU and memory rlimits on the started process (Linux only).
+
+        Limits are applied from the server after spawn rather than in a
+        preexec_fn, which is unsafe in a threaded process. Processes the
+        command forks afterwards inherit them.
+        """
+        if self.cpu_limit:
+            resource.prlimit(self.pid, resource.RLIMIT_CPU, (self.cpu_limit, self.cpu_limit + 1))
+        if self.memory_limit_mb:
+            limit = self.memory_limit_mb * 1024 * 1024
+            resource.prlimit(self.pid, resource.RLIMIT_AS, (limit, limit))
+
+    def kill(self):
+        """Kill the whole process group so child processes go too."""
+        process = self._process
+        if process is None or process.returncode is not None:
+            return
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+class JobManager:
+    """Runs commands with a bounded pool of concurrent jobs and a bounded queue.
+
+    Output is kept as fixed-size tails per stream so a chatty command cannot
+    grow server memory; finished jobs are kept for `history` entries.
+    """
+
+    def __init__(self, max_concurrent: int = COMMAND_MAX_CONCURRENT, max_queued: int = COMMAND_MAX_QUEUED,
+                 output_limit: int = COMMAND_OUTPUT_LIMIT, history: int = COMMAND_JOB_HISTORY):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.output_limit = output_limit
+        self.history = history
+        self._jobs = OrderedDict()
+        self._semaphore = None
+
+    def _queued_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.state == "queued")
+
+    def _running_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.state == "running")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def submit(self, command: str, shell: bool = False, cwd: Optional[str] = None,
+               timeout: Optional[float] = None, cpu_limit: Optional[int] = None,
+               memory_limit_mb: Optional[int] = None, on_output=None) -> CommandJob:
+        """Validate and queue a command; must be called from the event loop.
+
+        Limits left as None get the server defaults, and every limit is
+        capped at the server maximum.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._queued_count() >= self.max_queued:
+            raise RuntimeError(f"Job queue is full ({self.max_queued} queued); try again later")
+
+        argv = None if shell else shlex.split(command, posix=os.name != 'nt')
+        _check_command_safety(command, argv)
+
+        timeout = _command_limit(timeout, COMMAND_DEFAULT_TIMEOUT, COMMAND_MAX_TIMEOUT) or math.inf
+        cpu_limit = _command_limit(cpu_limit, COMMAND_DEFAULT_CPU_LIMIT, COMMAND_MAX_CPU_LIMIT)
+        memory_limit_mb = _command_limit(memory_limit_mb, COMMAND_DEFAULT_MEMORY_MB, COMMAND_MAX_MEMORY_MB)
+        job = CommandJob(command, argv, shell, cwd, timeout, cpu_limit, memory_limit_mb, self.output_limit)
+        self._jobs[job.job_id] = job
+        self._prune()
+        job._task = asyncio.get_running_loop().create_task(self._run(job, on_output))
+        return job
+
+    async def _pump(self, job: CommandJob, stream, tail: OutputTail, name: str, on_output):
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            tail.write(chunk)
+            if on_output is not None:
+                try:
+                    await on_output(job, name, chunk)
+                except Exception:
+                    # Streaming is best effort; the tail still has the output
+                    on_output = None
+
+    async def _run(self, job: CommandJob, on_output):
+        try:
+            async with self._semaphore:
+                if job.state == "cancelled":
+                    return
+                job.state = "running"
+                job.started_at = time.time()
+
+                kwargs = {
+                    'stdout': asyncio.subprocess.PIPE,
+                    'stderr': asyncio.subprocess.PIPE,
+                    'stdin': asyncio.subprocess.DEVNULL,
+                    'cwd': job.cwd,
+                }
+                if os.name == 'posix':
+                    kwargs['start_new_session'] = True
+
+                if job.shell:
+                    job._process = await asyncio.create_subprocess_shell(job.command, **kwargs)
+                else:
+                    job._process = await asyncio.create_subprocess_exec(*job.argv, **kwargs)
+                job.pid = job._process.pid
+                if hasattr(resource, "prlimit") and (job.cpu_limit or job.memory_limit_mb):
+                    try:
+                        job.apply_limits()
+                    except (ValueError, OSError):
+                        # Exited already, or the limit is above the server's own hard limit
+                        pass
+
+                pumps = asyncio.gather(
+                    self._pump(job, job._process.stdout, job.stdout, "stdout", on_output),
+                    self._pump(job, job._process.stderr, job.stderr, "stderr", on_output),
+                )
+                try:
+                    await asyncio.wait_for(asyncio.shield(pumps), job.timeout)
+                    job.returncode = await job._process.wait()
+                    job.state = "finished" if job.returncode == 0 else "failed"
+                except asyncio.TimeoutError:
+                    job.kill()
+                    job.state = "timeout"
+                    job.returncode = await job._process.wait()
+                    pumps.cancel()
+                    # Retrieve the cancellation so it isn't logged as unhandled
+                    await asyncio.gather(pumps, return_exceptions=True)
+        except asyncio.CancelledError:
+            job.kill()
+            job.state = "cancelled"
         except Exception as e:
-            return f"Error getting system info: {str(e)}"
+            job.state = "error"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+    def get(self, job_id: str) -> CommandJob:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job '{job_id}'")
+        return job
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def kill_all(self):
+        """Kill every running job's process group (used on server shutdown)."""
+        for job in self._jobs.values():
+            if not job.finished:
+                job.kill()
+
+    def cancel(self, job_id: str) -> CommandJob:
+        job = self.get(job_id)
+        if not job.finished:
+            if job.state == "queued":
+                job.state = "cancelled"
+            job.kill()
+            if job._task is not None:
+                job._task.cancel()
+        return job
+
+
+def _command_limit(value, default, maximum):
+    """The client's limit or the server default, capped at the server maximum; None means unlimited."""
+    value = default if value is None else value
+    if maximum and (not value or value > maximum):
+        return maximum
+    return value or None
+
+
+def _check_command_safety(command: str, argv):
+    """Reject a few well-known destructive commands typed by mistake.
+
+    Aliases, wrappers and interpreters get around this; access to the
+    command tools is controlled by the admin token, not by this list.
+    """
+    executable = os.path.basename(argv[0]) if argv else os.path.basename(command.strip().split(' ')[0])
+    if executable.split('.')[0] in BLOCKED_EXECUTABLES:
+        raise PermissionError(f"Command '{executable}' is blocked for safety")
+    for pattern in BLOCKED_PATTERNS:
+        if pattern.search(command):
+            raise PermissionError("Command matches a blocked pattern for safety")
+
+
+_job_manager = JobManager()
+
+
+def start_sampling():
+    """Start the process sampler and metrics collector.
+
+    Called by the system tools rather than at registration, so a server
+    whose system tools are never used starts no threads and never imports
+    psutil.
+    """
+    get_process_sampler()
+    get_metrics_collector()
+
+
+def shutdown_system_tools():
+    """Stop background samplers, persist metrics history and kill running command jobs."""
+    if _process_sampler is not None:
+        _process_sampler.stop()
+    if _metrics_collector is not None:
+        _metrics_collector.stop()
+    _job_manager.kill_all()
+
+
+def format_job(job: CommandJob, include_output: bool = True) -> str:
+    """Render a job's status and output tails."""
+    results = [f"Job {job.job_id}: {job.state.upper()}"]
+    results.append("=" * 50)
+    results.append(f"Command: {job.command}")
+    if job.pid is not None:
+        results.append(f"PID: {job.pid}")
+    if job.returncode is not None:
+        results.append(f"Exit code: {job.returncode}")
+    results.append(f"Runtime: {job.runtime:.2f}s (limit {job.timeout:g}s)")
+    if job.cpu_limit or job.memory_limit_mb:
+        limits = [f"CPU {job.cpu_limit}s" if job.cpu_limit else None,
+                  f"memory {job.memory_limit_mb} MB" if job.memory_limit_mb else None]
+        results.append(f"Limits: {', '.join(limit for limit in limits if limit)}")
+    if job.error:
+        results.append(f"Error: {job.error}")
+
+    if include_output:
+        for name, tail in (("stdout", job.stdout), ("stderr", job.stderr)):
+            if not tail.total:
+                continue
+            note = f", showing last {tail.retained} bytes" if tail.truncated else ""
+            results.append(f"\n--- {name} ({tail.total} bytes{note}) ---")
+            results.append(tail.text().rstrip())
+
+    return "\n".join(results)
 
-    @mcp.tool(description="Get top processes by CPU usage")
-    def get_process_info(show_all: bool = False) -> str:
-        """Get information about running processes."""
+
+def register_system_tools(mcp):
+    """Register all system utility tools with the MCP server."""
+
+    @mcp.tool(description="Get comprehensive system information", annotations=READ_ONLY)
+    def get_system_info(detailed: bool = False, output_format: str = "text") -> str:
+        """Get comprehensive system information as text or JSON."""
         try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'status']):
-                processes.append(proc.info)
-            
-            # Sort by CPU usage
-            processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
-            
+            start_sampling()
+            if output_format not in ("text", "json"):
+                raise ToolError(f"Unknown output format '{output_format}'. Available: text, json")
+
+            info = collect_system_info(detailed)
+            if output_format == "json":
+                return json.dumps(info, indent=2)
+            return format_system_info(info)
+        except ToolError:
+            raise
+        except Exception as e:
+            raise ToolError(f"Error getting system info: {str(e)}") from e
+
+    @mcp.tool(description="Get top processes by CPU, memory or IO usage over a recent time window", annotations=READ_ONLY)
+    def get_process_info(show_all: bool = False, sort_by: str = "cpu", window_seconds: float = 10.0,
+                         name_filter: Optional[str] = None, user: Optional[str] = None) -> Annotated[CallToolResult, ProcessList]:
+        """Get information about running processes from the background sampler."""
+        try:
+            start_sampling()
+            sampler = get_process_sampler()
+            sampler.wait_ready(timeout=sampler.effective_interval * 2 + 1)
+
+            window = min(max(window_seconds, sampler.effective_interval), sampler.max_window)
             limit = 20 if show_all else 10
-            results = [f"Top {limit} Processes by CPU Usage:"]
-            results.append("=" * 60)
-            results.append("PID\tName\t\tCPU%\tMemory%\tStatus")
-            results.append("-" * 60)
-            
-            for proc in processes[:limit]:
-                cpu = proc['cpu_percent'] or 0
-                mem = proc['memory_percent'] or 0
-                results.append(f"{proc['pid']}\t{proc['name'][:15]}\t{cpu:.1f}%\t{mem:.2f}%\t{proc['status']}")
-            
-            return "\n".join(results)
+            processes = sampler.top(window=window, sort_by=sort_by, name_filter=name_filter, user=user, limit=limit)
+
+            sort_label = {'cpu': 'CPU', 'memory': 'Memory', 'io': 'IO'}[sort_by]
+            results = [f"Top {limit} Processes by {sort_label} Usage (last {window:.0f}s):"]
+            results.append("=" * 78)
+            results.append("PID\tName\t\tCPU%\tRSS MB\tMemory%\tIO KB/s\tUser\t\tStatus")
+            results.append("-" * 78)
+
+            for proc in processes:
+                io_rate = f"{proc.io_rate / 1024:.1f}" if proc.io_rate is not None else "n/a"
+                results.append(
+                    f"{proc.pid}\t{proc.name[:15]}\t{proc.cpu_percent:.1f}%\t"
+                    f"{proc.rss / (1024**2):.1f}\t{proc.memory_percent:.2f}%\t{io_rate}\t"
+                    f"{proc.username[:15]}\t{proc.status}"
+                )
+
+            if not processes:
+                results.append("No processes matched the filters.")
+
+            results.append("-" * 78)
+            results.append(
+                f"Sampler: {sampler.process_count()} processes, interval {sampler.effective_interval:.1f}s, "
+                f"last sweep {sampler.last_sweep_seconds * 1000:.1f} ms, overhead {sampler.overhead_percent:.2f}% CPU"
+            )
+
+            structured = {
+                "window_seconds": window, "sort_by": sort_by,
+                "processes": [responses.to_plain(proc) for proc in processes],
+                "sampled_processes": sampler.process_count(), "sample_interval": sampler.effective_interval,
+            }
+            return responses.tool_result("\n".join(results), structured)
         except Exception as e:
-            return f"Error getting process info: {str(e)}"
+            raise ToolError(f"Error getting process info: {str(e)}") from e
 
-    @mcp.tool(description="Get network interface information")
+    @mcp.tool(description="Get network interface information", annotations=READ_ONLY)
     def get_network_info() -> str:
         """Get network interface and connection information."""
         try:
+            start_sampling()
             results = ["Network Information"]
             results.append("=" * 40)
             
@@ -131,41 +1478,217 @@ def register_system_tools(mcp):
             results.append(f"  Bytes received: {net_io.bytes_recv / (1024**2):.2f} MB")
             results.append(f"  Packets sent: {net_io.packets_sent}")
             results.append(f"  Packets received: {net_io.packets_recv}")
+
+            # Current per-interface throughput from the metrics collector
+            collector = get_metrics_collector()
+            rates = []
+            for interface in interfaces:
+                sent = collector.latest(f"net.{interface}.sent_bytes_per_s")
+                recv = collector.latest(f"net.{interface}.recv_bytes_per_s")
+                if sent is not None and recv is not None:
+                    rates.append(f"  {interface}: ↑ {sent / 1024:.1f} KB/s  ↓ {recv / 1024:.1f} KB/s")
+            if rates:
+                results.append(f"\nCurrent Throughput:")
+                results.extend(rates)
             
             return "\n".join(results)
         except Exception as e:
-            return f"Error getting network info: {str(e)}"
+            raise ToolError(f"Error getting network info: {str(e)}") from e
 
-    @mcp.tool(description="Check if a port is open/listening")
-    def check_port(port: int) -> str:
+    @mcp.tool(description="Check if a port is open/listening", annotations=READ_ONLY)
+    async def check_port(port: int, host: str = "localhost") -> str:
         """Check if a port is open/listening."""
         try:
-            # Check if port is in use
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            
-            result_localhost = sock.connect_ex(('localhost', port))
-            sock.close()
-            
+            addresses, statuses = await scan_ports(host, [port], timeout=current_deadline().cap(1.0))
+
             results = [f"Port {port} Status Check"]
             results.append("=" * 30)
-            
-            if result_localhost == 0:
-                results.append(f"✅ Port {port} is OPEN on localhost")
+
+            if statuses[port] == "open":
+                results.append(f"✅ Port {port} is OPEN on {host}")
             else:
-                results.append(f"❌ Port {port} is CLOSED on localhost")
-            
-            # Check what process is using the port
-            connections = psutil.net_connections(kind='inet')
-            for conn in connections:
-                if conn.laddr and conn.laddr.port == port:
-                    try:
-                        process = psutil.Process(conn.pid)
-                        results.append(f"Process using port: {process.name()} (PID: {conn.pid})")
-                    except:
-                        results.append(f"Process using port: PID {conn.pid}")
-                    break
-            
+                results.append(f"❌ Port {port} is {statuses[port].upper()} on {host}")
+
+            # Check what process is using the port (psutil calls, kept off the event loop)
+            owners = await asyncio.to_thread(_port_owner_labels, host, addresses, [port])
+            if port in owners:
+                results.append(f"Process using port: {owners[port]}")
+
             return "\n".join(results)
         except Exception as e:
-            return f"Error checking port: {str(e)}" 
\ No newline at end of file
+            raise ToolError(f"Error checking port: {str(e)}") from e
+
+    @mcp.tool(description="Check many ports or port ranges (e.g. '22,80,8000-8100') concurrently on a local or remote host", annotations=READ_ONLY)
+    async def check_ports(ports: str, host: str = "localhost", timeout: float = 0.5, concurrency: int = 256,
+                          show_closed: bool = False) -> str:
+        """Scan ports concurrently and report which are open and which process owns them."""
+        try:
+            port_list = parse_port_spec(ports)
+            started = time.perf_counter()
+            addresses, statuses = await scan_ports(host, port_list, timeout=timeout, concurrency=concurrency)
+            elapsed = time.perf_counter() - started
+
+            open_ports = [port for port, status in statuses.items() if status == "open"]
+            owners = await asyncio.to_thread(_port_owner_labels, host, addresses, open_ports)
+            counts = {status: 0 for status in ("open", "closed", "filtered", "skipped")}
+            for status in statuses.values():
+                counts[status] += 1
+
+            resolved = ", ".join(sockaddr[0] for _, sockaddr in addresses)
+            results = [f"Port Scan of {host} ({resolved})"]
+            results.append("=" * 50)
+            results.append(
+                f"Scanned {len(port_list) - counts['skipped']} ports in {elapsed:.2f}s: "
+                f"{counts['open']} open, {counts['closed']} closed, {counts['filtered']} filtered"
+            )
+            if counts['skipped']:
+                results.append(f"⚠️ Partial results: {counts['skipped']} ports skipped, deadline reached")
+
+            for port in port_list:
+                status = statuses[port]
+                if status == "open":
+                    owner = f" - {owners[port]}" if port in owners else ""
+                    results.append(f"✅ {port} OPEN{owner}")
+                elif show_closed and status != "skipped":
+                    results.append(f"❌ {port} {status.upper()}")
+
+            return "\n".join(results)
+        except Exception as e:
+            raise ToolError(f"Error checking ports: {str(e)}") from e
+
+    @mcp.tool(description="Query recorded system metrics (CPU, memory, disk IO, network rates) over a time range", annotations=READ_ONLY)
+    def query_metrics(metric: str = "*", start: Optional[str] = "-15m", end: Optional[str] = None,
+                      resolution: str = "auto") -> str:
+        """Return min/max/avg/p95 and trend for metrics matching a glob pattern."""
+        try:
+            start_sampling()
+            collector = get_metrics_collector()
+            now = time.time()
+            start_ts = _parse_time(start, now, now - 900)
+            end_ts = _parse_time(end, now, now)
+            if start_ts > end_ts:
+                raise ToolError("Start must be before end")
+
+            tier, summaries = collector.query(metric, start_ts, end_ts, resolution)
+
+            start_label = datetime.fromtimestamp(start_ts).strftime('%Y-%m-%d %H:%M:%S')
+            end_label = datetime.fromtimestamp(end_ts).strftime('%Y-%m-%d %H:%M:%S')
+            results = [f"Metrics: {metric} ({start_label} → {end_label}, resolution {tier})"]
+            results.append("=" * 60)
+
+            if not summaries:
+                results.append("No data recorded for this metric and time range.")
+                results.append(f"Available metrics: {', '.join(collector.metric_names()) or 'none yet'}")
+                return "\n".join(results)
+
+            for summary in summaries:
+                name = summary['metric']
+                fmt = lambda value: _format_metric_value(name, value)
+                slope = summary['slope_per_minute']
+                if summary['points'] < 2 or abs(slope) < 1e-9:
+                    trend = "flat"
+                else:
+                    trend = "rising" if slope > 0 else "falling"
+
+                results.append(f"\n{name} ({summary['points']} points, {summary['samples']} samples)")
+                results.append(f"  Min: {fmt(summary['min'])}  Max: {fmt(summary['max'])}")
+                results.append(f"  Avg: {fmt(summary['avg'])}  P95: {fmt(summary['p95'])}")
+                results.append(f"  Last: {fmt(summary['last'])}  Trend: {trend} ({fmt(slope)}/min)")
+
+            return "\n".join(results)
+        except ToolError:
+            raise
+        except Exception as e:
+            raise ToolError(f"Error querying metrics: {str(e)}") from e
+
+    if COMMANDS_ENABLED and not profiling.ADMIN_TOKEN:
+        print("⚠️  MCP_ENABLE_COMMANDS is set but MCP_ADMIN_TOKEN is not; command tools are not registered")
+    elif COMMANDS_ENABLED:
+        register_command_tools(mcp)
+
+
+def _require_admin(ctx: Optional[Context]):
+    if not profiling._authorized(profiling._request_headers(ctx)):
+        raise ToolError("Unauthorized: send 'Authorization: Bearer <MCP_ADMIN_TOKEN>' with the MCP request")
+
+
+def register_command_tools(mcp):
+    """Register run_command and the job tools (only when MCP_ENABLE_COMMANDS is set)."""
+
+    @mcp.tool(description="Run a command with streamed output and wall-time, CPU and memory limits (capped by the server)")
+    async def run_command(command: str, timeout: float = COMMAND_DEFAULT_TIMEOUT, background: bool = False,
+                          shell: bool = False, cwd: Optional[str] = None, cpu_limit: Optional[int] = None,
+                          memory_limit_mb: Optional[int] = None, ctx: Context = None) -> str:
+        """Run a command; foreground runs stream output as log messages, background runs return a job ID."""
+        _require_admin(ctx)
+        try:
+            if background and SERVER_WORKERS > 1:
+                # Jobs live in this worker's memory; get_job and cancel_job
+                # would land on other workers and not find them
+                raise ToolError(f"Background jobs need a single worker (running {SERVER_WORKERS}); "
+                                "run the command in the foreground or start the server with --workers 1")
+            if not background:
+                # A client deadline also bounds a foreground command
+                timeout = min(timeout, current_deadline().remaining())
+
+            async def stream_output(job, name, chunk):
+                await ctx.log("info", chunk.decode('utf-8', errors='replace'), logger_name=f"{job.job_id}:{name}")
+
+            job = _job_manager.submit(
+                command, shell=shell, cwd=cwd, timeout=timeout, cpu_limit=cpu_limit,
+                memory_limit_mb=memory_limit_mb,
+                on_output=stream_output if ctx is not None and not background else None,
+            )
+
+            if background:
+                return (f"Started job {job.job_id} ({job.state}).\n"
+                        f"Use get_job(job_id=\"{job.job_id}\") for output or cancel_job to stop it.")
+
+            try:
+                await job.done.wait()
+            except asyncio.CancelledError:
+                # The client gave up; don't leave the command running
+                _job_manager.cancel(job.job_id)
+                raise
+
+            return format_job(job)
+        except ToolError:
+            raise
+        except Exception as e:
+            raise ToolError(f"Error running command: {str(e)}") from e
+
+    @mcp.tool(description="Get status and output of a command job started by run_command", annotations=READ_ONLY)
+    def get_job(job_id: str, ctx: Context = None) -> str:
+        """Get status and output tail of a command job."""
+        _require_admin(ctx)
+        try:
+            return format_job(_job_manager.get(job_id))
+        except Exception as e:
+            raise ToolError(f"Error getting job: {str(e)}") from e
+
+    @mcp.tool(description="List recent command jobs", annotations=READ_ONLY)
+    def list_jobs(ctx: Context = None) -> str:
+        """List queued, running and recently finished command jobs."""
+        _require_admin(ctx)
+        try:
+            jobs = _job_manager.jobs()
+            if not jobs:
+                return "No command jobs."
+
+            results = [f"Command Jobs ({_job_manager._running_count()} running, {_job_manager._queued_count()} queued)"]
+            results.append("=" * 50)
+            for job in reversed(jobs):
+                results.append(f"{job.job_id}  {job.state:<9} {job.runtime:7.2f}s  {job.command[:60]}")
+            return "\n".join(results)
+        except Exception as e:
+            raise ToolError(f"Error listing jobs: {str(e)}") from e
+
+    @mcp.tool(description="Cancel a queued or running command job")
+    def cancel_job(job_id: str, ctx: Context = None) -> str:
+        """Cancel a command job, killing its process group."""
+        _require_admin(ctx)
+        try:
+            job = _job_manager.cancel(job_id)
+            return f"Cancelled job {job.job_id} (state: {job.state})"
+        except Exception as e:
+            raise ToolError(f"Error cancelling job: {str(e)}") from e
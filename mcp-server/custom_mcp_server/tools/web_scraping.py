@@ -3,117 +3,148 @@ Web Scraping Tools for MCP Server
 Provides web content extraction and scraping capabilities.
 """
 
-import asyncio
-import aiohttp
-import requests
-from bs4 import BeautifulSoup
+from dataclasses import dataclass
 from urllib.parse import urljoin, urlparse
-from typing import List, Optional, Dict, Any
+from typing import Annotated, List, Optional, Dict, Any
 import json
 import re
 
+from mcp.server.fastmcp.exceptions import ToolError
+from mcp.types import CallToolResult
+
+from . import http_client, responses
+from .cache import get_cache
+from .coalescing import READ_ONLY
+from .executor import run_cpu_bound
+from .lazy import lazy_import
+
+# Imported on first use; adds ~100 ms to server startup
+bs4 = lazy_import("bs4")
+
+@dataclass(slots=True)
+class Link:
+    """One extracted link; slotted, as pages can have thousands and they sit in the cursor store."""
+    text: str
+    url: str
+    is_internal: bool
+
+class LinkList(responses.Page):
+    url: str
+    items: List[Link]
+
+# HTML parsing is CPU-bound, so these run inline for small pages and in the
+# shared process pool for large ones (module level so they can be pickled).
+
+def _parse_text(html: str, url: str, clean_text: bool = True) -> str:
+    """Extract the title and visible text from an HTML document."""
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    text = soup.get_text(separator=' ', strip=True)
+    
+    if clean_text:
+        # Remove extra whitespace
+        text = re.sub(r'\s+', ' ', text)
+        text = text.strip()
+    
+    # Get title if available
+    title = soup.find('title')
+    title_text = title.get_text(strip=True) if title else "No title"
+    
+    return f"Title: {title_text}\nURL: {url}\n\n{text}"
+
+def _parse_links(html: str, url: str, internal_only: bool = False) -> List[Link]:
+    """Extract unique links from an HTML document."""
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    base_domain = urlparse(url).netloc
+    links = []
+    
+    for link in soup.find_all('a', href=True):
+        href = urljoin(url, link['href'])
+        text = link.get_text(strip=True)
+        
+        # Filter for internal links if requested
+        if internal_only:
+            link_domain = urlparse(href).netloc
+            if link_domain != base_domain:
+                continue
+        
+        links.append(Link(text, href, urlparse(href).netloc == base_domain))
+    
+    # Remove duplicates
+    unique_links = []
+    seen_urls = set()
+    for link in links:
+        if link.url not in seen_urls:
+            unique_links.append(link)
+            seen_urls.add(link.url)
+    
+    return unique_links
+
+def _render_link(link: Link) -> str:
+    internal_marker = "🏠" if link.is_internal else "🌐"
+    return f"{internal_marker} {link.text}: {link.url}"
+
+async def _fetch_page(url: str) -> str:
+    """HTML of a page, shared by extract_text and extract_links through the cache."""
+    async def fetch():
+        response = await http_client.aget(url)
+        response.raise_for_status()
+        return response.text
+
+    return await get_cache().aget_or_compute("page", [url], fetch)
+
 def register_web_tools(mcp):
     """Register all web scraping tools with the MCP server."""
 
-    @mcp.tool(description="Extract clean text content from a webpage")
-    def extract_text(url: str, clean_text: bool = True) -> str:
+    @mcp.tool(description="Extract clean text content from a webpage", annotations=READ_ONLY)
+    async def extract_text(url: str, clean_text: bool = True) -> str:
         """Extract clean text content from a webpage."""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            text = soup.get_text(separator=' ', strip=True)
-            
-            if clean_text:
-                # Remove extra whitespace
-                text = re.sub(r'\s+', ' ', text)
-                text = text.strip()
-            
-            # Get title if available
-            title = soup.find('title')
-            title_text = title.get_text(strip=True) if title else "No title"
-            
-            result = f"Title: {title_text}\nURL: {url}\n\n{text}"
-            return result
+            html = await _fetch_page(url)
+            return await run_cpu_bound(_parse_text, html, url, clean_text, size=len(html))
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error extracting text: {str(e)}"
+            raise ToolError(f"Error extracting text: {str(e)}") from e
 
-    @mcp.tool(description="Extract all links from a webpage")
-    def extract_links(url: str, internal_only: bool = False) -> str:
+    @mcp.tool(description="Extract all links from a webpage; pass the returned cursor to get more links", annotations=READ_ONLY)
+    async def extract_links(url: str = "", internal_only: bool = False, limit: Optional[int] = 20,
+                            output_format: str = "text", max_bytes: Optional[int] = None,
+                            cursor: Optional[str] = None) -> Annotated[CallToolResult, LinkList]:
         """Extract all links from a webpage."""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            base_domain = urlparse(url).netloc
-            links = []
-            
-            for link in soup.find_all('a', href=True):
-                href = urljoin(url, link['href'])
-                text = link.get_text(strip=True)
-                
-                # Filter for internal links if requested
-                if internal_only:
-                    link_domain = urlparse(href).netloc
-                    if link_domain != base_domain:
-                        continue
-                
-                links.append({
-                    'text': text,
-                    'url': href,
-                    'is_internal': urlparse(href).netloc == base_domain
-                })
-            
-            # Remove duplicates
-            unique_links = []
-            seen_urls = set()
-            for link in links:
-                if link['url'] not in seen_urls:
-                    unique_links.append(link)
-                    seen_urls.add(link['url'])
-            
-            results = [f"Extracted {len(unique_links)} unique links from {url}:"]
-            
-            for link in unique_links[:20]:  # Limit to first 20 links
-                internal_marker = "🏠" if link['is_internal'] else "🌐"
-                results.append(f"{internal_marker} {link['text']}: {link['url']}")
-            
-            if len(unique_links) > 20:
-                results.append(f"... and {len(unique_links) - 20} more links")
-            
-            return "\n".join(results)
+            if cursor:
+                return responses.page("extract_links", cursor, output_format=output_format,
+                                      max_bytes=max_bytes, limit=limit)
+            responses.require_inputs(url=url)
+
+            html = await _fetch_page(url)
+            links = await run_cpu_bound(_parse_links, html, url, internal_only, size=len(html))
+            return responses.paginate(
+                "extract_links", links, title=f"Extracted {len(links)} unique links from {url}:",
+                render=_render_link, meta={"url": url},
+                output_format=output_format, max_bytes=max_bytes, limit=limit,
+            )
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error extracting links: {str(e)}"
+            raise ToolError(f"Error extracting links: {str(e)}") from e
 
-    @mcp.tool(description="Search the web using DuckDuckGo")
+    @mcp.tool(description="Search the web using DuckDuckGo", annotations=READ_ONLY)
     def search_web(query: str, num_results: int = 10) -> str:
         """Search the web using DuckDuckGo."""
         try:
-            search_url = f"https://html.duckduckgo.com/html/?q={query}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(search_url, headers=headers, timeout=30)
-            response.raise_for_status()
+            def fetch():
+                response = http_client.get(http_client.upstream_url("duckduckgo", "/html/"), params={'q': query})
+                response.raise_for_status()
+                return response.text
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html = get_cache().get_or_compute("search", [query], fetch)
+            soup = bs4.BeautifulSoup(html, 'html.parser')
             
             results = []
             results.append(f"Search results for: {query}")
@@ -138,5 +169,7 @@ def register_web_tools(mcp):
                 results.append("No search results found.")
             
             return "\n".join(results)
+        except ToolError:
+            raise
         except Exception as e:
-            return f"Error searching web: {str(e)}" 
\ No newline at end of file
+            raise ToolError(f"Error searching web: {str(e)}") from e
\ No newline at end of file
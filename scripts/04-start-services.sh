@@ -84,7 +84,7 @@ start_mcp_server() {
     
     # Start MCP server
     cd custom_mcp_server
-    python main.py &
+    python main.py --port "$MCP_PORT" &
     cd ..
     
     cd ..